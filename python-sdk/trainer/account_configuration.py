@@ -2,10 +2,44 @@ from typing import Counter, NamedTuple, Optional
 
 CONFIGURATION_FROM_PLAYER_COUNTER: Counter[str] = Counter()
 
+MAX_USERNAME_LENGTH = 18
+
 
 class AccountConfiguration(NamedTuple):
     """Player configuration object. Represented with a tuple with two entries: username and
     password."""
 
     username: str
-    password: Optional[str]
\ No newline at end of file
+    password: Optional[str]
+
+
+def generate_username(key: str, index: int) -> str:
+    """Generates the username of the index-th player of a key, eg. a player
+    class name, shortening the key to fit the maximum username length.
+
+    :param key: The name the username starts with.
+    :type key: str
+    :param index: The number of the player, from 1.
+    :type index: int
+    :return: The username.
+    :rtype: str
+    """
+    username = "%s %d" % (key, index)
+    if len(username) > MAX_USERNAME_LENGTH:
+        username = "%s %d" % (key[: MAX_USERNAME_LENGTH - len(username)], index)
+    return username
+
+
+def create_account_configuration(key: str) -> AccountConfiguration:
+    """Creates the configuration of the next player of a key in this process,
+    without a password.
+
+    :param key: The name the username starts with.
+    :type key: str
+    :return: The account configuration.
+    :rtype: AccountConfiguration
+    """
+    CONFIGURATION_FROM_PLAYER_COUNTER.update([key])
+    return AccountConfiguration(
+        generate_username(key, CONFIGURATION_FROM_PLAYER_COUNTER[key]), None
+    )
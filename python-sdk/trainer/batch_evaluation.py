@@ -0,0 +1,291 @@
+"""This module contains a static evaluation of many positions at once.
+
+Positions are stacked as rows of 13 bitboards (see board_encoder), and every
+term is computed with NumPy operations over the whole batch:
+
+- material and piece-square values, as in evaluation.evaluate, by unpacking the
+  piece bitboards into squares and taking one matrix product,
+- mobility, the number of squares attacked by a side's knights, bishops, rooks
+  or queens that are not occupied by its own pieces, from attack sets generated
+  by shifting the bitboards (occluded fills for sliders).
+
+Scores are in centipawns, from the point of view of the side to move.
+
+Stacking positions and the NumPy calls have a fixed cost, so move rankings with
+fewer children than min_batch, about 20, are scored position by position with
+evaluation.evaluate and python-chess attack sets instead, which give the same
+scores.
+"""
+
+from typing import List, Optional, Sequence, Tuple, Union
+
+import chess
+import numpy as np
+
+from board_encoder import N_BITBOARDS, extend_bitboards
+from evaluation import SQUARE_VALUES, evaluate
+
+Position = Union[chess.Board, str]
+
+_U64 = np.uint64
+_FILE_A = _U64(chess.BB_FILE_A)
+_FILE_H = _U64(chess.BB_FILE_H)
+_NOT_A = ~_FILE_A
+_NOT_H = ~_FILE_H
+_NOT_AB = ~(_FILE_A | _U64(chess.BB_FILE_B))
+_NOT_GH = ~(_FILE_H | _U64(chess.BB_FILE_G))
+
+# (shift, left, mask applied after shifting)
+_ORTHOGONAL = ((8, True, None), (8, False, None), (1, True, _NOT_A), (1, False, _NOT_H))
+_DIAGONAL = ((9, True, _NOT_A), (7, True, _NOT_H), (7, False, _NOT_A), (9, False, _NOT_H))
+_KNIGHT = (
+    (17, True, _NOT_A),
+    (15, True, _NOT_H),
+    (10, True, _NOT_AB),
+    (6, True, _NOT_GH),
+    (17, False, _NOT_H),
+    (15, False, _NOT_A),
+    (10, False, _NOT_GH),
+    (6, False, _NOT_AB),
+)
+
+
+def _shift(bitboards: np.ndarray, shift: int, left: bool, mask: Optional[np.uint64]) -> np.ndarray:
+    shifted = bitboards << _U64(shift) if left else bitboards >> _U64(shift)
+    if mask is not None:
+        shifted &= mask
+    return shifted
+
+
+def _popcount(bitboards: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bitboards).astype(np.int32)
+    bits = np.unpackbits(bitboards[..., None].view(np.uint8), axis=-1)
+    return bits.sum(axis=-1, dtype=np.int32)
+
+
+def _slider_attacks(pieces: np.ndarray, empty: np.ndarray, directions: Tuple) -> np.ndarray:
+    attacks = np.zeros_like(pieces)
+    for shift, left, mask in directions:
+        ray = pieces
+        for _ in range(7):
+            ray = _shift(ray, shift, left, mask)
+            attacks |= ray
+            ray = ray & empty
+            if not ray.any():
+                break
+    return attacks
+
+
+def _square_weights() -> np.ndarray:
+    """Returns the (12 * 64, 2) values of each piece on each square, white
+    positive, with the middlegame then the endgame king table."""
+    weights = np.zeros((2, 12, 64), np.float32)
+    for index, (white_values, black_values) in enumerate(SQUARE_VALUES[:6]):
+        weights[:, index] = white_values
+        weights[:, 6 + index] = [-value for value in black_values]
+    white_values, black_values = SQUARE_VALUES[6]
+    weights[1, 5] = white_values
+    weights[1, 11] = [-value for value in black_values]
+    return weights.reshape(2, 12 * 64).T.copy()
+
+
+def _scalar_mobility(board: chess.Board) -> int:
+    """Returns the white minus black mobility of a position, as _mobility."""
+    mobility = 0
+    for color, sign in ((chess.WHITE, 1), (chess.BLACK, -1)):
+        own = board.occupied_co[color]
+        attacks = 0
+        for square in chess.scan_forward(own & ~(board.pawns | board.kings)):
+            attacks |= board.attacks_mask(square)
+        mobility += sign * chess.popcount(attacks & ~own)
+    return mobility
+
+
+class BatchEvaluator:
+    """Evaluates batches of positions with vectorized material, piece-square
+    and mobility terms.
+
+    With mobility_weight 0, scores equal those of evaluation.evaluate.
+    """
+
+    def __init__(
+        self, max_batch: int = 10000, mobility_weight: int = 4, min_batch: int = 20
+    ):
+        """
+        :param max_batch: Largest number of positions evaluated at once, larger
+            batches are split.
+        :type max_batch: int
+        :param mobility_weight: Centipawns per square of mobility.
+        :type mobility_weight: int
+        :param min_batch: Smallest number of positions ranked in a batch, smaller
+            rankings are scored position by position. 0 always batches.
+        :type min_batch: int
+        """
+        self._max_batch = max_batch
+        self._mobility_weight = mobility_weight
+        self._min_batch = min_batch
+        self._square_weights = _square_weights()
+
+    def evaluate(self, positions: Sequence[Position]) -> np.ndarray:
+        """Evaluates positions, given as boards or FENs.
+
+        :param positions: The positions.
+        :type positions: Sequence[Union[chess.Board, str]]
+        :return: The score of each position, from the point of view of its side
+            to move.
+        :rtype: np.ndarray
+        """
+        bitboards: List[int] = []
+        turns: List[bool] = []
+        for position in positions:
+            board = chess.Board(position) if isinstance(position, str) else position
+            extend_bitboards(board, bitboards)
+            turns.append(board.turn)
+        return self.evaluate_bitboards(
+            np.array(bitboards, dtype=np.uint64).reshape(-1, N_BITBOARDS),
+            np.array(turns, dtype=bool),
+        )
+
+    def evaluate_bitboards(self, bitboards: np.ndarray, turns: np.ndarray) -> np.ndarray:
+        """Evaluates positions given as stacked bitboards.
+
+        :param bitboards: Of shape (n, 13), as filled by
+            board_encoder.extend_bitboards.
+        :type bitboards: np.ndarray
+        :param turns: Of shape (n,), True when white is to move.
+        :type turns: np.ndarray
+        :return: The score of each position, from the point of view of its side
+            to move.
+        :rtype: np.ndarray
+        """
+        n = len(bitboards)
+        scores = np.empty(n, np.int32)
+        for start in range(0, n, self._max_batch):
+            batch = slice(start, min(start + self._max_batch, n))
+            scores[batch] = self._evaluate(bitboards[batch], turns[batch])
+        return scores
+
+    def _evaluate(self, bitboards: np.ndarray, turns: np.ndarray) -> np.ndarray:
+        n = len(bitboards)
+        pieces = np.ascontiguousarray(bitboards[:, :12], dtype="<u8")
+        squares = np.unpackbits(pieces.view(np.uint8), bitorder="little").reshape(
+            n, 12 * 64
+        )
+        values = squares.astype(np.float32) @ self._square_weights
+        queens = pieces[:, 4] | pieces[:, 10]
+        scores = np.where(queens != 0, values[:, 0], values[:, 1]).astype(np.int32)
+
+        if self._mobility_weight:
+            scores += self._mobility_weight * self._mobility(pieces)
+        return np.where(turns, scores, -scores)
+
+    def _mobility(self, pieces: np.ndarray) -> np.ndarray:
+        """Returns the white minus black mobility of each position."""
+        white = np.bitwise_or.reduce(pieces[:, :6], axis=1)
+        black = np.bitwise_or.reduce(pieces[:, 6:], axis=1)
+        empty = ~(white | black)
+
+        # white then black, stacked to share the shifts
+        knights = pieces[:, [1, 7]].T
+        diagonal = (pieces[:, [2, 8]] | pieces[:, [4, 10]]).T
+        orthogonal = (pieces[:, [3, 9]] | pieces[:, [4, 10]]).T
+
+        attacks = _slider_attacks(diagonal, empty, _DIAGONAL)
+        attacks |= _slider_attacks(orthogonal, empty, _ORTHOGONAL)
+        for shift, left, mask in _KNIGHT:
+            attacks |= _shift(knights, shift, left, mask)
+
+        mobility = _popcount(attacks & ~np.stack([white, black]))
+        return mobility[0] - mobility[1]
+
+    def evaluate_one(self, board: chess.Board) -> int:
+        """Evaluates a single position without NumPy, as evaluate would.
+
+        :param board: The position.
+        :type board: chess.Board
+        :return: The score from the point of view of the side to move.
+        :rtype: int
+        """
+        score = evaluate(board)
+        if self._mobility_weight:
+            mobility = self._mobility_weight * _scalar_mobility(board)
+            score += mobility if board.turn else -mobility
+        return score
+
+    def rank_moves(self, board: chess.Board) -> List[Tuple[chess.Move, int]]:
+        """Ranks the legal moves of a position by the evaluation of the
+        positions they lead to, in one batch unless they are fewer than
+        min_batch.
+
+        :param board: The position, left untouched.
+        :type board: chess.Board
+        :return: The moves and their scores, from the point of view of the side
+            to move, best first.
+        :rtype: List[Tuple[chess.Move, int]]
+        """
+        return self.rank_all([board])[0]
+
+    def rank_all(self, boards: Sequence[chess.Board]) -> List[List[Tuple[chess.Move, int]]]:
+        """Ranks the legal moves of several positions, eg. of every live game,
+        in one batch unless they are fewer than min_batch.
+
+        :param boards: The positions, left untouched.
+        :type boards: Sequence[chess.Board]
+        :return: For each position, its moves and their scores, best first.
+        :rtype: List[List[Tuple[chess.Move, int]]]
+        """
+        moves: List[List[chess.Move]] = [list(board.legal_moves) for board in boards]
+        if sum(len(board_moves) for board_moves in moves) < self._min_batch:
+            return [
+                self._rank_one_by_one(board, board_moves)
+                for board, board_moves in zip(boards, moves)
+            ]
+
+        bitboards: List[int] = []
+        for board, board_moves in zip(boards, moves):
+            for move in board_moves:
+                board.push(move)
+                extend_bitboards(board, bitboards)
+                board.pop()
+        n_children = sum(len(board_moves) for board_moves in moves)
+        # children are scored for their side to move, the opponent
+        turns = np.concatenate(
+            [np.full(len(board_moves), not board.turn) for board, board_moves in zip(boards, moves)]
+            or [np.zeros(0, bool)]
+        )
+        scores = -self.evaluate_bitboards(
+            np.array(bitboards, dtype=np.uint64).reshape(n_children, N_BITBOARDS),
+            turns,
+        )
+
+        rankings = []
+        start = 0
+        for board_moves in moves:
+            board_scores = scores[start : start + len(board_moves)].tolist()
+            start += len(board_moves)
+            rankings.append(
+                sorted(zip(board_moves, board_scores), key=lambda item: -item[1])
+            )
+        return rankings
+
+    def _rank_one_by_one(
+        self, board: chess.Board, moves: List[chess.Move]
+    ) -> List[Tuple[chess.Move, int]]:
+        ranking = []
+        for move in moves:
+            board.push(move)
+            ranking.append((move, -self.evaluate_one(board)))
+            board.pop()
+        ranking.sort(key=lambda item: -item[1])
+        return ranking
+
+
+def evaluate_batch(positions: Sequence[Position], mobility_weight: int = 4) -> np.ndarray:
+    """Evaluates positions with a new BatchEvaluator.
+
+    :return: The score of each position, from the point of view of its side to
+        move.
+    :rtype: np.ndarray
+    """
+    return BatchEvaluator(max(len(positions), 1), mobility_weight).evaluate(positions)
@@ -0,0 +1,116 @@
+"""Benchmark of the batched static evaluation against the per-position one.
+
+Positions are sampled from random games. Each batch size evaluates the same
+positions, from boards (including stacking their bitboards) and from already
+stacked bitboards, with and without the mobility term; evaluation.evaluate,
+which has no mobility term, is the per-position reference. Ranking every legal
+move of a position in one batch is timed against evaluating the moves one by
+one, then by number of legal moves, batched or not, which shows the crossover
+behind BatchEvaluator's min_batch.
+"""
+
+import argparse
+import random
+from time import perf_counter
+from typing import List
+
+import chess
+import numpy as np
+
+from batch_evaluation import BatchEvaluator
+from board_encoder import N_BITBOARDS, extend_bitboards
+from evaluation import evaluate
+
+
+def random_positions(n_positions: int, max_plies: int = 200) -> List[chess.Board]:
+    positions: List[chess.Board] = []
+    while len(positions) < n_positions:
+        board = chess.Board()
+        while board.ply() < max_plies and not board.is_game_over():
+            board.push(random.choice(list(board.legal_moves)))
+            positions.append(board.copy(stack=False))
+    return positions[:n_positions]
+
+
+def timed(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-sizes", default="1,10,100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    positions = random_positions(max(batch_sizes))
+
+    print(
+        "%6s %14s %14s %14s %14s"
+        % ("batch", "per position", "boards", "bitboards", "no mobility")
+    )
+    for batch_size in batch_sizes:
+        batch = positions[:batch_size]
+        bitboards: List[int] = []
+        for board in batch:
+            extend_bitboards(board, bitboards)
+        stacked = np.array(bitboards, dtype=np.uint64).reshape(-1, N_BITBOARDS)
+        turns = np.array([board.turn for board in batch])
+        evaluator = BatchEvaluator(batch_size)
+        material = BatchEvaluator(batch_size, mobility_weight=0)
+        rates = [
+            batch_size / timed(function, args.repeat)
+            for function in (
+                lambda: [evaluate(board) for board in batch],
+                lambda: evaluator.evaluate(batch),
+                lambda: evaluator.evaluate_bitboards(stacked, turns),
+                lambda: material.evaluate_bitboards(stacked, turns),
+            )
+        ]
+        print("%6d %14.0f %14.0f %14.0f %14.0f" % (batch_size, *rates))
+
+    evaluator = BatchEvaluator()
+    boards = positions[:200]
+    n_moves = sum(board.legal_moves.count() for board in boards)
+
+    def one_by_one():
+        for board in boards:
+            for move in board.legal_moves:
+                board.push(move)
+                evaluate(board)
+                board.pop()
+
+    print("%-24s %12s" % ("move ranking", "moves/s"))
+    for name, function in (
+        ("evaluate one by one", one_by_one),
+        ("rank_moves", lambda: [evaluator.rank_moves(board) for board in boards]),
+        ("rank_all", lambda: evaluator.rank_all(boards)),
+    ):
+        print("%-24s %12.0f" % (name, n_moves / timed(function, args.repeat)))
+
+    batched = BatchEvaluator(min_batch=0)
+    one_by_one = BatchEvaluator(min_batch=n_moves + 1)
+    sample = random_positions(5000)
+    print("%-10s %14s %14s" % ("moves", "batched", "one by one"))
+    for low in range(0, 60, 10):
+        group = [
+            board for board in sample if low <= board.legal_moves.count() < low + 10
+        ][:100]
+        if not group:
+            continue
+        n_group = sum(board.legal_moves.count() for board in group)
+        rates = [
+            n_group / timed(lambda: [ev.rank_moves(board) for board in group], args.repeat)
+            for ev in (batched, one_by_one)
+        ]
+        print("%-10s %14.0f %14.0f" % ("%d-%d" % (low, low + 9), *rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Micro-benchmark of inbound frame classification and event dispatch.
+
+Compares the codec / dispatch table path used by ChessClient against the
+previous chain of startswith checks followed by an if/elif chain on the event
+name. Handlers are no-ops so only parsing and routing are measured. The frame
+mix includes room list broadcasts, which the client has no handler for.
+"""
+
+import asyncio
+import json
+from time import perf_counter
+from typing import Any, List
+
+import json_backend
+from codec import EventRouter, decode_event, decode_frame, peek_event
+
+# events ChessClient registers handlers for
+CLIENT_EVENTS = (
+    "session",
+    "playerNameSet",
+    "invitationSent",
+    "invitationError",
+    "invitation",
+    "inviteAccepted",
+    "playerJoined",
+    "gameStart",
+    "gameState",
+    "gameOver",
+    "invalidMove",
+)
+
+ROOM_LIST = json.dumps(
+    [
+        {
+            "id": "room-%d" % i,
+            "name": "RandomPlayer %d vs RandomPlayer %d" % (i, i + 1),
+            "players": [
+                {"id": "user-%d" % i, "name": "RandomPlayer %d" % i, "color": "white"},
+                {"id": "user-%d" % (i + 1), "name": "RandomPlayer %d" % (i + 1), "color": "black"},
+            ],
+            "gameStarted": True,
+            "gameFen": "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1",
+            "moveHistory": ["e4"],
+            "gameStatus": "playing",
+        }
+        for i in range(20)
+    ]
+)
+
+FRAMES: List[str] = [
+    '0{"sid":"lv_VI97HAXpY6yYWAAAC","upgrades":[],"pingInterval":25000,"pingTimeout":20000,"maxPayload":1000000}',
+    '40{"sid":"wZX3oN0bSVIhsaknAAAI"}',
+    "2",
+    '42["gameState",{"roomId":"8c5d6c2e-7f1b-4b59-9d1b-5c6a1f1f0e2a","fen":"rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1","history":["e4"],"status":"playing","white":"RandomPlayer 1","black":"RandomPlayer 2","lastMove":"e4"}]',
+    '42["gameStart",{"id":"8c5d6c2e-7f1b-4b59-9d1b-5c6a1f1f0e2a","name":"a vs b","players":[],"gameStarted":true,"gameFen":"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1","moveHistory":[],"gameStatus":"playing","white":"a","black":"b"}]',
+    '42["invitation",{"from":"RandomPlayer 1","roomId":"8c5d6c2e-7f1b-4b59-9d1b-5c6a1f1f0e2a"}]',
+    '42["inviteAccepted",{"roomId":"8c5d6c2e-7f1b-4b59-9d1b-5c6a1f1f0e2a"}]',
+    '42["playerJoined",{"roomId":"8c5d6c2e-7f1b-4b59-9d1b-5c6a1f1f0e2a","players":[],"fen":"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1","history":[],"status":"waiting"}]',
+    '42["roomListUpdate",' + ROOM_LIST + "]",
+    '42["gameOver",{"winner":"white","reason":"checkmate"}]',
+]
+
+
+async def _noop(payload: Any):
+    pass
+
+
+async def legacy_path(message: str):
+    if message.startswith("0"):
+        json.loads(message[1:])
+    elif message.startswith("40"):
+        pass
+    elif message.startswith("42"):
+        event_data = json.loads(message[2:])
+        event = event_data[0]
+        payload = event_data[1] if len(event_data) > 1 else None
+        if event == "playerNameSet":
+            await _noop(payload)
+        elif event == "invitationSent":
+            await _noop(payload)
+        elif event == "invitationError":
+            await _noop(payload)
+        elif event == "invitation":
+            await _noop(payload)
+        elif event == "inviteAccepted":
+            await _noop(payload)
+        elif event == "playerJoined":
+            await _noop(payload)
+        elif event == "gameStart":
+            await _noop(payload)
+        elif event == "gameState":
+            await _noop(payload)
+    elif message == "2":
+        pass
+
+
+def make_codec_path():
+    router = EventRouter()
+    for event in CLIENT_EVENTS:
+        router.register(event, _noop)
+
+    async def on_open(packet):
+        json.loads(packet.data)
+
+    async def on_event(packet):
+        event = peek_event(packet.data)
+        if event is not None and event not in router:
+            return
+        await router.dispatch(*decode_event(packet.data))
+
+    async def on_other(packet):
+        pass
+
+    handlers = {"0": on_open, "40": on_other, "42": on_event, "2": on_other}
+
+    async def codec_path(message: str):
+        packet = decode_frame(message)
+        handler = handlers.get(packet.kind)
+        if handler is not None:
+            await handler(packet)
+
+    return codec_path
+
+
+async def run(path, n_rounds: int) -> float:
+    start = perf_counter()
+    for _ in range(n_rounds):
+        for frame in FRAMES:
+            await path(frame)
+    return n_rounds * len(FRAMES) / (perf_counter() - start)
+
+
+async def bench(n_rounds: int = 20000):
+    codec_path = make_codec_path()
+    # warm up
+    await run(legacy_path, 100)
+    await run(codec_path, 100)
+
+    legacy = await run(legacy_path, n_rounds)
+    codec = await run(codec_path, n_rounds)
+    print(f"legacy startswith/if-elif path: {legacy:12.0f} frames/s")
+    print(f"codec + dispatch table path:    {codec:12.0f} frames/s")
+    print(f"ratio: {codec / legacy:.2f}x")
+
+
+def main():
+    # same JSON implementation as the legacy path, see bench_json for backends
+    json_backend.set_backend("json")
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Throughput benchmark of the board encoder, in positions per second.
+
+Batches of positions taken from random games are encoded from boards and from
+FENs, and compared with the square by square reference encoding.
+"""
+
+import random
+from time import perf_counter
+from typing import Any, Callable, List
+
+import chess
+import numpy as np
+
+from board_encoder import BoardEncoder, encode_board
+
+
+def random_positions(n_positions: int) -> List[chess.Board]:
+    positions = []
+    board = chess.Board()
+    while len(positions) < n_positions:
+        if board.is_game_over():
+            board = chess.Board()
+        board.push(random.choice(list(board.legal_moves)))
+        positions.append(board.copy(stack=False))
+    return positions
+
+
+def positions_per_second(encode: Callable[[Any], Any], batch: List[Any]) -> float:
+    n_runs = max(1, 20000 // len(batch))
+    start = perf_counter()
+    for _ in range(n_runs):
+        encode(batch)
+    return n_runs * len(batch) / (perf_counter() - start)
+
+
+def main():
+    random.seed(0)
+    encoder = BoardEncoder(1024)
+    print("%8s %14s %14s %14s" % ("batch", "boards/s", "fens/s", "reference/s"))
+    for batch_size in (1, 64, 1024):
+        boards = random_positions(batch_size)
+        fens = [board.fen() for board in boards]
+        assert np.array_equal(
+            encoder.encode(boards), np.stack([encode_board(b) for b in boards])
+        )
+        print(
+            "%8d %14.0f %14.0f %14.0f"
+            % (
+                batch_size,
+                positions_per_second(encoder.encode, boards),
+                positions_per_second(encoder.encode, fens),
+                positions_per_second(
+                    lambda batch: [encode_board(b) for b in batch], boards
+                ),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark of the memory held per live game.
+
+Games receive one state after a random game of --plies moves. Each game gets
+its own history list, as each decoded payload has one, but the move strings
+are shared, so the unapplied states are slightly underestimated. Scenarios:
+
+- pending: states received, board never read (eg. spectated games),
+- board: board built, with its move stack (played games),
+- released: board built then released, leaving the packed moves.
+"""
+
+import argparse
+import gc
+import logging
+import random
+import tracemalloc
+from typing import Any, Callable, List
+
+import chess
+
+from environment import Game
+
+LOGGER = logging.getLogger("bench_game_memory")
+
+
+def random_history(n_plies: int) -> List[str]:
+    board = chess.Board()
+    history = []
+    while len(history) < n_plies and not board.is_game_over():
+        move = random.choice(list(board.legal_moves))
+        history.append(move.uci())
+        board.push(move)
+    return history
+
+
+def _pending(game: Game, history: List[str]):
+    game.update_position(None, list(history))
+
+
+def _board(game: Game, history: List[str]):
+    game.update_position(None, list(history))
+    game.board
+
+
+def _released(game: Game, history: List[str]):
+    _board(game, history)
+    game.release_board()
+
+
+def bytes_per_game(
+    n_games: int, history: List[str], scenario: Callable[[Game, List[str]], Any]
+) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = []
+    for i in range(n_games):
+        game = Game("room-%d" % i, "player", LOGGER)
+        scenario(game, history)
+        games.append(game)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del games
+    return used / n_games
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--plies", type=int, default=40)
+    parser.add_argument(
+        "--max-board-games",
+        type=int,
+        default=10000,
+        help="largest game count for the scenarios building boards, which take"
+        " about 2ms per game",
+    )
+    args = parser.parse_args()
+    random.seed(0)
+    history = random_history(args.plies)
+
+    print("%d plies per game" % len(history))
+    print("%-10s %10s %14s" % ("scenario", "games", "bytes/game"))
+    for name, scenario in (
+        ("pending", _pending),
+        ("board", _board),
+        ("released", _released),
+    ):
+        for n_games in (1000, 10000, 100000):
+            if scenario is not _pending and n_games > args.max_board_games:
+                continue
+            print(
+                "%-10s %10d %14.0f"
+                % (name, n_games, bytes_per_game(n_games, history, scenario))
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark of decode + dispatch cost per gameState frame under each JSON backend.
+
+Each iteration runs the client's inbound path for one frame: frame parsing,
+event decoding, conversion to the typed payload and routing to a handler. The
+encoding of the move frame sent in reply is measured as well.
+"""
+
+import asyncio
+from time import perf_counter
+
+import json_backend
+from codec import EventRouter, decode_event, decode_frame, encode_event, peek_event
+from payloads import GameState, build_payload
+
+FRAME = (
+    '42["gameState",{"roomId":"8c5d6c2e-7f1b-4b59-9d1b-5c6a1f1f0e2a",'
+    '"fen":"r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",'
+    '"history":["e4","e5","Nf3","Nc6","Bc4","Nf6"],"status":"playing",'
+    '"white":"RandomPlayer 1","black":"RandomPlayer 2","lastMove":"Nf6"}]'
+)
+
+
+async def run(n_frames: int) -> float:
+    router = EventRouter()
+    received = []
+
+    async def on_game_state(payload: GameState):
+        received.append(payload.room_id)
+
+    router.register("gameState", on_game_state)
+
+    start = perf_counter()
+    for _ in range(n_frames):
+        packet = decode_frame(FRAME)
+        event = peek_event(packet.data)
+        if event not in router:
+            continue
+        event, payload = decode_event(packet.data)
+        await router.dispatch(event, build_payload(event, payload))
+    elapsed = perf_counter() - start
+    assert len(received) == n_frames
+    return elapsed / n_frames
+
+
+def encode_cost(n_frames: int) -> float:
+    start = perf_counter()
+    for _ in range(n_frames):
+        encode_event(
+            "move", {"roomId": "8c5d6c2e-7f1b-4b59-9d1b-5c6a1f1f0e2a", "move": "O-O"}
+        )
+    return (perf_counter() - start) / n_frames
+
+
+def main(n_frames: int = 100000):
+    default = json_backend.backend.name
+    for name in json_backend.BACKENDS:
+        json_backend.set_backend(name)
+        asyncio.run(run(1000))
+        decode = asyncio.run(run(n_frames))
+        encode = encode_cost(n_frames)
+        print(
+            f"{name:8s} decode+dispatch: {decode * 1e6:6.2f} us/gameState   "
+            f"encode move: {encode * 1e6:6.2f} us/frame"
+        )
+    json_backend.set_backend(default)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark of self-play throughput over the loopback and websocket transports.
+
+The same RandomPlayer pairs play against the same GameServer handlers, either
+in memory through a LoopbackArbiter or through the websocket stand-in server
+running on its own thread.
+"""
+
+import argparse
+import asyncio
+import logging
+
+from bench_server import _free_port, play
+from concurrency import handle_threaded_coroutines
+from game_server import GameServer, WebsocketGameServer
+from server_configuration import ServerConfiguration
+from transport import LoopbackArbiter
+
+
+def _report(name: str, game_server: GameServer, n_games: int, elapsed: float):
+    n_moves = sum(room.board.ply() for room in game_server.rooms.values())
+    print(
+        "%-10s %6d games %8d moves %8.2fs %8.1f games/s %8.0f moves/s"
+        % (name, n_games, n_moves, elapsed, n_games / elapsed, n_moves / elapsed)
+    )
+    return n_games / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pairs", type=int, default=10)
+    parser.add_argument("--games", type=int, default=5, help="games per pair")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    n_games = args.pairs * args.games
+
+    arbiter = LoopbackArbiter()
+    configuration = ServerConfiguration("loopback", "")
+    elapsed = asyncio.run(
+        handle_threaded_coroutines(
+            play(args.pairs, args.games, configuration, arbiter.transport)
+        )
+    )
+    loopback = _report("loopback", arbiter.game_server, n_games, elapsed)
+
+    port = _free_port()
+    game_server = GameServer(broadcast_room_list=False)
+    WebsocketGameServer(game_server).start_in_thread("localhost", port)
+    configuration = ServerConfiguration("localhost:%d" % port, "")
+    elapsed = asyncio.run(
+        handle_threaded_coroutines(play(args.pairs, args.games, configuration))
+    )
+    websocket = _report("websocket", game_server, n_games, elapsed)
+
+    print("loopback speedup: %.1fx" % (loopback / websocket))
+
+
+if __name__ == "__main__":
+    main()
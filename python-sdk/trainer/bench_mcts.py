@@ -0,0 +1,64 @@
+"""Benchmark of MCTS simulations per second at several batch sizes.
+
+Each batch size runs a fresh search from the start position and from the
+bench_search suite, with the static evaluator and with a NumPy policy and value
+function: a random linear layer over the board planes, standing for the
+batched inference of a learned model.
+"""
+
+import argparse
+from time import perf_counter
+from typing import Tuple
+
+import chess
+import numpy as np
+
+from bench_search import POSITIONS
+from board_encoder import N_PLANES
+from mcts import MCTS, PolicyValueEvaluator, StaticEvaluator
+
+
+def linear_model(seed: int = 0):
+    rng = np.random.default_rng(seed)
+    weights = rng.standard_normal((N_PLANES * 64, 4096 + 1)).astype(np.float32) * 0.01
+
+    def model(planes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        outputs = planes.reshape(len(planes), -1) @ weights
+        return outputs[:, :4096], np.tanh(outputs[:, 4096])
+
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--simulations", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="1,8,32,128")
+    args = parser.parse_args()
+
+    evaluators = (
+        ("static", StaticEvaluator()),
+        ("numpy", PolicyValueEvaluator(linear_model())),
+    )
+    print(
+        "%-8s %6s %12s %10s %12s"
+        % ("eval", "batch", "sims/s", "nodes", "collisions")
+    )
+    for name, evaluator in evaluators:
+        for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+            simulations = nodes = collisions = 0
+            elapsed = 0.0
+            for _, fen in POSITIONS:
+                search = MCTS(evaluator, batch_size)
+                start = perf_counter()
+                simulations += search.run(chess.Board(fen), args.simulations)
+                elapsed += perf_counter() - start
+                nodes += len(search.tree)
+                collisions += search.collisions
+            print(
+                "%-8s %6d %12.0f %10d %12d"
+                % (name, batch_size, simulations / elapsed, nodes, collisions)
+            )
+
+
+if __name__ == "__main__":
+    main()
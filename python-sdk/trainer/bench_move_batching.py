@@ -0,0 +1,104 @@
+"""Benchmark of cross-game move batching with a vectorized policy.
+
+A GreedyPlayer, which scores the legal moves of every game of a batch with one
+BatchEvaluator call, plays max_concurrent_games games at once against a
+RandomPlayer over the loopback transport, without batching then with several
+batch sizes and waits. Aggregate moves per second are reported with the batch
+size and queueing delay histograms of the MoveBatcher.
+"""
+
+import argparse
+import asyncio
+import logging
+from time import perf_counter
+from typing import Optional, Tuple
+
+from account_configuration import AccountConfiguration
+from concurrency import handle_threaded_coroutines
+from greedy_player import GreedyPlayer
+from move_batching import MoveBatcher
+from random_player import RandomPlayer
+from server_configuration import ServerConfiguration
+from transport import LoopbackArbiter
+
+
+async def play(
+    n_concurrent: int, batch_size: Optional[int], wait: float
+) -> Tuple[int, float, Optional[MoveBatcher]]:
+    arbiter = LoopbackArbiter()
+    configuration = ServerConfiguration("loopback", "")
+    player = GreedyPlayer(
+        AccountConfiguration("greedy", None),
+        server_configuration=configuration,
+        transport=arbiter.transport(),
+        log_level=logging.WARNING,
+        max_concurrent_games=n_concurrent,
+        move_batch_size=batch_size,
+        move_batch_wait=wait,
+    )
+    opponent = RandomPlayer(
+        AccountConfiguration("opponent", None),
+        server_configuration=configuration,
+        transport=arbiter.transport(),
+        log_level=logging.WARNING,
+        max_concurrent_games=n_concurrent,
+    )
+    await player.chess_client.logged_in.wait()
+    await opponent.chess_client.logged_in.wait()
+
+    start = perf_counter()
+    await asyncio.gather(
+        player._send_invites(opponent.username, n_concurrent),
+        opponent._accept_invites(player.username, n_concurrent),
+    )
+    elapsed = perf_counter() - start
+    for client in (player, opponent):
+        await client.chess_client._stop_listening()
+    n_moves = sum(
+        (room.board.ply() + 1) // 2 for room in arbiter.game_server.rooms.values()
+    )
+    return n_moves, elapsed, player.move_batcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=32, help="concurrent games")
+    parser.add_argument("--batch-sizes", default="0,8,32")
+    parser.add_argument("--waits", default="0.001,0.005", help="seconds")
+    args = parser.parse_args()
+
+    configurations = []
+    for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+        if not batch_size:
+            configurations.append((None, 0.0))
+            continue
+        for wait in (float(wait) for wait in args.waits.split(",")):
+            configurations.append((batch_size, wait))
+
+    print(
+        "%6s %8s %8s %10s %10s %12s %12s"
+        % ("batch", "wait ms", "moves", "moves/s", "mean size", "p50 wait ms", "p99 wait ms")
+    )
+    for batch_size, wait in configurations:
+        n_moves, elapsed, batcher = asyncio.run(
+            handle_threaded_coroutines(play(args.games, batch_size, wait))
+        )
+        if batcher is None:
+            statistics = (1.0, 0.0, 0.0)
+        else:
+            delays = batcher.queueing_delays
+            statistics = (
+                batcher.batch_sizes.stats.mean,
+                delays.quantile(0.5) * 1000,
+                delays.quantile(0.99) * 1000,
+            )
+        print(
+            "%6d %8.1f %8d %10.0f %10.1f %12.2f %12.2f"
+            % (batch_size or 1, wait * 1000, n_moves, n_moves / elapsed, *statistics)
+        )
+        if batcher is not None:
+            print("       batch sizes: %s" % batcher.batch_sizes.as_dict())
+
+
+if __name__ == "__main__":
+    main()
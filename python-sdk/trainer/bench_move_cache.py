@@ -0,0 +1,105 @@
+"""Benchmark of random move choice with and without the move cache.
+
+Bots repeat the same openings: games follow a few random but fixed opening
+lines for their first plies, then play randomly. Each ply chooses a random
+legal move rendered as SAN, like Player.choose_random_move.
+"""
+
+import argparse
+import random
+from time import perf_counter
+from typing import Callable, List
+
+import chess
+
+import chess.polyglot
+
+from move_cache import MoveCache
+
+
+def uncached_choice(board: chess.Board) -> str:
+    return board.san(random.choice(list(board.legal_moves)))
+
+
+def cached_choice(cache: MoveCache) -> Callable[[chess.Board], str]:
+    def choose(board: chess.Board) -> str:
+        entry = cache.entry(board)
+        return entry.san(board, random.choice(entry.moves))
+
+    return choose
+
+
+def play(
+    choose: Callable[[chess.Board], str],
+    lines: List[List[str]],
+    n_games: int,
+    n_plies: int,
+) -> float:
+    """Plays n_games and returns the time spent choosing moves per ply."""
+    elapsed = 0.0
+    n_choices = 0
+    for i in range(n_games):
+        board = chess.Board()
+        for san in lines[i % len(lines)]:
+            start = perf_counter()
+            choose(board)
+            elapsed += perf_counter() - start
+            n_choices += 1
+            board.push_san(san)
+        while board.ply() < n_plies and not board.is_game_over():
+            start = perf_counter()
+            san = choose(board)
+            elapsed += perf_counter() - start
+            n_choices += 1
+            board.push_san(san)
+    return elapsed / n_choices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--plies", type=int, default=30)
+    parser.add_argument("--lines", type=int, default=20, help="distinct openings")
+    parser.add_argument("--opening-plies", type=int, default=12)
+    args = parser.parse_args()
+
+    random.seed(0)
+    lines = []
+    for _ in range(args.lines):
+        board = chess.Board()
+        line = []
+        for _ in range(args.opening_plies):
+            move = random.choice(list(board.legal_moves))
+            line.append(board.san(move))
+            board.push(move)
+        lines.append(line)
+
+    uncached = play(uncached_choice, lines, args.games, args.plies)
+    print("%-25s %8.1f us/move" % ("uncached", uncached * 1e6))
+    for key_name, key in (
+        ("transposition", None),
+        ("zobrist", chess.polyglot.zobrist_hash),
+    ):
+        for eviction in ("lru", "fifo"):
+            for maxsize in (1024, 65536):
+                if key is None:
+                    cache = MoveCache(maxsize, eviction)
+                else:
+                    cache = MoveCache(maxsize, eviction, key)
+                cached = play(cached_choice(cache), lines, args.games, args.plies)
+                print(
+                    "%-13s %-4s %-6d %8.1f us/move  %.2fx  hit rate %.2f  evictions %d"
+                    % (
+                        key_name,
+                        eviction,
+                        maxsize,
+                        cached * 1e6,
+                        uncached / cached,
+                        cache.hit_rate,
+                        cache.evictions,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Benchmark of aggregate moves per second as concurrent games grow, with
+choose_move run on the chess loop, in a thread pool or in a process pool.
+
+A player thinking for a fixed time per move, by sleeping or by computing,
+plays max_concurrent_games games at once against a RandomPlayer over the
+loopback transport. On the chess loop, games wait for each other's moves; in a
+pool, up to max_concurrent_games moves are chosen at once. Computing only
+scales with processes, and as far as there are cores. The largest delay of a
+timer on the chess loop, which also answers pings, is reported as its lag.
+"""
+
+import argparse
+import asyncio
+import logging
+from time import perf_counter, sleep
+from typing import Any, Optional
+
+from account_configuration import AccountConfiguration
+from concurrency import handle_threaded_coroutines
+from environment import AbstractGame
+from player import Player
+from random_player import RandomPlayer
+from server_configuration import ServerConfiguration
+from transport import LoopbackArbiter
+
+MODES = ("loop", "thread", "process")
+
+
+class ThinkingPlayer(Player):
+    def __init__(self, *args: Any, think: float = 0.005, work: str = "sleep", **kwargs: Any):
+        self._think = think
+        self._work = work
+        super(ThinkingPlayer, self).__init__(*args, **kwargs)
+
+    def choose_move(self, game: AbstractGame):
+        if self._work == "sleep":
+            sleep(self._think)
+        else:
+            end = perf_counter() + self._think
+            while perf_counter() < end:
+                pass
+        return self.choose_random_move(game)
+
+
+async def _lag(interval: float, done: asyncio.Event) -> float:
+    worst = 0.0
+    while not done.is_set():
+        start = perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, perf_counter() - start - interval)
+    return worst
+
+
+async def play(
+    mode: str, n_concurrent: int, n_games: int, think: float, work: str
+) -> Any:
+    arbiter = LoopbackArbiter()
+    configuration = ServerConfiguration("loopback", "")
+    executor: Optional[str] = None if mode == "loop" else mode
+    thinker = ThinkingPlayer(
+        AccountConfiguration("thinker", None),
+        server_configuration=configuration,
+        transport=arbiter.transport(),
+        log_level=logging.WARNING,
+        max_concurrent_games=n_concurrent,
+        move_executor=executor,
+        move_worker_kwargs={"think": think, "work": work},
+        think=think,
+        work=work,
+    )
+    opponent = RandomPlayer(
+        AccountConfiguration("opponent", None),
+        server_configuration=configuration,
+        transport=arbiter.transport(),
+        log_level=logging.WARNING,
+        max_concurrent_games=n_concurrent,
+    )
+    await thinker.chess_client.logged_in.wait()
+    await opponent.chess_client.logged_in.wait()
+    if thinker.move_executor is not None:
+        # starts every worker of the pool outside of the timing, processes are
+        # spawned when no worker is idle
+        await asyncio.gather(
+            *(
+                asyncio.get_running_loop().run_in_executor(
+                    thinker.move_executor, sleep, 0.5
+                )
+                for _ in range(n_concurrent)
+            )
+        )
+
+    done = asyncio.Event()
+    lag = asyncio.ensure_future(_lag(0.01, done))
+    start = perf_counter()
+    await asyncio.gather(
+        thinker._send_invites(opponent.username, n_games),
+        opponent._accept_invites(thinker.username, n_games),
+    )
+    elapsed = perf_counter() - start
+    done.set()
+    # before shutting the pool down, which blocks the loop
+    worst_lag = await lag
+    thinker.close_move_executor()
+    for player in (thinker, opponent):
+        await player.chess_client._stop_listening()
+    n_moves = sum(
+        (room.board.ply() + (room.board.turn == 1)) // 2
+        for room in arbiter.game_server.rooms.values()
+    )
+    return n_moves, elapsed, worst_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    parser.add_argument("--games", type=int, default=1, help="per concurrent game")
+    parser.add_argument("--think", type=float, default=0.005, help="seconds per move")
+    parser.add_argument("--work", choices=("sleep", "compute"), default="sleep")
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    print(
+        "%-8s %6s %8s %10s %10s"
+        % ("mode", "games", "moves", "moves/s", "lag (ms)")
+    )
+    for mode in args.modes.split(","):
+        for n_concurrent in (int(n) for n in args.concurrency.split(",")):
+            n_moves, elapsed, lag = asyncio.run(
+                handle_threaded_coroutines(
+                    play(
+                        mode,
+                        n_concurrent,
+                        n_concurrent * args.games,
+                        args.think,
+                        args.work,
+                    )
+                )
+            )
+            print(
+                "%-8s %6d %8d %10.1f %10.1f"
+                % (mode, n_concurrent, n_moves, n_moves / elapsed, lag * 1000)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark of the CPU spent per move in the SAN, UCI and object move formats.
+
+Random games are played to the end. For every move, the player renders it in
+the move format, and the move is parsed back from the history, as the server
+and both players' games do with every gameState. The history is sent with every
+state, so the size of its JSON matters too.
+"""
+
+import argparse
+import random
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+
+import chess
+
+import json_backend
+from moves import move_to_dict, parse_move
+
+RENDERERS: Dict[str, Callable[[chess.Board, chess.Move], Any]] = {
+    "san": lambda board, move: board.san(move),
+    "uci": lambda board, move: move.uci(),
+    "object": lambda board, move: move_to_dict(move),
+}
+
+
+def random_game(max_plies: int) -> List[chess.Move]:
+    board = chess.Board()
+    while board.ply() < max_plies and not board.is_game_over():
+        board.push(random.choice(list(board.legal_moves)))
+    return board.move_stack
+
+
+def run(games: List[List[chess.Move]], move_format: str) -> Dict[str, float]:
+    render = RENDERERS[move_format]
+    render_time = parse_time = 0.0
+    history_size = 0
+    for moves in games:
+        board = chess.Board()
+        history = []
+        for move in moves:
+            start = perf_counter()
+            rendered = render(board, move)
+            rendered_at = perf_counter()
+            parsed = parse_move(board, rendered)
+            parse_time += perf_counter() - rendered_at
+            render_time += rendered_at - start
+            assert parsed == move
+            board.push(move)
+            history.append(rendered)
+        history_size += len(json_backend.dumps(history))
+    n_moves = sum(len(moves) for moves in games)
+    return {
+        "render": render_time / n_moves,
+        "parse": parse_time / n_moves,
+        "game": (render_time + parse_time) / len(games),
+        "history": history_size / len(games),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--max-plies", type=int, default=400)
+    args = parser.parse_args()
+
+    random.seed(0)
+    games = [random_game(args.max_plies) for _ in range(args.games)]
+    print(
+        "%d games, %.0f plies on average"
+        % (len(games), sum(len(moves) for moves in games) / len(games))
+    )
+    print(
+        "%-6s %12s %12s %14s %16s"
+        % ("format", "render (us)", "parse (us)", "per game (ms)", "history (bytes)")
+    )
+    results = {}
+    for move_format in RENDERERS:
+        results[move_format] = result = run(games, move_format)
+        print(
+            "%-6s %12.1f %12.1f %14.2f %16.0f"
+            % (
+                move_format,
+                result["render"] * 1e6,
+                result["parse"] * 1e6,
+                result["game"] * 1e3,
+                result["history"],
+            )
+        )
+    san, uci = results["san"]["game"], results["uci"]["game"]
+    print("uci saves %.2f ms of CPU per game (%.1fx)" % ((san - uci) * 1e3, san / uci))
+
+
+if __name__ == "__main__":
+    main()
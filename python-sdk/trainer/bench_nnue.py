@@ -0,0 +1,104 @@
+"""Benchmark of the NNUE evaluation, incremental versus from scratch.
+
+Random games are replayed: the incremental evaluation pushes each move on the
+accumulators then scores them, the from-scratch one sums the weight rows of
+every piece of each position. The piece-square evaluation of evaluation.py is
+given for reference, and the search speed with each evaluation on the
+bench_search suite, within a node budget as random weights make trees of very
+different sizes.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+from time import perf_counter
+from typing import List
+
+import chess
+
+from bench_search import POSITIONS
+from evaluation import evaluate
+from nnue import NNUEEvaluator, random_weights
+from search import Searcher, SearchLimits
+
+
+def random_games(n_games: int, max_plies: int) -> List[List[chess.Move]]:
+    games = []
+    for _ in range(n_games):
+        board = chess.Board()
+        while board.ply() < max_plies and not board.is_game_over():
+            board.push(random.choice(list(board.legal_moves)))
+        games.append(board.move_stack)
+    return games
+
+
+def incremental(evaluator: NNUEEvaluator, games: List[List[chess.Move]]) -> float:
+    elapsed = 0.0
+    for moves in games:
+        board = chess.Board()
+        evaluator.reset(board)
+        for move in moves:
+            start = perf_counter()
+            evaluator.push(board, move)
+            board.push(move)
+            evaluator(board)
+            elapsed += perf_counter() - start
+    return elapsed
+
+
+def from_scratch(evaluate, games: List[List[chess.Move]]) -> float:
+    elapsed = 0.0
+    for moves in games:
+        board = chess.Board()
+        for move in moves:
+            board.push(move)
+            start = perf_counter()
+            evaluate(board)
+            elapsed += perf_counter() - start
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hidden", type=int, default=256)
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--max-plies", type=int, default=200)
+    parser.add_argument("--nodes", type=int, default=10000, help="per position")
+    args = parser.parse_args()
+
+    random.seed(0)
+    games = random_games(args.games, args.max_plies)
+    n_evals = sum(len(moves) for moves in games)
+    path = os.path.join(tempfile.mkdtemp(), "random.nnue")
+    random_weights(path, args.hidden)
+    evaluator = NNUEEvaluator(path)
+    print("hidden %d, %d bytes of weights" % (args.hidden, os.path.getsize(path)))
+
+    print("%-20s %12s" % ("evaluation", "evals/s"))
+    for name, elapsed in (
+        ("nnue incremental", incremental(evaluator, games)),
+        ("nnue from scratch", from_scratch(evaluator.evaluate_board, games)),
+        ("piece-square", from_scratch(evaluate, games)),
+    ):
+        print("%-20s %12.0f" % (name, n_evals / elapsed))
+
+    print("%-20s %12s" % ("search", "nps"))
+    for name, evaluation in (
+        ("nnue incremental", evaluator),
+        ("nnue from scratch", evaluator.evaluate_board),
+        ("piece-square", evaluate),
+    ):
+        nodes = 0
+        elapsed = 0.0
+        for _, fen in POSITIONS:
+            result = Searcher(evaluation).search(
+                chess.Board(fen), SearchLimits(nodes=args.nodes)
+            )
+            nodes += result.nodes
+            elapsed += result.time
+        print("%-20s %12.0f" % (name, nodes / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Benchmark of opening book lookups.
+
+Random games, recorded in observation histories like Player.trajectories, are
+compiled into a polyglot book, which is then consulted along fresh random games:
+positions of the recorded games are book hits, the others misses. A lookup is
+compared with choose_random_move, the cheapest policy there is.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+from time import perf_counter
+from typing import List
+
+import chess
+
+from moves import pack_move, unpack_move
+from observation import ObservationHistory
+from opening_book import BookBuilder, OpeningBook
+
+
+def random_history(n_plies: int) -> ObservationHistory:
+    board = chess.Board()
+    history = ObservationHistory()
+    while board.ply() < n_plies and not board.is_game_over():
+        move = random.choice(list(board.legal_moves))
+        history.append(pack_move(move), board.turn, board.halfmove_clock, 0.0)
+        board.push(move)
+    return history
+
+
+def lookup_time(book: OpeningBook, boards: List[chess.Board]) -> float:
+    start = perf_counter()
+    for board in boards:
+        book.choose(board)
+    return (perf_counter() - start) / len(boards)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--plies", type=int, default=16)
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    histories = [random_history(args.plies) for _ in range(args.games)]
+    builder = BookBuilder(max_ply=args.plies)
+    start = perf_counter()
+    for history in histories:
+        builder.add_history(history)
+    path = os.path.join(tempfile.mkdtemp(), "book.bin")
+    n_entries = builder.write(path)
+    print(
+        "built %d entries from %d games in %.2fs (%d bytes)"
+        % (n_entries, len(histories), perf_counter() - start, os.path.getsize(path))
+    )
+
+    start = perf_counter()
+    book = OpeningBook(path, selection="best", max_ply=None)
+    print("opened in %.1f us" % ((perf_counter() - start) * 1e6))
+
+    hits = []
+    for history in random.sample(histories, min(args.lookups, len(histories))):
+        board = chess.Board()
+        for move in history.column("moves")[: random.randrange(len(history))]:
+            board.push(unpack_move(move))
+        hits.append(board)
+    misses = [board.copy() for board in hits]
+    for board in misses:
+        # two random plies mostly leave the book
+        for _ in range(2):
+            if board.is_game_over():
+                break
+            board.push(random.choice(list(board.legal_moves)))
+
+    with OpeningBook(path, max_ply=None) as weighted:
+        print("weighted hit  %8.1f us/lookup" % (lookup_time(weighted, hits) * 1e6))
+    print("best     hit  %8.1f us/lookup" % (lookup_time(book, hits) * 1e6))
+    print("         miss %8.1f us/lookup" % (lookup_time(book, misses) * 1e6))
+    print("%.2f of the misses left the book" % (book.misses / len(misses)))
+
+    start = perf_counter()
+    for board in hits:
+        random.choice(list(board.legal_moves))
+    print(
+        "random move %8.1f us/choice"
+        % ((perf_counter() - start) / len(hits) * 1e6)
+    )
+    book.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark of the Lazy SMP search scaling with the number of workers.
+
+For each worker count, every position of the bench_search suite is searched
+for a fixed time, giving the nodes per second of all workers, then to a fixed
+depth, giving the time to depth. Workers are started before the timings, and
+the shared table is cleared before each search.
+
+Scaling is bounded by the CPUs of the machine: more workers than CPUs only
+share them.
+"""
+
+import argparse
+import os
+
+import chess
+
+from bench_search import POSITIONS
+from parallel_search import ParallelSearcher
+from search import SearchLimits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4,8,16")
+    parser.add_argument("--time", type=float, default=1.0, help="seconds per position")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--table-entries", type=int, default=1 << 20)
+    args = parser.parse_args()
+
+    print("%d CPUs" % (os.cpu_count() or 1))
+    print(
+        "%-8s %10s %8s %14s %8s"
+        % ("workers", "nps", "speedup", "time to depth", "speedup")
+    )
+    baseline_nps = baseline_time = None
+    for n_workers in (int(n) for n in args.workers.split(",")):
+        with ParallelSearcher(n_workers, args.table_entries) as searcher:
+            nodes = 0
+            elapsed = 0.0
+            for _, fen in POSITIONS:
+                searcher.table.clear()
+                result = searcher.search(chess.Board(fen), SearchLimits(time=args.time))
+                nodes += result.nodes
+                elapsed += result.time
+            nps = nodes / elapsed
+
+            time_to_depth = 0.0
+            for _, fen in POSITIONS:
+                searcher.table.clear()
+                result = searcher.search(
+                    chess.Board(fen), SearchLimits(depth=args.depth)
+                )
+                time_to_depth += result.time
+
+        baseline_nps = baseline_nps or nps
+        baseline_time = baseline_time or time_to_depth
+        print(
+            "%-8d %10.0f %7.2fx %13.2fs %7.2fx"
+            % (
+                n_workers,
+                nps,
+                nps / baseline_nps,
+                time_to_depth,
+                baseline_time / time_to_depth,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark of the alpha-beta search speed, in nodes per second.
+
+Each position of the suite, the six perft positions of the Chess Programming
+Wiki, is searched by a fresh Searcher to a fixed depth, or for a fixed time.
+Nodes include quiescence nodes.
+"""
+
+import argparse
+from typing import List, Tuple
+
+import chess
+
+from search import Searcher, SearchLimits
+
+POSITIONS: List[Tuple[str, str]] = [
+    ("start", chess.STARTING_FEN),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"),
+    (
+        "position 6",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    ),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument(
+        "--time", type=float, default=None, help="seconds per position, instead of depth"
+    )
+    args = parser.parse_args()
+    limits = (
+        SearchLimits(time=args.time)
+        if args.time is not None
+        else SearchLimits(depth=args.depth)
+    )
+
+    print(
+        "%-12s %6s %6s %10s %8s %10s  %s"
+        % ("position", "depth", "move", "nodes", "time (s)", "nps", "score")
+    )
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen in POSITIONS:
+        result = Searcher().search(chess.Board(fen), limits)
+        total_nodes += result.nodes
+        total_time += result.time
+        print(
+            "%-12s %6d %6s %10d %8.2f %10.0f  %d"
+            % (
+                name,
+                result.depth,
+                result.move,
+                result.nodes,
+                result.time,
+                result.nps,
+                result.score,
+            )
+        )
+    print(
+        "%-12s %6s %6s %10d %8.2f %10.0f"
+        % ("total", "", "", total_nodes, total_time, total_nodes / total_time)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Load test of RandomPlayer pairs against the Python stand-in game server.
+
+The server runs on its own event loop thread, as a separate web2server process
+would; players share the chess loop, which also runs the load test itself. Each
+pair plays games concurrently, the inviter sending every invitation at once.
+"""
+
+import argparse
+import asyncio
+import logging
+import socket
+from time import perf_counter
+from typing import Callable, Optional
+
+from account_configuration import AccountConfiguration
+from concurrency import handle_threaded_coroutines
+from game_server import GameServer, WebsocketGameServer
+from random_player import RandomPlayer
+from server_configuration import ServerConfiguration
+from transport import Transport
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+async def play(
+    n_pairs: int,
+    n_games: int,
+    configuration: ServerConfiguration,
+    make_transport: Optional[Callable[[], Transport]] = None,
+) -> float:
+    """Plays n_games per pair and returns the elapsed time, in seconds."""
+    make_transport = make_transport or (lambda: None)
+    pairs = [
+        (
+            RandomPlayer(
+                AccountConfiguration("inviter%d" % i, None),
+                server_configuration=configuration,
+                max_concurrent_games=n_games,
+                log_level=logging.WARNING,
+                transport=make_transport(),
+            ),
+            RandomPlayer(
+                AccountConfiguration("invitee%d" % i, None),
+                server_configuration=configuration,
+                max_concurrent_games=n_games,
+                log_level=logging.WARNING,
+                transport=make_transport(),
+            ),
+        )
+        for i in range(n_pairs)
+    ]
+    for inviter, invitee in pairs:
+        await inviter.chess_client.logged_in.wait()
+        await invitee.chess_client.logged_in.wait()
+
+    start = perf_counter()
+    await asyncio.gather(
+        *(
+            coroutine
+            for inviter, invitee in pairs
+            for coroutine in (
+                inviter._send_invites(invitee.username, n_games),
+                invitee._accept_invites(inviter.username, n_games),
+            )
+        )
+    )
+    return perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pairs", type=int, default=10)
+    parser.add_argument("--games", type=int, default=5, help="games per pair")
+    args = parser.parse_args()
+
+    port = _free_port()
+    game_server = GameServer(broadcast_room_list=False)
+    WebsocketGameServer(game_server).start_in_thread("localhost", port)
+
+    configuration = ServerConfiguration("localhost:%d" % port, "")
+    elapsed = asyncio.run(
+        handle_threaded_coroutines(play(args.pairs, args.games, configuration))
+    )
+
+    n_games = args.pairs * args.games
+    n_moves = sum(room.board.ply() for room in game_server.rooms.values())
+    print(
+        "%d games, %d moves in %.2fs: %.1f games/s, %.0f moves/s"
+        % (n_games, n_moves, elapsed, n_games / elapsed, n_moves / elapsed)
+    )
+    print("%-18s %10s %12s %12s" % ("server event", "count", "mean (us)", "max (us)"))
+    for event, stats in sorted(game_server.timings.items()):
+        print(
+            "%-18s %10d %12.1f %12.1f"
+            % (event, stats.count, stats.mean * 1e6, stats.maximum * 1e6)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark of event publication with thousands of outstanding waiters.
+
+Waiters are spread over the events the server emits, each filtering on one
+room, as Player code waiting for a specific room does. The registry indexed by
+event name is compared with a single list scanned on every event.
+"""
+
+import asyncio
+from time import perf_counter
+from typing import Any, List, Tuple
+
+from codec import SERVER_EVENTS
+from subscriptions import Predicate, SubscriptionRegistry
+
+
+class FlatRegistry:
+    """Unindexed reference: every published event scans every waiter."""
+
+    def __init__(self):
+        self._waiters: List[Tuple[str, Predicate, "asyncio.Future[Any]"]] = []
+
+    def expect(self, event: str, predicate: Predicate) -> "asyncio.Future[Any]":
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((event, predicate, future))
+        return future
+
+    def publish(self, event: str, payload: Any) -> int:
+        delivered = 0
+        for waiter_event, predicate, future in self._waiters:
+            if waiter_event == event and not future.done() and predicate(payload):
+                future.set_result(payload)
+                delivered += 1
+        return delivered
+
+
+def _room_predicate(room_id: str) -> Predicate:
+    return lambda payload: payload["roomId"] == room_id
+
+
+async def run(registry: Any, n_waiters: int, n_events: int) -> float:
+    futures = []
+    for i in range(n_waiters):
+        event = SERVER_EVENTS[i % len(SERVER_EVENTS)]
+        futures.append(registry.expect(event, _room_predicate("room-%d" % i)))
+
+    # events for rooms nobody waits on, so the waiter population stays constant
+    payload = {"roomId": "room-unknown"}
+    start = perf_counter()
+    for i in range(n_events):
+        registry.publish("playerJoined", payload)
+    elapsed = perf_counter() - start
+
+    for future in futures:
+        future.cancel()
+    return elapsed / n_events
+
+
+async def bench():
+    for n_waiters in (1000, 10000, 50000):
+        n_events = max(100, 1000000 // n_waiters)
+        indexed = await run(SubscriptionRegistry(), n_waiters, n_events)
+        flat = await run(FlatRegistry(), n_waiters, n_events)
+        print(
+            f"{n_waiters:6d} waiters: indexed {indexed * 1e6:9.2f} us/event   "
+            f"flat scan {flat * 1e6:9.2f} us/event   ({flat / indexed:.1f}x)"
+        )
+
+
+def main():
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()
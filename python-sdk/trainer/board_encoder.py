@@ -0,0 +1,173 @@
+"""This module encodes batches of positions into input planes for learned policies.
+
+A position is encoded as 18 planes of 8x8 squares, where plane[rank, file] is
+the square rank * 8 + file (a1 is [0, 0]):
+
+- 0 to 5: white pawns, knights, bishops, rooks, queens and king,
+- 6 to 11: the same for black,
+- 12: side to move, all ones when white is to move,
+- 13 to 16: white kingside, white queenside, black kingside and black queenside
+  castling rights,
+- 17: the en passant square.
+
+Piece and en passant planes are unpacked from the python-chess bitboards with a
+single np.unpackbits over the whole batch.
+"""
+
+from typing import Any, List, Optional, Sequence, Union
+
+import chess
+import numpy as np
+
+N_PLANES = 18
+SIDE_PLANE = 12
+CASTLING_PLANES = slice(13, 17)
+EN_PASSANT_PLANE = 17
+
+# squares of the rooks whose castling rights planes 13 to 16 encode
+_CASTLING_SQUARES = np.array([chess.H1, chess.A1, chess.H8, chess.A8], dtype=np.uint64)
+
+# 12 piece bitboards and the en passant bitboard
+N_BITBOARDS = 13
+
+Position = Union[chess.Board, str]
+
+
+def extend_bitboards(board: chess.Board, bitboards: List[int]):
+    """Appends the bitboards of white pawns to kings, black pawns to kings and
+    of the en passant square of a position.
+
+    :param board: The position.
+    :type board: chess.Board
+    :param bitboards: The list to extend with 13 bitboards.
+    :type bitboards: List[int]
+    """
+    black, white = board.occupied_co
+    pawns, knights, bishops = board.pawns, board.knights, board.bishops
+    rooks, queens, kings = board.rooks, board.queens, board.kings
+    ep_square = board.ep_square
+    bitboards += (
+        pawns & white,
+        knights & white,
+        bishops & white,
+        rooks & white,
+        queens & white,
+        kings & white,
+        pawns & black,
+        knights & black,
+        bishops & black,
+        rooks & black,
+        queens & black,
+        kings & black,
+        0 if ep_square is None else 1 << ep_square,
+    )
+
+
+def _encode_into(
+    positions: Sequence[Position], planes: np.ndarray, buffer: np.ndarray
+) -> np.ndarray:
+    """Fills every plane of planes, of shape (n, 18, 8, 8), using buffer, of
+    shape (n, 13) and little endian uint64, for the bitboards."""
+    n = len(positions)
+    bitboards: List[int] = []
+    turns: List[bool] = []
+    castling: List[int] = []
+    for position in positions:
+        board = chess.Board(position) if isinstance(position, str) else position
+        extend_bitboards(board, bitboards)
+        turns.append(board.turn)
+        castling.append(board.castling_rights)
+
+    buffer.reshape(-1)[:] = bitboards
+    bits = np.unpackbits(
+        buffer.view(np.uint8), bitorder="little"
+    ).reshape(n, N_BITBOARDS, 8, 8)
+    planes[:, :12] = bits[:, :12]
+    planes[:, EN_PASSANT_PLANE] = bits[:, 12]
+    planes[:, SIDE_PLANE] = np.array(turns)[:, None, None]
+    planes[:, CASTLING_PLANES] = (
+        (np.array(castling, dtype=np.uint64)[:, None] >> _CASTLING_SQUARES)
+        & np.uint64(1)
+    )[:, :, None, None]
+    return planes
+
+
+class BoardEncoder:
+    """Encodes batches of positions into a preallocated array of planes.
+
+    The array returned by encode is a view of the encoder's buffer, overwritten
+    by the next call: copy it to keep it.
+    """
+
+    def __init__(self, max_batch: int = 1024, dtype: Any = np.float32):
+        """
+        :param max_batch: Largest number of positions encoded at once.
+        :type max_batch: int
+        :param dtype: The dtype of the planes.
+        :type dtype: numpy dtype
+        """
+        self._max_batch = max_batch
+        self._planes = np.zeros((max_batch, N_PLANES, 8, 8), dtype=dtype)
+        # little endian, so that byte j bit k is square 8 * j + k
+        self._bitboards = np.zeros((max_batch, N_BITBOARDS), dtype="<u8")
+
+    def encode(self, positions: Sequence[Position]) -> np.ndarray:
+        """Encodes positions, given as boards or FENs.
+
+        :param positions: At most max_batch positions.
+        :type positions: Sequence[Union[chess.Board, str]]
+        :return: The planes, of shape (len(positions), 18, 8, 8).
+        :rtype: np.ndarray
+        """
+        n = len(positions)
+        if n > self._max_batch:
+            raise ValueError(f"Expected at most {self._max_batch} positions, got {n}")
+        return _encode_into(positions, self._planes[:n], self._bitboards[:n])
+
+    @property
+    def max_batch(self) -> int:
+        return self._max_batch
+
+
+def encode_positions(
+    positions: Sequence[Position], out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Encodes positions into a new array, or directly into out, without the
+    buffers of a BoardEncoder.
+
+    :param positions: The positions, as boards or FENs.
+    :type positions: Sequence[Union[chess.Board, str]]
+    :param out: Optional array of shape (len(positions), 18, 8, 8) to fill.
+    :type out: np.ndarray, optional
+    :return: The planes.
+    :rtype: np.ndarray
+    """
+    n = len(positions)
+    if out is None:
+        out = np.empty((n, N_PLANES, 8, 8), dtype=np.float32)
+    elif out.shape != (n, N_PLANES, 8, 8):
+        raise ValueError(
+            f"Expected out of shape {(n, N_PLANES, 8, 8)}, got {out.shape}"
+        )
+    return _encode_into(positions, out, np.empty((n, N_BITBOARDS), dtype="<u8"))
+
+
+def encode_board(board: chess.Board) -> np.ndarray:
+    """Reference square by square encoding of a single board, for tests and
+    benchmarks.
+
+    :return: The planes, of shape (18, 8, 8).
+    :rtype: np.ndarray
+    """
+    planes = np.zeros((N_PLANES, 8, 8), dtype=np.float32)
+    for square, piece in board.piece_map().items():
+        plane = piece.piece_type - 1 + (0 if piece.color == chess.WHITE else 6)
+        planes[plane, square >> 3, square & 7] = 1
+    if board.turn == chess.WHITE:
+        planes[SIDE_PLANE] = 1
+    for i, square in enumerate(_CASTLING_SQUARES.tolist()):
+        if board.castling_rights & chess.BB_SQUARES[square]:
+            planes[CASTLING_PLANES.start + i] = 1
+    if board.ep_square is not None:
+        planes[EN_PASSANT_PLANE, board.ep_square >> 3, board.ep_square & 7] = 1
+    return planes
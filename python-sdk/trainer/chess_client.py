@@ -1,11 +1,12 @@
 import asyncio
-import json
 import logging
-from asyncio import CancelledError, Event, Lock, create_task, sleep
+import random
+from asyncio import CancelledError, Event, Task, create_task, shield, sleep
+from collections import deque
 from logging import Logger
 from time import perf_counter
 import time
-from typing import Any, List, Optional, Set
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set
 
 import requests
 import websockets.client as ws
@@ -13,12 +14,40 @@ from websockets.exceptions import ConnectionClosedOK, ConnectionClosed
 
 from account_configuration import AccountConfiguration
 from server_configuration import ServerConfiguration, LocalhostServerConfiguration
+from codec import (
+    KIND_ACK,
+    KIND_CONNECT,
+    KIND_EVENT,
+    KIND_OPEN,
+    KIND_PING,
+    KIND_PONG,
+    EventHandler,
+    EventRouter,
+    Packet,
+    decode_event,
+    decode_frame,
+    peek_event,
+    encode_connect,
+)
+import json_backend
+from correlation import PendingRequests
+from flow_control import FlowControlConfiguration, InboundFlowControl
+from mailbox import RoomMailboxes, room_of
+from outbound import OutboundQueue
+from payloads import GameStart, Invitation, build_payload
+from stats import RunningStats
+from subscriptions import Predicate, Subscription, SubscriptionRegistry
+from transport import Transport, WebsocketTransport
 from concurrency import (
     CHESS_LOOP,
     create_in_chess_loop,
     handle_threaded_coroutines,
 )
 
+INVITE_REQUEST = "invitePlayer"
+ACCEPT_REQUEST = "acceptInvitation"
+INVITATION_SENT_PREFIX = "Invitation sent to "
+
 class ChessClient:
     def __init__(
         self,
@@ -29,29 +58,72 @@ class ChessClient:
         start_listening: bool = True,
         ping_interval: Optional[float] = 20.0,
         ping_timeout: Optional[float] = 20.0,
-        autostart: bool = True
+        autostart: bool = True,
+        send_queue_size: int = 1024,
+        send_batch_size: int = 64,
+        flow_control: Optional[FlowControlConfiguration] = None,
+        ack_requests: bool = False,
+        reconnect: bool = True,
+        reconnect_base_delay: float = 0.5,
+        reconnect_max_delay: float = 30.0,
+        max_reconnect_attempts: Optional[int] = None,
+        transport: Optional[Transport] = None,
     ):
         
         self._server_configuration = server_configuration
         self._account_configuration = account_configuration
         self._logger: Logger = self._create_logger(log_level)
 
-        self._active_tasks: Set[Any] = set()
         self._ping_interval = ping_interval
         self._ping_timeout = ping_timeout
 
+        self._transport: Transport = transport or WebsocketTransport()
+
         self.connected = create_in_chess_loop(Event)
-        self.invitation_sent = create_in_chess_loop(Event)
-        self.invitation_response = None
         self._logged_in: Event = create_in_chess_loop(Event)
-        self._sending_lock = create_in_chess_loop(Lock)
+        self._outbound: OutboundQueue = create_in_chess_loop(
+            OutboundQueue, send_queue_size, send_batch_size
+        )
+        self._writer_task: Optional[asyncio.Task[Any]] = None
+        self._ack_requests = ack_requests
+        self._pending_requests = PendingRequests()
+
+        self._reconnect = reconnect
+        self._reconnect_base_delay = reconnect_base_delay
+        self._reconnect_max_delay = reconnect_max_delay
+        self._max_reconnect_attempts = max_reconnect_attempts
+        self._closing: bool = False
+        self._resuming: bool = False
+        self._disconnected_at: Optional[float] = None
+        self._reconnect_time = RunningStats()
+        self._reconnects: int = 0
 
         self.websocket: ws.WebSocketClientProtocol
         self.sid = None
+        self.session_id: Optional[str] = None
+        self.user_id: Optional[str] = None
         
         self.player_name = None
         self.autostart = autostart
 
+        self._packet_handlers: Dict[str, Callable[[Packet], Awaitable[None]]] = {
+            KIND_OPEN: self._on_open_packet,
+            KIND_CONNECT: self._on_connect_packet,
+            KIND_EVENT: self._on_event_packet,
+            KIND_PING: self._on_ping_packet,
+            KIND_ACK: self._on_ack_packet,
+        }
+        self._event_router: EventRouter = self._create_event_router()
+        self._subscriptions = SubscriptionRegistry()
+        self._mailboxes = RoomMailboxes(self._dispatch_event, self._logger)
+        self._flow_control: Optional[InboundFlowControl] = None
+        if flow_control is not None:
+            self._flow_control = InboundFlowControl(flow_control, self._mailboxes)
+        # events received while the mailboxes drain, in order, and the task
+        # handling them once drained
+        self._held_packets: Optional[Deque[Packet]] = None
+        self._resume_task: Optional[Task[Any]] = None
+
         if start_listening:
             self._listening_coroutine = asyncio.run_coroutine_threadsafe(
                 self.listen(), CHESS_LOOP
@@ -63,75 +135,296 @@ class ChessClient:
         try:
             #message = await self.websocket.recv()
             #self.logger.info(f"\033[93m\033[1m<<<\033[0m Received raw message: {message}")
-            if message.startswith('0'):  # Socket.IO handshake
-                await self.handle_handshake(message[1:])
-            elif message.startswith('40'):  # Socket.IO connection established
-                self.logger.info("Socket.IO connection established")
-                self.connected.set()
-
-                # after we are connected, we can login with our username
-                await self.log_in(self.username)
-
-            elif message.startswith('42'):  # Socket.IO event
-                await self.handle_event(message[2:])
-            elif message == '2':  # Socket.IO ping
-                await self.send_message('3')  # Respond with pong
+            packet = decode_frame(message)
+            held = self._held_packets
+            if held is not None and packet.kind == KIND_EVENT:
+                # reading goes on while the mailboxes drain, so that pings and
+                # acks are still handled, unless too many events are held
+                if self._accepts(peek_event(packet.data)):
+                    held.append(packet)
+                    if len(held) >= self._flow_control.configuration.high_watermark:
+                        await shield(self._resume_task)
+                return
+            await self._handle_packet(packet)
         except ConnectionClosed:
             self.logger.error("WebSocket connection closed")
             self.connected.clear()
 
+    async def _handle_packet(self, packet: Packet):
+        handler = self._packet_handlers.get(packet.kind)
+        if handler is not None:
+            await handler(packet)
+        else:
+            self.logger.debug("Unhandled packet: %s", packet)
+
+    async def _resume_reading(self):
+        held = self._held_packets
+        flow_control = self._flow_control
+        try:
+            while True:
+                await flow_control.drained()
+                while held and not flow_control.check():
+                    await self._handle_packet(held.popleft())
+                if not held:
+                    break
+        finally:
+            self._held_packets = None
+            self._resume_task = None
+
+    async def _on_open_packet(self, packet: Packet):
+        # Engine.IO handshake
+        await self.handle_handshake(packet.data)
+
+    async def _on_connect_packet(self, packet: Packet):
+        await self._on_connected()
+
+    async def _on_connected(self):
+        # Socket.IO connection established
+        self.logger.info("Socket.IO connection established")
+        self.connected.set()
+        # events sent before the connection is acknowledged would be dropped
+        self._start_writer()
+
+        # after we are connected, we can login with our username, unless we are
+        # resuming a session, in which case the session event tells us whether
+        # the server still knows it
+        if not self._resuming:
+            await self.log_in(self.username)
+
+    async def _on_event_packet(self, packet: Packet):
+        await self.handle_event(packet.data)
+
+    async def _on_ack_packet(self, packet: Packet):
+        if packet.ack_id is None:
+            return
+        args = json_backend.loads(packet.data) if packet.data else []
+        self._pending_requests.resolve_ack(
+            packet.ack_id, args[0] if len(args) == 1 else args
+        )
+
+    async def _on_ping_packet(self, packet: Packet):
+        # Respond with pong, ahead of any pending frame
+        await self.send_message(KIND_PONG, priority=True, key=KIND_PONG)
+
     async def handle_handshake(self, data):
-        handshake_data = json.loads(data)
+        handshake_data = json_backend.loads(data)
         self.sid = handshake_data['sid']
         self.ping_interval = handshake_data.get('pingInterval', 25000) / 1000
         self.ping_timeout = handshake_data.get('pingTimeout', 20000) / 1000
         self.logger.info(f"\033[96m\033[1m===\033[0m Handshake successful. SID: {self.sid}")
-        await self.send_message('40')
+        # the writer only starts once connected, so this is the only sender
+        await self._write(encode_connect(self._connect_auth()))
         self.connected.set()
         self.logger.info("\033[92m\033[1m=== ===\033[0m WebSocket Connected \033[92m\033[1m=== ===\033[0m")
     
+    def _connect_auth(self) -> Optional[Dict[str, Any]]:
+        # resumes the current session, if any
+        if self.session_id is None:
+            return None
+        self._resuming = True
+        return {"sessionID": self.session_id}
+
+    def _accepts(self, event: Optional[str]) -> bool:
+        if (
+            event is not None
+            and event not in self._event_router
+            and not self._subscriptions.has_waiters(event)
+        ):
+            # no handler: skip decoding the payload, eg. large room lists
+            self.logger.debug("Unhandled event: %s", event)
+            return False
+        flow_control = self._flow_control
+        return flow_control is None or not flow_control.should_shed(event)
+
+    def _enqueue_event(self, event: str, payload: Any):
+        payload = build_payload(event, payload)
+        self.logger.info(
+            "\033[92m\033[1m>>>\033[0m Received event: %s, payload: %s", event, payload
+        )
+        self._mailboxes.put(event, payload)
+
     async def handle_event(self, data):
-        event_data = json.loads(data)
-        event = event_data[0]
-        payload = event_data[1] if len(event_data) > 1 else None
-        self.logger.info(f"\033[92m\033[1m>>>\033[0m Received event: {event}, payload: {payload}")
-        if event == 'playerNameSet':
-            self.player_name = payload.get('name')
-            if self.player_name: 
-                self.logger.info(f"\033[92m\033[1m=== ===\033[0m Player name set: {self.player_name} \033[92m\033[1m=== ===\033[0m")
-                self._logged_in.set()
-
-        elif event == 'invitationSent':
-            self.invitation_response = payload
-            self.invitation_sent.set()
-        elif event == 'invitationError':
-            self.invitation_response = payload
-            self.invitation_sent.set()
-        elif event == 'invitation':
-            if payload and 'from' in payload and 'roomId' in payload:
-                await self._handle_invite_request(payload['from'], payload['roomId'])
-        
-        elif event == 'inviteAccepted':
-            self.logger.info("\033[96m\033[1m=== ===\033[0m Player Accepted Invite \033[96m\033[1m=== ===\033[0m")
-            game_tag = payload.get("roomId")
-            await self._handle_accepted_invite(game_tag)
-
-        elif event == 'playerJoined':
-            self.logger.info(f"Joined Room EVENT: {payload}")
-            game_tag = payload.get("roomId")
-            #await self._handle_playerJoined(game_tag)
-
-        elif event == 'gameStart':
-            self.logger.info(f"Game Started. W: {payload.get('white')} B: {payload.get('black')}")
-            #update game object
-            await self._handle_game_start(payload)
-
-        elif event == 'gameState':
-            self.logger.info(f"Game state update: {payload}")
-            await self._handle_ingame_message(payload)
-        
-        
+        if not self._accepts(peek_event(data)):
+            return
+        event, payload = decode_event(data)
+        self._enqueue_event(event, payload)
+        if (
+            self._flow_control is not None
+            and self._held_packets is None
+            and self._flow_control.check()
+        ):
+            # holds incoming events while the mailboxes are full
+            self._held_packets = deque()
+            self._resume_task = create_task(self._resume_reading())
+
+    def deliver_event(self, event: str, payload: Any):
+        """Hands an already decoded event to the client, as in-memory transports
+        do.
+
+        :param event: The event name.
+        :type event: str
+        :param payload: The event payload, as decoded from JSON.
+        :type payload: Any
+        """
+        if self._accepts(event):
+            self._enqueue_event(event, payload)
+
+    def _create_event_router(self) -> EventRouter:
+        router = EventRouter(self.logger)
+        router.register('session', self._on_session)
+        router.register('playerNameSet', self._on_player_name_set)
+        router.register('invitationSent', self._on_invitation_response)
+        router.register('invitationError', self._on_invitation_response)
+        router.register('invitation', self._on_invitation)
+        router.register('inviteAccepted', self._on_invite_accepted)
+        router.register('playerJoined', self._on_player_joined)
+        router.register('gameStart', self._on_game_start)
+        router.register('gameState', self._on_game_state)
+        router.register('gameOver', self._on_game_over)
+        router.register('invalidMove', self._on_invalid_move)
+        return router
+
+    async def _on_session(self, payload):
+        session_id = payload.get('sessionID')
+        resumed = (
+            self._resuming
+            and session_id == self.session_id
+            and payload.get('playerName') == self.username
+        )
+        self.session_id = session_id
+        self.user_id = payload.get('userID')
+
+        if not self._resuming:
+            return
+        self._resuming = False
+        if resumed:
+            # states re-requested by the resume must not be dropped as stale
+            self._mailboxes.reset()
+            self.player_name = self.username
+            self._logged_in.set()
+            self._session_resumed()
+            await self._handle_session_resumed()
+        else:
+            self.logger.warning("Session could not be resumed, logging in again")
+            await self.log_in(self.username)
+
+    def _session_resumed(self):
+        if self._disconnected_at is not None:
+            self._reconnect_time.add(perf_counter() - self._disconnected_at)
+            self._disconnected_at = None
+        self.logger.info(
+            "\033[92m\033[1m=== ===\033[0m Session %s resumed in %.3fs \033[92m\033[1m=== ===\033[0m",
+            self.session_id,
+            self._reconnect_time.last,
+        )
 
+    async def _handle_session_resumed(self):
+        pass
+
+    async def _handle_game_over(self, game_tag: Optional[str], payload):
+        pass
+
+    async def _on_player_name_set(self, payload):
+        self.player_name = payload.get('name')
+        if self.player_name: 
+            self.logger.info(f"\033[92m\033[1m=== ===\033[0m Player name set: {self.player_name} \033[92m\033[1m=== ===\033[0m")
+            if self._disconnected_at is not None:
+                # reconnected, but the session was lost
+                self._reconnect_time.add(perf_counter() - self._disconnected_at)
+                self._disconnected_at = None
+            self._logged_in.set()
+
+    async def _on_invitation_response(self, payload):
+        # invitationSent names the invitee in its message, invitationError does
+        # not and resolves the oldest pending invite
+        invitee = None
+        message = payload.get('message') if payload else None
+        if message and message.startswith(INVITATION_SENT_PREFIX):
+            invitee = message[len(INVITATION_SENT_PREFIX):]
+        self._pending_requests.resolve(INVITE_REQUEST, invitee, payload)
+
+    async def _on_invitation(self, payload: Invitation):
+        if payload and payload.inviter and payload.room_id:
+            await self._handle_invite_request(payload.inviter, payload.room_id)
+
+    async def _on_invite_accepted(self, payload):
+        self.logger.info("\033[96m\033[1m=== ===\033[0m Player Accepted Invite \033[96m\033[1m=== ===\033[0m")
+        game_tag = payload.get("roomId")
+        await self._handle_accepted_invite(game_tag)
+
+    async def _on_player_joined(self, payload):
+        self.logger.info(f"Joined Room EVENT: {payload}")
+        game_tag = payload.get("roomId")
+        #await self._handle_playerJoined(game_tag)
+
+    async def _on_game_start(self, payload: GameStart):
+        self.logger.info(f"Game Started. W: {payload.white} B: {payload.black}")
+        #update game object
+        await self._handle_game_start(payload)
+
+    async def _on_game_state(self, payload):
+        self.logger.info("Game state update: %s", payload)
+        await self._handle_ingame_message(payload)
+
+    async def _on_game_over(self, payload):
+        self.logger.info(f"Game over: {payload}")
+        room_id = payload.get("roomId") if payload else None
+        if room_id is not None:
+            self._mailboxes.forget(room_id)
+        # web2server does not say which game is over
+        await self._handle_game_over(room_id, payload)
+
+    async def _on_invalid_move(self, payload):
+        self.logger.warning(f"Invalid move: {payload}")
+
+    async def _dispatch_event(self, event: str, payload: Any):
+        await self._event_router.dispatch(event, payload)
+        self._subscriptions.publish(event, payload)
+
+    def subscribe(self, event: str, predicate: Optional[Predicate] = None) -> Subscription:
+        """Subscribes to every payload of a server event matching predicate.
+
+        Payloads are delivered after the client's own handler ran, and buffered
+        until read with Subscription.get.
+
+        :param event: The event name.
+        :type event: str
+        :param predicate: Optional filter on payloads.
+        :type predicate: Callable[[Any], bool], optional
+        :return: The subscription, to be closed when no longer needed.
+        :rtype: Subscription
+        """
+        return self._subscriptions.subscribe(event, predicate)
+
+    async def wait_for(
+        self,
+        event: str,
+        predicate: Optional[Predicate] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Waits for the next payload of a server event matching predicate.
+
+        :param event: The event name.
+        :type event: str
+        :param predicate: Optional filter on payloads.
+        :type predicate: Callable[[Any], bool], optional
+        :param timeout: Seconds to wait.
+        :type timeout: float, optional
+        :raises asyncio.TimeoutError: If no payload arrived within timeout.
+        :return: The payload.
+        :rtype: Any
+        """
+        return await self._subscriptions.wait_for(event, predicate, timeout)
+
+    def register_event_handler(self, event: str, handler: EventHandler):
+        """Registers a coroutine handling every occurrence of a server event.
+
+        :param event: The event name.
+        :type event: str
+        :param handler: Coroutine function called with the event payload.
+        :type handler: EventHandler
+        """
+        self._event_router.register(event, handler)
 
     def _create_logger(self, log_level: Optional[int]) -> Logger:
         """Creates a logger for the client.
@@ -160,7 +453,7 @@ class ChessClient:
     async def log_in(self, name):
         # another name for the original register_name method
         await self.connected.wait()
-        await self.send_message(f'42["setPlayerName","{name}"]')
+        await self.emit("setPlayerName", name)
     
     def wait_for_connection(self, timeout=30):
         return asyncio.run_coroutine_threadsafe(
@@ -181,15 +474,64 @@ class ChessClient:
         except asyncio.TimeoutError:
             return False
 
-    async def invite_player(self, invitee:str):
+    async def request(
+        self,
+        kind: str,
+        event: str,
+        *args: Any,
+        key: Optional[Hashable] = None,
+        response: Optional[str] = None,
+        predicate: Optional[Predicate] = None,
+        timeout: Optional[float] = 5.0,
+    ) -> Any:
+        """Sends an event and waits for the server's response to it.
+
+        With ack_requests, the response is the Socket.IO ack of the event.
+        Otherwise, if response is given, it is the next response event matching
+        predicate. Else it is the response event matched to this request on kind
+        and key by the handler of that event, see PendingRequests.
+
+        :param kind: The request kind, which response events resolve.
+        :type kind: str
+        :param event: The event name.
+        :type event: str
+        :param key: The key response events are matched on.
+        :type key: Hashable, optional
+        :param response: The name of the response event to wait for.
+        :type response: str, optional
+        :param predicate: Filter on response payloads.
+        :type predicate: Callable[[Any], bool], optional
+        :param timeout: Seconds to wait for the response.
+        :type timeout: float, optional
+        :raises asyncio.TimeoutError: If no response arrived within timeout.
+        :return: The response payload.
+        :rtype: Any
+        """
+        if self._ack_requests:
+            ack_id, future = self._pending_requests.expect_ack(kind)
+            await self.send_message(self._transport.encode(event, args, ack_id))
+        elif response is not None:
+            # registered before sending, so the response cannot be missed
+            future = self._pending_requests.track(
+                kind, self._subscriptions.expect(response, predicate)
+            )
+            await self.emit(event, *args)
+        else:
+            future = self._pending_requests.expect(kind, key)
+            await self.emit(event, *args)
+        return await self._pending_requests.wait(future, kind, timeout)
+
+    async def invite_player(self, invitee:str, timeout: Optional[float] = 5.0):
         await self.connected.wait()
         assert self._logged_in.is_set(), f"Expected {self.username} to be logged in."
-        self.invitation_sent.clear()
-        await self.send_message(f'42["invitePlayer", {{"invitee": "{invitee}"}}]')
-        # Wait for response
         try:
-            await asyncio.wait_for(self.invitation_sent.wait(), timeout=5.0)
-            return self.invitation_response
+            return await self.request(
+                INVITE_REQUEST,
+                "invitePlayer",
+                {"invitee": invitee},
+                key=invitee,
+                timeout=timeout,
+            )
         except asyncio.TimeoutError:
             self.logger.error("Timeout waiting for invitation response")
             return None
@@ -200,15 +542,21 @@ class ChessClient:
             CHESS_LOOP
         ).result()
 
-    async def accept_invite(self, roomId: str, inviter: str):
+    async def accept_invite(
+        self, roomId: str, inviter: str, timeout: Optional[float] = 5.0
+    ):
         await self.connected.wait()
-        await self.send_message(f'42["acceptInvitation", {{"roomId": "{roomId}"}}]')
-        self.logger.info(f"Accepted invitation from {inviter} at room {roomId}")
-        
-        # Wait for confirmation (you might want to adjust this based on your server's response)
+        self.logger.info(f"Accepting invitation from {inviter} at room {roomId}")
         try:
-            # Assuming your server sends a 'joinedRoom' event when successful
-            event = await asyncio.wait_for(self._wait_for_event('playerJoined'), timeout=5.0)
+            # the server confirms with a playerJoined event for the room
+            event = await self.request(
+                ACCEPT_REQUEST,
+                "acceptInvitation",
+                {"roomId": roomId},
+                response="playerJoined",
+                predicate=lambda payload: room_of(payload) == roomId,
+                timeout=timeout,
+            )
             self.logger.info(f"Successfully joined room: {event}")
             return True
         except asyncio.TimeoutError:
@@ -220,28 +568,53 @@ class ChessClient:
             self.accept_invite(roomId, inviter),
             CHESS_LOOP
         ).result()
-    
-    async def _wait_for_event(self, event_name: str):
-        # This is a helper method to wait for a specific event
-        future = asyncio.get_running_loop().create_future()
-        
-        def event_handler(data):
-            future.set_result(data)
-            self.websocket.remove_event_listener(event_name, event_handler)
-
-        self.websocket.add_event_listener(event_name, event_handler)
-        return await future
 
     async def handle_invitation(self, inviter: str, roomId: str):
         self.logger.info(f"Received invitation from {inviter} to join room {roomId}")
         return {'inviter': inviter, 'roomId': roomId}
     
-    async def send_message(self, data):
-        if self.websocket and self.websocket.open:
-            await self.websocket.send(data)
-            self.logger.info(f"\033[91m\033[1m<<<\033[0m Sent message: {data}")
-        else:
-            self.logger.error("WebSocket is not open")
+    async def send_message(
+        self, data: Any, *, priority: bool = False, key: Optional[Hashable] = None
+    ):
+        """Enqueues a raw frame, or a message encoded by the transport, for the
+        writer task.
+
+        :param data: The frame.
+        :type data: Any
+        :param priority: Whether the frame is sent ahead of pending frames.
+        :type priority: bool
+        :param key: Optional key. A pending frame with the same key is replaced.
+        :type key: Hashable, optional
+        """
+        await self._outbound.put(data, priority=priority, key=key)
+
+    async def emit(self, event: str, *args: Any, key: Optional[Hashable] = None):
+        """Encodes and enqueues a Socket.IO event.
+
+        :param event: The event name.
+        :type event: str
+        :param key: Optional key. A pending frame with the same key is replaced.
+        :type key: Hashable, optional
+        """
+        await self.send_message(self._transport.encode(event, args), key=key)
+
+    async def _write(self, data: Any):
+        await self._transport.send(data)
+        self.logger.info("\033[91m\033[1m<<<\033[0m Sent message: %s", data)
+
+    def _start_writer(self):
+        if self._writer_task is not None and not self._writer_task.done():
+            return
+        self._writer_task = create_task(self._outbound.run(self._write))
+
+    async def _stop_writer(self):
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except (CancelledError, ConnectionClosed):
+                pass
+            self._writer_task = None
 
     async def connect(self):
         ws_uri = f"ws://{self.websocket_url}/socket.io/?EIO=4&transport=websocket"
@@ -258,36 +631,78 @@ class ChessClient:
             return False
         
     async def listen(self):
-        """Listen to websocket and dispatch messages to be handled."""
+        """Listen to websocket and dispatch messages to be handled.
+
+        When the connection drops, reconnects with jittered exponential backoff
+        and resumes the Socket.IO session, unless reconnection is disabled or
+        stop_listening was called.
+        """
         self.logger.info("Starting listening to websocket")
-        ws_uri = f"ws://{self.websocket_url}/socket.io/?EIO=4&transport=websocket"
-        try:
-            async with ws.connect(
-                ws_uri,
-                extra_headers={"Origin": f"http://{self.websocket_url}"},
-                # max_queue=None,
-                # ping_interval=self._ping_interval,
-                # ping_timeout=self._ping_timeout,
-            ) as websocket:
-                self.websocket = websocket
-            
-                async for message in self.websocket:
-                    self.logger.info("\033[93m\033[1m>>>\033[0m %s", message)
-                    task = create_task(self.message_handler(str(message)))
-                    self._active_tasks.add(task)
-                    task.add_done_callback(self._active_tasks.discard)
+        attempt = 0
+        while True:
+            established = await self._listen_once()
+            if self._closing or not self._reconnect:
+                break
+            if established:
+                attempt = 0
+                self._disconnected_at = perf_counter()
+            if (
+                self._max_reconnect_attempts is not None
+                and attempt >= self._max_reconnect_attempts
+            ):
+                self.logger.error("Giving up reconnecting after %d attempts", attempt)
+                break
+
+            delay = self._backoff_delay(attempt)
+            attempt += 1
+            self._reconnects += 1
+            self.logger.warning(
+                "Reconnecting to %s in %.2fs (attempt %d)",
+                self.websocket_url,
+                delay,
+                attempt,
+            )
+            await sleep(delay)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        delay = min(
+            self._reconnect_max_delay, self._reconnect_base_delay * 2 ** attempt
+        )
+        # equal jitter, so that a fleet of clients does not reconnect in lockstep
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _listen_once(self) -> bool:
+        """Runs one transport connection until it closes.
 
+        :return: Whether the Socket.IO connection was established.
+        :rtype: bool
+        """
+        established = False
+        try:
+            await self._transport.run(self)
         except ConnectionClosedOK:
             self.logger.warning(
                 "Websocket connection with %s closed", self.websocket_url
             )
         except (CancelledError, RuntimeError) as e:
             self.logger.critical("Listen interrupted by %s", e)
+            self._closing = True
         except Exception as e:
             self.logger.exception(e)
+        finally:
+            established = self._logged_in.is_set()
+            if self._resume_task is not None:
+                self._resume_task.cancel()
+            self._held_packets = None
+            await self._stop_writer()
+            self.connected.clear()
+            self._logged_in.clear()
+            self._resuming = False
+        return established
 
     async def _stop_listening(self):
-        await self.websocket.close()
+        self._closing = True
+        await self._transport.close()
 
     async def stop_listening(self):
         await handle_threaded_coroutines(self._stop_listening())
@@ -321,6 +736,78 @@ class ChessClient:
         """
         return self._logger
 
+    @property
+    def request_latency(self) -> Dict[str, RunningStats]:
+        """Time between sending a request and receiving its response, per kind.
+
+        :return: The request latency statistics, in seconds.
+        :rtype: Dict[str, RunningStats]
+        """
+        return self._pending_requests.latency
+
+    @property
+    def reconnect_time(self) -> RunningStats:
+        """Time between losing the connection and being logged in again.
+
+        :return: The reconnect time statistics, in seconds.
+        :rtype: RunningStats
+        """
+        return self._reconnect_time
+
+    @property
+    def reconnects(self) -> int:
+        """
+        :return: The number of reconnection attempts.
+        :rtype: int
+        """
+        return self._reconnects
+
+    @property
+    def flow_control(self) -> Optional[InboundFlowControl]:
+        """Inbound flow control, reporting buffer occupancy and shed counts.
+
+        :return: The flow control, or None if it is disabled.
+        :rtype: InboundFlowControl, optional
+        """
+        return self._flow_control
+
+    @property
+    def coalesced_frames(self) -> int:
+        """Number of gameState frames dropped or replaced because a newer state of
+        the same room superseded them.
+
+        :return: The number of coalesced frames.
+        :rtype: int
+        """
+        return self._mailboxes.coalesced
+
+    @property
+    def send_queue_depth(self) -> int:
+        """Number of frames waiting for the writer task.
+
+        :return: The send queue depth.
+        :rtype: int
+        """
+        return self._outbound.depth
+
+    @property
+    def flush_latency(self) -> RunningStats:
+        """Time between enqueueing a frame and writing it to the websocket.
+
+        :return: The flush latency statistics, in seconds.
+        :rtype: RunningStats
+        """
+        return self._outbound.flush_latency
+
+    @property
+    def transport(self) -> Transport:
+        """The transport connecting the client to the server.
+
+        :return: The transport.
+        :rtype: Transport
+        """
+        return self._transport
+
     @property
     def server_configuration(self) -> ServerConfiguration:
         """The client's server configuration.
@@ -0,0 +1,272 @@
+"""This module contains the Engine.IO / Socket.IO frame codec used by the client.
+
+A websocket frame is parsed once into a :class:`Packet` holding the Engine.IO
+packet type, the Socket.IO packet type, the namespace, the ack id and the raw
+data. Events are then routed through an :class:`EventRouter`, a dispatch table
+keyed by event name.
+"""
+
+from logging import Logger
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+import json_backend
+
+# Engine.IO packet types
+EIO_OPEN = "0"
+EIO_CLOSE = "1"
+EIO_PING = "2"
+EIO_PONG = "3"
+EIO_MESSAGE = "4"
+EIO_UPGRADE = "5"
+EIO_NOOP = "6"
+
+# Socket.IO packet types
+SIO_CONNECT = "0"
+SIO_DISCONNECT = "1"
+SIO_EVENT = "2"
+SIO_ACK = "3"
+SIO_CONNECT_ERROR = "4"
+SIO_BINARY_EVENT = "5"
+SIO_BINARY_ACK = "6"
+
+# Packet kinds, i.e. the Engine.IO type followed by the Socket.IO type if any
+KIND_OPEN = EIO_OPEN
+KIND_CLOSE = EIO_CLOSE
+KIND_PING = EIO_PING
+KIND_PONG = EIO_PONG
+KIND_NOOP = EIO_NOOP
+KIND_CONNECT = EIO_MESSAGE + SIO_CONNECT
+KIND_DISCONNECT = EIO_MESSAGE + SIO_DISCONNECT
+KIND_EVENT = EIO_MESSAGE + SIO_EVENT
+KIND_ACK = EIO_MESSAGE + SIO_ACK
+KIND_CONNECT_ERROR = EIO_MESSAGE + SIO_CONNECT_ERROR
+
+DEFAULT_NAMESPACE = "/"
+
+# Events emitted by the web2server
+SERVER_EVENTS = (
+    "session",
+    "sessionData",
+    "playerNameSet",
+    "roomCreated",
+    "roomNotFound",
+    "playerJoined",
+    "joinedAsSpectator",
+    "playerLeft",
+    "sidesSwitched",
+    "roomListUpdate",
+    "invitation",
+    "invitationSent",
+    "invitationError",
+    "invitationDeclined",
+    "inviteAccepted",
+    "gameStart",
+    "gameState",
+    "gameOver",
+    "invalidMove",
+    "drawOffered",
+    "drawDeclined",
+    "newMessage",
+)
+
+_DIGITS = frozenset("0123456789")
+
+_new_packet = tuple.__new__
+
+
+class Packet(NamedTuple):
+    """A decoded websocket frame.
+
+    kind is the Engine.IO packet type, followed by the Socket.IO packet type for
+    Engine.IO messages (eg. '42' for an event). data is the raw, still encoded,
+    remainder of the frame."""
+
+    kind: str
+    namespace: str
+    ack_id: Optional[int]
+    data: str
+
+    @property
+    def eio_type(self) -> str:
+        return self.kind[0]
+
+    @property
+    def sio_type(self) -> Optional[str]:
+        return self.kind[1] if len(self.kind) > 1 else None
+
+
+def decode_frame(frame: str) -> Packet:
+    """Parses a websocket frame in a single pass.
+
+    :param frame: The raw websocket frame.
+    :type frame: str
+    :return: The decoded packet.
+    :rtype: Packet
+    """
+    if not frame:
+        return _new_packet(Packet, (KIND_NOOP, DEFAULT_NAMESPACE, None, ""))
+    if frame[0] != EIO_MESSAGE:
+        return _new_packet(Packet, (frame[0], DEFAULT_NAMESPACE, None, frame[1:]))
+
+    kind = frame[:2]
+    # fast path: default namespace and no ack id
+    if frame[2:3] == "[":
+        return _new_packet(Packet, (kind, DEFAULT_NAMESPACE, None, frame[2:]))
+    length = len(frame)
+    i = 2
+
+    # binary packets carry an attachment count terminated by '-'
+    if kind[1:] in (SIO_BINARY_EVENT, SIO_BINARY_ACK):
+        dash = frame.find("-", i)
+        if dash != -1:
+            i = dash + 1
+
+    namespace = DEFAULT_NAMESPACE
+    if i < length and frame[i] == "/":
+        comma = frame.find(",", i)
+        if comma == -1:
+            return _new_packet(Packet, (kind, frame[i:], None, ""))
+        namespace = frame[i:comma]
+        i = comma + 1
+
+    ack_id = None
+    if i < length and frame[i] in _DIGITS:
+        j = i + 1
+        while j < length and frame[j] in _DIGITS:
+            j += 1
+        ack_id = int(frame[i:j])
+        i = j
+
+    return _new_packet(Packet, (kind, namespace, ack_id, frame[i:]))
+
+
+def peek_event(data: str) -> Optional[str]:
+    """Reads the event name of an event packet without decoding its payload.
+
+    Event names are plain identifiers, so the name is the first JSON string of
+    the data. Returns None if the data does not start that way.
+
+    :param data: The data of an event packet.
+    :type data: str
+    :return: The event name.
+    :rtype: str, optional
+    """
+    if data[:2] != '["':
+        return None
+    end = data.find('"', 2)
+    if end == -1 or "\\" in data[2:end]:
+        return None
+    return data[2:end]
+
+
+def decode_event(data: str) -> Tuple[str, Any]:
+    """Decodes the data of an event packet into an event name and its payload.
+
+    :param data: The data of an event packet.
+    :type data: str
+    :return: The event name and payload, which is None if absent.
+    :rtype: Tuple[str, Any]
+    """
+    event_data = json_backend.loads(data)
+    return event_data[0], event_data[1] if len(event_data) > 1 else None
+
+
+def _prefix(kind: str, namespace: str, ack_id: Optional[int]) -> str:
+    prefix = kind
+    if namespace != DEFAULT_NAMESPACE:
+        prefix += namespace + ","
+    if ack_id is not None:
+        prefix += str(ack_id)
+    return prefix
+
+
+def encode_event(
+    event: str,
+    *args: Any,
+    namespace: str = DEFAULT_NAMESPACE,
+    ack_id: Optional[int] = None,
+) -> str:
+    """Encodes an event and its arguments into a websocket frame.
+
+    :param event: The event name.
+    :type event: str
+    :param namespace: The Socket.IO namespace. Defaults to '/'.
+    :type namespace: str
+    :param ack_id: Optional ack id requested from the server.
+    :type ack_id: int, optional
+    :return: The frame.
+    :rtype: str
+    """
+    return _prefix(KIND_EVENT, namespace, ack_id) + json_backend.dumps([event, *args])
+
+
+def encode_connect(
+    auth: Optional[Dict[str, Any]] = None, namespace: str = DEFAULT_NAMESPACE
+) -> str:
+    """Encodes a Socket.IO connection request, with optional auth payload.
+
+    :param auth: Optional handshake auth payload.
+    :type auth: Dict[str, Any], optional
+    :param namespace: The Socket.IO namespace. Defaults to '/'.
+    :type namespace: str
+    :return: The frame.
+    :rtype: str
+    """
+    frame = _prefix(KIND_CONNECT, namespace, None)
+    if auth:
+        frame += json_backend.dumps(auth)
+    return frame
+
+
+EventHandler = Callable[[Any], Awaitable[Any]]
+
+
+class EventRouter:
+    """Dispatch table routing Socket.IO events to registered coroutine handlers."""
+
+    def __init__(self, logger: Optional[Logger] = None):
+        self._handlers: Dict[str, EventHandler] = {}
+        self._logger = logger
+
+    def register(self, event: str, handler: EventHandler):
+        """Registers the handler of an event, replacing any previous one.
+
+        :param event: The event name.
+        :type event: str
+        :param handler: Coroutine function called with the event payload.
+        :type handler: EventHandler
+        """
+        self._handlers[event] = handler
+
+    def unregister(self, event: str):
+        self._handlers.pop(event, None)
+
+    def on(self, event: str) -> Callable[[EventHandler], EventHandler]:
+        """Decorator version of :meth:`register`."""
+
+        def decorator(handler: EventHandler) -> EventHandler:
+            self.register(event, handler)
+            return handler
+
+        return decorator
+
+    async def dispatch(self, event: str, payload: Any) -> bool:
+        """Calls the handler registered for event.
+
+        :return: Whether a handler was registered for the event.
+        :rtype: bool
+        """
+        handler = self._handlers.get(event)
+        if handler is None:
+            if self._logger is not None:
+                self._logger.debug("Unhandled event: %s", event)
+            return False
+        await handler(payload)
+        return True
+
+    @property
+    def events(self) -> Tuple[str, ...]:
+        return tuple(self._handlers)
+
+    def __contains__(self, event: object) -> bool:
+        return event in self._handlers
@@ -0,0 +1,186 @@
+"""This module correlates requests sent to the server with their responses.
+"""
+
+import asyncio
+from asyncio import Future
+from collections import defaultdict, deque
+from time import perf_counter
+from typing import Any, Deque, Dict, Hashable, Optional, Tuple
+
+from stats import RunningStats
+
+
+class _Request:
+    __slots__ = ("kind", "key", "future", "started")
+
+    def __init__(self, kind: str, key: Optional[Hashable], future: "Future[Any]"):
+        self.kind = kind
+        self.key = key
+        self.future = future
+        self.started = perf_counter()
+
+
+class PendingRequests:
+    """In-flight requests, each with its own future.
+
+    A request is resolved either by the Socket.IO ack carrying its ack id, when
+    the server acknowledges events, or by a response event matched on the
+    request kind and a key (eg. the invitee or the room id). A response without
+    a usable key resolves the oldest request of its kind, which is correct as
+    long as the server answers the requests of a socket in order.
+    """
+
+    def __init__(self):
+        self._next_ack_id: int = 0
+        self._by_ack: Dict[int, _Request] = {}
+        self._by_kind: Dict[str, Dict[int, _Request]] = defaultdict(dict)
+        self._by_key: Dict[Tuple[str, Hashable], Deque[_Request]] = defaultdict(deque)
+
+        self._latency: Dict[str, RunningStats] = defaultdict(RunningStats)
+        self._timeouts: Dict[str, int] = defaultdict(int)
+
+    def _new_request(self, kind: str, key: Optional[Hashable]) -> _Request:
+        return _Request(kind, key, asyncio.get_running_loop().create_future())
+
+    def expect_ack(self, kind: str) -> Tuple[int, "Future[Any]"]:
+        """Registers a request resolved by a Socket.IO ack.
+
+        :param kind: The request kind, used for latency statistics.
+        :type kind: str
+        :return: The ack id to send with the event, and the request's future.
+        :rtype: Tuple[int, Future]
+        """
+        ack_id = self._next_ack_id
+        self._next_ack_id += 1
+        request = self._new_request(kind, None)
+        self._by_ack[ack_id] = request
+        request.future.add_done_callback(lambda _: self._by_ack.pop(ack_id, None))
+        return ack_id, request.future
+
+    def expect(self, kind: str, key: Optional[Hashable] = None) -> "Future[Any]":
+        """Registers a request resolved by a response event.
+
+        :param kind: The request kind.
+        :type kind: str
+        :param key: The key the response is matched on.
+        :type key: Hashable, optional
+        :return: The request's future.
+        :rtype: Future
+        """
+        request = self._new_request(kind, key)
+        self._by_kind[kind][id(request)] = request
+        if key is not None:
+            self._by_key[(kind, key)].append(request)
+        request.future.add_done_callback(lambda _: self._discard(request))
+        return request.future
+
+    def track(self, kind: str, future: "Future[Any]") -> "Future[Any]":
+        """Records the latency of a request resolved elsewhere, eg. by an event
+        subscription.
+
+        :param kind: The request kind.
+        :type kind: str
+        :param future: The future resolved with the response.
+        :type future: Future
+        :return: future
+        :rtype: Future
+        """
+        started = perf_counter()
+
+        def record(done: "Future[Any]"):
+            if not done.cancelled():
+                self._latency[kind].add(perf_counter() - started)
+
+        future.add_done_callback(record)
+        return future
+
+    def _discard(self, request: _Request):
+        self._by_kind[request.kind].pop(id(request), None)
+        if request.key is not None:
+            requests = self._by_key.get((request.kind, request.key))
+            if requests is not None:
+                try:
+                    requests.remove(request)
+                except ValueError:
+                    pass
+                if not requests:
+                    del self._by_key[(request.kind, request.key)]
+
+    def _complete(self, request: _Request, value: Any) -> bool:
+        if request.future.done():
+            return False
+        self._latency[request.kind].add(perf_counter() - request.started)
+        request.future.set_result(value)
+        return True
+
+    def resolve_ack(self, ack_id: int, value: Any) -> bool:
+        """Resolves the request sent with ack_id.
+
+        :return: Whether a pending request was resolved.
+        :rtype: bool
+        """
+        request = self._by_ack.get(ack_id)
+        return request is not None and self._complete(request, value)
+
+    def resolve(
+        self,
+        kind: str,
+        key: Optional[Hashable],
+        value: Any,
+        *,
+        fallback: bool = True,
+    ) -> bool:
+        """Resolves the request of kind matching key.
+
+        :param kind: The request kind.
+        :type kind: str
+        :param key: The key of the response, if it carries one.
+        :type key: Hashable, optional
+        :param value: The response.
+        :type value: Any
+        :param fallback: Whether to resolve the oldest request of kind when no
+            request matches key.
+        :type fallback: bool
+        :return: Whether a pending request was resolved.
+        :rtype: bool
+        """
+        if key is not None:
+            for request in self._by_key.get((kind, key), ()):
+                if self._complete(request, value):
+                    return True
+        if fallback:
+            for request in self._by_kind[kind].values():
+                if self._complete(request, value):
+                    return True
+        return False
+
+    async def wait(self, future: "Future[Any]", kind: str, timeout: Optional[float]) -> Any:
+        """Waits for the response of a request.
+
+        :raises asyncio.TimeoutError: If no response arrived within timeout.
+        """
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._timeouts[kind] += 1
+            raise
+
+    @property
+    def in_flight(self) -> int:
+        """
+        :return: The number of requests waiting for a response.
+        :rtype: int
+        """
+        return len(self._by_ack) + sum(len(r) for r in self._by_kind.values())
+
+    @property
+    def latency(self) -> Dict[str, RunningStats]:
+        """
+        :return: Response latency per request kind, in seconds.
+        :rtype: Dict[str, RunningStats]
+        """
+        return dict(self._latency)
+
+    @property
+    def timeouts(self) -> Dict[str, int]:
+        return dict(self._timeouts)
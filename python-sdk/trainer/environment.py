@@ -1,19 +1,57 @@
 import os
 from abc import ABC, abstractmethod
 from logging import Logger
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from array import array
+from sys import intern
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import chess
+
+from moves import pack_move, parse_move, unpack_move
+from observation import ObservationHistory
 
 class AbstractGame(ABC):
+    """Per-game state.
+
+    Games are slotted so that a process can hold tens of thousands of them. The
+    board is only built when first read: until then the states received are
+    kept unapplied, and release_board drops it again, keeping the moves played
+    packed in 16 bits each.
+    """
+
+    __slots__ = (
+        "_game_tag",
+        "_player_username",
+        "_player_color",
+        "_opponent_username",
+        "_anybody_inactive",
+        "_reconnected",
+        "logger",
+        "_wait",
+        "_finished",
+        "_turn",
+        "_game_status",
+        "_board",
+        "_root_fen",
+        "_moves",
+        "_synced_ply",
+        "_resyncs",
+        "_pending",
+        "_observations",
+        "_started_at",
+    )
+
     def __init__(self,
         game_tag:str,
         username: str,
         logger:Logger,
-
+        record_observations: bool = False,
         ):
         
         # Utils attributes
         self._game_tag: str = game_tag
-        self._player_username: str = username
+        self._player_username: str = intern(username)
         self._player_color: str = "w"
         self._opponent_username: Optional[str] = None
         self._anybody_inactive: bool = False
@@ -23,13 +61,200 @@ class AbstractGame(ABC):
         self._finished: bool = False
         self._turn: int = 0
         self._game_status: str = "waiting"
-        self.game_fen: str = ""
-        self.to_play: str = "w"
+
+        # the moves played since root_fen (the starting position if None), and
+        # the number of server history entries they reflect
+        self._board: Optional[chess.Board] = None
+        self._root_fen: Optional[str] = None
+        self._moves: array = array("H")
+        self._synced_ply: int = 0
+        self._resyncs: int = 0
+        # the last state received while the board was not built
+        self._pending: Optional[Tuple[Optional[str], List[Any], Any]] = None
 
         # Initialize Observations
-        #self._observations: Dict[int, Observation] = {}
-        #self._current_observation: Observation = Observation()
+        self._observations: Optional[ObservationHistory] = (
+            ObservationHistory() if record_observations else None
+        )
+        self._started_at: float = perf_counter()
+
+
+    def update_position(
+        self, fen: Optional[str], history: List[Any], last_move: Any = None
+    ) -> bool:
+        """Brings the board up to date with a state sent by the server.
+
+        The moves of history not applied yet are pushed on the board. The board is
+        only rebuilt when the state diverges from it: by replaying the whole
+        history, or from the FEN if the history cannot be replayed, which loses
+        the move stack. If the board is not built, the state is only applied when
+        it is first read.
+
+        :param fen: The FEN of the position.
+        :type fen: str, optional
+        :param history: Every move played, in any notation the server accepts.
+        :type history: List[Any]
+        :param last_move: The last move, used when the state has no history.
+        :type last_move: Any
+        :return: Whether the board had to be rebuilt.
+        :rtype: bool
+        """
+        if self._board is None and history:
+            # histories are cumulative, so the last one supersedes the others
+            self._pending = (fen, history, last_move)
+            return False
+        return self._apply(fen, history, last_move)
 
+    def _apply(self, fen: Optional[str], history: List[Any], last_move: Any) -> bool:
+        board = self.board
+        if history:
+            if len(history) >= self._synced_ply and self._push_moves(
+                history[self._synced_ply :]
+            ) and self._agrees_with(fen):
+                return False
+            board.reset()
+            self._root_fen = None
+            self._moves = array("H")
+            self._synced_ply = 0
+            if self._observations is not None:
+                self._observations.clear()
+            if self._push_moves(history) and self._agrees_with(fen):
+                self._resyncs += 1
+                return True
+        elif last_move is not None:
+            if self._push_moves((last_move,)) and self._agrees_with(fen):
+                return False
+        elif self._synced_ply == 0 and self._agrees_with(fen):
+            return False
+
+        self.logger.warning("Resynchronising game %s from FEN", self._game_tag)
+        board.set_fen(fen)
+        self._root_fen = fen
+        self._moves = array("H")
+        self._synced_ply = len(history)
+        if self._observations is not None:
+            self._observations.clear(fen)
+        self._resyncs += 1
+        return True
+
+    def _push_moves(self, moves: List[Any]) -> bool:
+        board = self._board
+        observations = self._observations
+        for move in moves:
+            parsed = parse_move(board, move)
+            if parsed is None:
+                return False
+            packed = pack_move(parsed)
+            if observations is not None:
+                observations.append(
+                    packed,
+                    board.turn,
+                    board.halfmove_clock,
+                    perf_counter() - self._started_at,
+                )
+            board.push(parsed)
+            self._moves.append(packed)
+            self._synced_ply += 1
+        return True
+
+    def _agrees_with(self, fen: Optional[str]) -> bool:
+        # only compares the side to move, as formatting the board as FEN would
+        # cost as much as parsing the FEN
+        if not fen:
+            return True
+        fields = fen.split(" ", 2)
+        return len(fields) > 1 and fields[1] == ("w" if self._board.turn else "b")
+
+    def compact_position(self) -> Tuple[Optional[str], bytes]:
+        """
+        :return: The FEN the moves are played from, None for the starting
+            position, and the moves played, packed in 16 bits each.
+        :rtype: Tuple[Optional[str], bytes]
+        """
+        if self._pending is not None:
+            # applies the pending state
+            self.board
+        return self._root_fen, self._moves.tobytes()
+
+    def load_compact_position(self, root_fen: Optional[str], moves: bytes):
+        """Sets the position from the output of compact_position, the board
+        being rebuilt when first read.
+
+        :param root_fen: The FEN the moves are played from.
+        :type root_fen: str, optional
+        :param moves: The packed moves.
+        :type moves: bytes
+        """
+        self._board = None
+        self._pending = None
+        self._root_fen = root_fen
+        self._moves = array("H")
+        self._moves.frombytes(moves)
+        self._synced_ply = len(self._moves)
+
+    def release_board(self):
+        """Drops the board, eg. of a finished game, keeping the packed moves it
+        is rebuilt from when read again."""
+        self._board = None
+
+    @property
+    def board(self) -> chess.Board:
+        """
+        :return: The current position, with the moves played in it.
+        :rtype: chess.Board
+        """
+        board = self._board
+        if board is None:
+            board = self._board = chess.Board(self._root_fen or chess.STARTING_FEN)
+            for packed in self._moves:
+                board.push(unpack_move(packed))
+            pending = self._pending
+            if pending is not None:
+                self._pending = None
+                self._apply(*pending)
+        return board
+
+    @property
+    def game_fen(self) -> str:
+        """
+        :return: The FEN of the current position.
+        :rtype: str
+        """
+        return self.board.fen()
+
+    @game_fen.setter
+    def game_fen(self, fen: str):
+        self.board.set_fen(fen)
+        self._root_fen = fen
+        self._moves = array("H")
+
+    @property
+    def to_play(self) -> str:
+        """
+        :return: The color to move, 'w' or 'b'.
+        :rtype: str
+        """
+        if self._board is None and self._pending is not None and self._pending[0]:
+            # read from the pending state, without building the board
+            return self._pending[0].split(" ", 2)[1]
+        return "w" if self.board.turn == chess.WHITE else "b"
+
+    @property
+    def observations(self) -> Optional[ObservationHistory]:
+        """
+        :return: The trajectory of the game, if it is recorded.
+        :rtype: ObservationHistory, optional
+        """
+        return self._observations
+
+    @property
+    def resyncs(self) -> int:
+        """
+        :return: The number of times the board was rebuilt because a state from
+            the server diverged from it.
+        :rtype: int
+        """
+        return self._resyncs
 
     @property
     def game_tag(self) -> str:
@@ -49,7 +274,7 @@ class AbstractGame(ABC):
 
     @opponent_username.setter
     def opponent_username(self, value: str):
-        self._opponent_username = value
+        self._opponent_username = intern(value)
 
     @property
     def player_username(self) -> str:
@@ -61,7 +286,7 @@ class AbstractGame(ABC):
 
     @player_username.setter
     def player_username(self, value: str):
-        self._player_username = value
+        self._player_username = intern(value)
     
     @property
     def player_color(self) -> str:
@@ -91,12 +316,15 @@ class AbstractGame(ABC):
 
 
 class Game(AbstractGame):
+    __slots__ = ("_available_moves",)
+
     def __init__(
         self,
         game_tag: str,
         username: str,
-        logger: Logger
+        logger: Logger,
+        record_observations: bool = False
     ):
-        super(Game, self).__init__(game_tag, username, logger)
+        super(Game, self).__init__(game_tag, username, logger, record_observations)
         # Turn choice attributes
-        self._available_moves: List = []
\ No newline at end of file
+        self._available_moves: Sequence = ()
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""This module contains the static evaluation of positions used by searches.
+
+Positions are scored in centipawns from the point of view of the side to move,
+by material and piece-square tables (Michniewski's simplified evaluation
+function). The king uses its endgame table once queens are off the board.
+"""
+
+from typing import List, Tuple
+
+import chess
+
+PIECE_VALUES = (0, 100, 320, 330, 500, 900, 20000)
+
+# from white's point of view, rank 8 first, as they are usually printed
+_PAWN_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+_KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+_BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+_ROOK_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+)
+_QUEEN_TABLE = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+_KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+)
+_KING_ENDGAME_TABLE = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+
+
+def _square_values(piece_type: int, table: Tuple[int, ...]) -> Tuple[List[int], List[int]]:
+    """Returns the value of a white and of a black piece on each square, a1
+    first, material included."""
+    value = PIECE_VALUES[piece_type]
+    white = [value + table[square ^ 56] for square in chess.SQUARES]
+    black = [value + table[square] for square in chess.SQUARES]
+    return white, black
+
+
+# (white, black) square values of pawns to queens, then of the king in the
+# middlegame and in the endgame
+SQUARE_VALUES = [
+    _square_values(piece_type, table)
+    for piece_type, table in (
+        (chess.PAWN, _PAWN_TABLE),
+        (chess.KNIGHT, _KNIGHT_TABLE),
+        (chess.BISHOP, _BISHOP_TABLE),
+        (chess.ROOK, _ROOK_TABLE),
+        (chess.QUEEN, _QUEEN_TABLE),
+        (chess.KING, _KING_TABLE),
+        (chess.KING, _KING_ENDGAME_TABLE),
+    )
+]
+
+
+def _sum_values(bitboard: int, values: List[int]) -> int:
+    total = 0
+    while bitboard:
+        bit = bitboard & -bitboard
+        total += values[bit.bit_length() - 1]
+        bitboard ^= bit
+    return total
+
+
+def evaluate(board: chess.Board) -> int:
+    """Evaluates a position statically.
+
+    :param board: The position.
+    :type board: chess.Board
+    :return: The score in centipawns, positive when the side to move is better.
+    :rtype: int
+    """
+    black, white = board.occupied_co
+    score = 0
+    for pieces, (white_values, black_values) in zip(
+        (board.pawns, board.knights, board.bishops, board.rooks, board.queens),
+        SQUARE_VALUES,
+    ):
+        score += _sum_values(pieces & white, white_values)
+        score -= _sum_values(pieces & black, black_values)
+
+    white_values, black_values = SQUARE_VALUES[6 if not board.queens else 5]
+    kings = board.kings
+    score += _sum_values(kings & white, white_values)
+    score -= _sum_values(kings & black, black_values)
+    return score if board.turn else -score
@@ -0,0 +1,495 @@
+"""This module contains a runner sharding a fleet of bots across processes.
+
+The chess loop of a process runs every player it holds on one thread, so one
+process is bound to one core. A Fleet spawns worker processes, each with its
+own chess loop, and gives each a contiguous shard of the fleet's bot
+identities, named by account_configuration.generate_username so that names are
+unique across the fleet and stable across restarts.
+
+A supervisor, in the process running the fleet, restarts workers that exit or
+crash, with an exponential backoff, and aggregates the statistics each worker
+reports over its pipe: games finished, moves played and per second, and errors
+of the bots, which workers restart themselves.
+
+The fleet is run from the API, or from the command line, eg.::
+
+    python fleet.py random_player:RandomPlayer --bots 100 --workers 4
+"""
+
+import argparse
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import os
+from multiprocessing.connection import Connection, wait
+from time import perf_counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from account_configuration import AccountConfiguration, generate_username
+from concurrency import handle_threaded_coroutines
+from player import Player, load_player_class
+from server_configuration import LocalhostServerConfiguration, ServerConfiguration
+
+BOT_MODES = ("accept", "self_play")
+
+
+class FleetConfiguration(NamedTuple):
+    """Fleet configuration object. Represented with a tuple with eleven entries:
+
+    - player: the player class, as 'module:Class', eg. 'random_player:RandomPlayer',
+    - n_bots and n_workers: the numbers of bots and of worker processes,
+    - server_configuration: the server every bot connects to,
+    - name_key: the name usernames start with, by default the class name,
+    - mode: 'accept', where bots accept invitations from anyone, or
+      'self_play', where the bots of a shard are paired and play each other,
+    - max_concurrent_games: of each bot, also the number of invitations sent or
+      accepted at once,
+    - player_kwargs: other keyword arguments of the player class,
+    - log_level: of the players,
+    - stats_interval: seconds between the statistics reports of workers,
+    - bot_restart_delay: seconds before a worker restarts a failed bot.
+    """
+
+    player: str
+    n_bots: int
+    n_workers: int
+    server_configuration: ServerConfiguration = LocalhostServerConfiguration
+    name_key: Optional[str] = None
+    mode: str = "accept"
+    max_concurrent_games: int = 1
+    player_kwargs: Optional[Dict[str, Any]] = None
+    log_level: int = logging.WARNING
+    stats_interval: float = 1.0
+    bot_restart_delay: float = 1.0
+
+
+class WorkerStats(NamedTuple):
+    """Statistics reported by a worker process, since it started. Represented
+    with a tuple with eight entries."""
+
+    worker: int
+    pid: int
+    bots: int
+    games: int
+    moves: int
+    moves_per_second: float
+    errors: int
+    uptime: float
+
+
+class FleetStats(NamedTuple):
+    """Statistics of a fleet, summed over workers and their restarts.
+    Represented with a tuple with seven entries; moves_per_second is the sum of
+    the rates last reported by running workers."""
+
+    workers: int
+    bots: int
+    games: int
+    moves: int
+    moves_per_second: float
+    errors: int
+    restarts: int
+
+
+def shard(n_bots: int, n_workers: int) -> List[range]:
+    """
+    :return: The contiguous ranges of bot indices of each worker.
+    :rtype: List[range]
+    """
+    size, extra = divmod(n_bots, n_workers)
+    shards = []
+    start = 0
+    for worker in range(n_workers):
+        end = start + size + (worker < extra)
+        shards.append(range(start, end))
+        start = end
+    return shards
+
+
+async def _play_pair(inviter: Player, invitee: Player, n_games: int):
+    # invitations to a player that did not log in yet fail
+    for player in (inviter, invitee):
+        await handle_threaded_coroutines(player.chess_client.logged_in.wait())
+    await asyncio.gather(
+        inviter.send_invites(invitee.username, n_games),
+        invitee.accept_invites(inviter.username, n_games),
+    )
+
+
+class _Worker:
+    """The bots of a worker process, on its chess loop, and their reports."""
+
+    def __init__(
+        self, configuration: FleetConfiguration, worker: int, indices: range, connection: Connection
+    ):
+        self._configuration = configuration
+        self._worker = worker
+        self._connection = connection
+        player_class = load_player_class(configuration.player)
+        key = configuration.name_key or player_class.__name__
+        self._players: List[Player] = [
+            player_class(
+                AccountConfiguration(generate_username(key, index + 1), None),
+                server_configuration=configuration.server_configuration,
+                max_concurrent_games=configuration.max_concurrent_games,
+                log_level=configuration.log_level,
+                **(configuration.player_kwargs or {}),
+            )
+            for index in indices
+        ]
+        self._errors: int = 0
+        self._started_at: float = perf_counter()
+
+    def _bots(self) -> List[Callable[[], Any]]:
+        n_games = self._configuration.max_concurrent_games
+        players = self._players
+        if self._configuration.mode == "self_play":
+            bots = [
+                lambda a=a, b=b: _play_pair(a, b, n_games)
+                for a, b in zip(players[::2], players[1::2])
+            ]
+            players = players[len(players) - len(players) % 2 :]
+        else:
+            bots = []
+        return bots + [
+            lambda player=player: player.accept_invites(None, n_games)
+            for player in players
+        ]
+
+    async def _run_bot(self, bot: Callable[[], Any]):
+        while True:
+            try:
+                await bot()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._errors += 1
+                logging.getLogger("fleet").exception(
+                    "Bot of worker %d failed", self._worker
+                )
+                await asyncio.sleep(self._configuration.bot_restart_delay)
+
+    def stats(self, moves_per_second: float) -> WorkerStats:
+        return WorkerStats(
+            self._worker,
+            os.getpid(),
+            len(self._players),
+            sum(player.games_finished for player in self._players),
+            sum(player.moves_played for player in self._players),
+            moves_per_second,
+            self._errors,
+            perf_counter() - self._started_at,
+        )
+
+    async def run(self):
+        tasks = [asyncio.ensure_future(self._run_bot(bot)) for bot in self._bots()]
+        interval = self._configuration.stats_interval
+        last_moves, last_time = 0, perf_counter()
+        try:
+            while not self._connection.poll():
+                await asyncio.sleep(interval)
+                moves, now = sum(p.moves_played for p in self._players), perf_counter()
+                self._connection.send(self.stats((moves - last_moves) / (now - last_time)))
+                last_moves, last_time = moves, now
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for player in self._players:
+                await player.chess_client.stop_listening()
+
+
+def _run_worker(
+    configuration: FleetConfiguration, worker: int, indices: range, connection: Connection
+):
+    logging.basicConfig(level=configuration.log_level)
+    try:
+        asyncio.run(_Worker(configuration, worker, indices, connection).run())
+    except (EOFError, BrokenPipeError):
+        # the supervisor is gone
+        pass
+
+
+class Fleet:
+    """Supervisor of the worker processes of a fleet of bots."""
+
+    def __init__(
+        self,
+        configuration: FleetConfiguration,
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 60.0,
+    ):
+        """
+        :param configuration: The fleet configuration.
+        :type configuration: FleetConfiguration
+        :param restart_delay: Seconds before restarting a worker that stopped,
+            doubled after each stop of a worker that ran for less than
+            max_restart_delay.
+        :type restart_delay: float
+        :param max_restart_delay: Maximum seconds before restarting a worker.
+        :type max_restart_delay: float
+        """
+        if configuration.mode not in BOT_MODES:
+            raise ValueError(
+                f"Unknown bot mode {configuration.mode}, expected one of {BOT_MODES}"
+            )
+        if not 0 < configuration.n_workers <= max(configuration.n_bots, 1):
+            raise ValueError("n_workers must be between 1 and n_bots")
+        # fails early on a wrong class
+        load_player_class(configuration.player)
+        self._configuration = configuration
+        self._restart_delay = restart_delay
+        self._max_restart_delay = max_restart_delay
+        self._shards = shard(configuration.n_bots, configuration.n_workers)
+        # workers start with a fresh interpreter, and so a fresh chess loop
+        self._context = multiprocessing.get_context("spawn")
+
+        self._processes: Dict[int, Any] = {}
+        self._connections: Dict[int, Connection] = {}
+        self._started_at: Dict[int, float] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._failures: Dict[int, int] = {}
+        self._stats: Dict[int, WorkerStats] = {}
+        # totals of the previous runs of each worker
+        self._retired: Dict[int, Tuple[int, int, int]] = {}
+        self._restarts: int = 0
+        self._running: bool = False
+
+    def _start_worker(self, worker: int):
+        connection, child_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self._configuration, worker, self._shards[worker], child_connection),
+            name=f"fleet-worker-{worker}",
+        )
+        process.start()
+        child_connection.close()
+        self._processes[worker] = process
+        self._connections[worker] = connection
+        self._started_at[worker] = perf_counter()
+
+    def start(self):
+        """Starts every worker."""
+        if self._running:
+            return
+        self._running = True
+        atexit.register(self.stop)
+        for worker in range(len(self._shards)):
+            self._start_worker(worker)
+
+    def _retire(self, worker: int):
+        connection = self._connections.pop(worker)
+        try:
+            while connection.poll():
+                self._stats[worker] = connection.recv()
+        except (EOFError, OSError):
+            pass
+        connection.close()
+        stats = self._stats.pop(worker, None)
+        if stats is not None:
+            games, moves, errors = self._retired.get(worker, (0, 0, 0))
+            self._retired[worker] = (
+                games + stats.games,
+                moves + stats.moves,
+                errors + stats.errors,
+            )
+        self._processes.pop(worker).join()
+
+    def _handle_exit(self, worker: int):
+        process = self._processes[worker]
+        uptime = perf_counter() - self._started_at[worker]
+        self._retire(worker)
+        if uptime >= self._max_restart_delay:
+            self._failures[worker] = 0
+        failures = self._failures.get(worker, 0)
+        delay = min(self._restart_delay * 2 ** failures, self._max_restart_delay)
+        self._failures[worker] = failures + 1
+        logging.getLogger("fleet").warning(
+            "Worker %d exited with code %s, restarting in %.1fs",
+            worker,
+            process.exitcode,
+            delay,
+        )
+        self._restart_at[worker] = perf_counter() + delay
+
+    def poll(self, timeout: Optional[float] = None):
+        """Receives the workers' reports and restarts stopped workers, waiting
+        for up to timeout seconds for either.
+
+        :param timeout: Maximum seconds to wait, forever if None.
+        :type timeout: float, optional
+        """
+        if self._restart_at:
+            next_restart = min(self._restart_at.values()) - perf_counter()
+            timeout = max(0.0, next_restart if timeout is None else min(timeout, next_restart))
+        sentinels = {
+            process.sentinel: worker for worker, process in self._processes.items()
+        }
+        connections = {
+            connection: worker for worker, connection in self._connections.items()
+        }
+        for ready in wait(list(sentinels) + list(connections), timeout):
+            worker = connections.get(ready)
+            if worker is not None:
+                try:
+                    while ready.poll():
+                        self._stats[worker] = ready.recv()
+                except (EOFError, OSError):
+                    pass
+        # reports are read before a worker's exit is handled
+        for sentinel, worker in sentinels.items():
+            if not self._processes[worker].is_alive():
+                self._handle_exit(worker)
+
+        now = perf_counter()
+        for worker, restart_at in list(self._restart_at.items()):
+            if restart_at <= now:
+                del self._restart_at[worker]
+                self._restarts += 1
+                self._start_worker(worker)
+
+    def run(
+        self,
+        duration: Optional[float] = None,
+        on_stats: Optional[Callable[[FleetStats], Any]] = None,
+    ):
+        """Starts the fleet if needed and supervises it, until duration seconds
+        elapsed if given.
+
+        :param duration: Seconds to run for, forever if None.
+        :type duration: float, optional
+        :param on_stats: Called with the fleet statistics every stats interval.
+        :type on_stats: Callable[[FleetStats], Any], optional
+        """
+        self.start()
+        interval = self._configuration.stats_interval
+        end = None if duration is None else perf_counter() + duration
+        next_stats = perf_counter() + interval
+        while end is None or perf_counter() < end:
+            timeout = next_stats - perf_counter()
+            if end is not None:
+                timeout = min(timeout, end - perf_counter())
+            self.poll(max(timeout, 0.0))
+            if perf_counter() >= next_stats:
+                next_stats += interval
+                if on_stats is not None:
+                    on_stats(self.stats)
+
+    def stop(self, timeout: float = 10.0):
+        """Asks every worker to stop its bots, and terminates those that did
+        not within timeout seconds."""
+        if not self._running:
+            return
+        self._running = False
+        self._restart_at.clear()
+        for connection in self._connections.values():
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        end = perf_counter() + timeout
+        for process in self._processes.values():
+            process.join(max(0.0, end - perf_counter()))
+            if process.is_alive():
+                process.terminate()
+        for worker in list(self._processes):
+            self._retire(worker)
+        atexit.unregister(self.stop)
+
+    def __enter__(self) -> "Fleet":
+        self.start()
+        return self
+
+    def __exit__(self, *args: Any):
+        self.stop()
+
+    @property
+    def stats(self) -> FleetStats:
+        """
+        :return: The statistics of the fleet.
+        :rtype: FleetStats
+        """
+        games = moves = errors = 0
+        for retired_games, retired_moves, retired_errors in self._retired.values():
+            games += retired_games
+            moves += retired_moves
+            errors += retired_errors
+        reports = self._stats.values()
+        return FleetStats(
+            len(self._processes),
+            sum(report.bots for report in reports),
+            games + sum(report.games for report in reports),
+            moves + sum(report.moves for report in reports),
+            sum(report.moves_per_second for report in reports),
+            errors + sum(report.errors for report in reports),
+            self._restarts,
+        )
+
+    @property
+    def worker_stats(self) -> Dict[int, WorkerStats]:
+        """
+        :return: The last report of each running worker, by worker index.
+        :rtype: Dict[int, WorkerStats]
+        """
+        return dict(self._stats)
+
+    @property
+    def restarts(self) -> int:
+        return self._restarts
+
+    @property
+    def processes(self) -> Dict[int, Any]:
+        """
+        :return: The process of each running worker, by worker index.
+        :rtype: Dict[int, multiprocessing.Process]
+        """
+        return dict(self._processes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a fleet of bots.")
+    parser.add_argument("player", help="player class, as module:Class")
+    parser.add_argument("--bots", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--server", default=LocalhostServerConfiguration.websocket_url)
+    parser.add_argument(
+        "--authentication-url", default=LocalhostServerConfiguration.authentication_url
+    )
+    parser.add_argument("--name-key", help="start of usernames, the class name by default")
+    parser.add_argument("--mode", choices=BOT_MODES, default="accept")
+    parser.add_argument("--max-concurrent-games", type=int, default=1)
+    parser.add_argument("--duration", type=float, help="seconds, forever by default")
+    parser.add_argument("--stats-interval", type=float, default=5.0)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+
+    configuration = FleetConfiguration(
+        args.player,
+        args.bots,
+        min(args.workers, args.bots),
+        ServerConfiguration(args.server, args.authentication_url),
+        args.name_key,
+        args.mode,
+        args.max_concurrent_games,
+        log_level=logging.getLevelName(args.log_level),
+        stats_interval=args.stats_interval,
+    )
+
+    def report(stats: FleetStats):
+        print(
+            "%d workers, %d bots: %d games, %d moves, %.1f moves/s, %d errors, "
+            "%d restarts" % stats
+        )
+
+    with Fleet(configuration) as fleet:
+        try:
+            fleet.run(args.duration, report)
+        except KeyboardInterrupt:
+            pass
+    report(fleet.stats)
+
+
+if __name__ == "__main__":
+    main()
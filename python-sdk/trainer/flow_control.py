@@ -0,0 +1,128 @@
+"""This module contains inbound flow control for the client's listen loop.
+"""
+
+from collections import Counter
+from time import perf_counter
+from typing import Dict, FrozenSet, NamedTuple
+
+from mailbox import RoomMailboxes
+from stats import RunningStats
+
+SHEDDABLE_EVENTS: FrozenSet[str] = frozenset(
+    {"roomListUpdate", "newMessage", "sessionData", "joinedAsSpectator"}
+)
+
+
+class FlowControlConfiguration(NamedTuple):
+    """Inbound flow control configuration. Represented with a tuple with three
+    entries: the high and low watermarks, in buffered events, and the events that
+    may be shed under load."""
+
+    high_watermark: int = 1024
+    low_watermark: int = 256
+    sheddable_events: FrozenSet[str] = SHEDDABLE_EVENTS
+
+
+class InboundFlowControl:
+    """Bounds the number of inbound events buffered in the room mailboxes.
+
+    When the buffer reaches the high watermark, pending sheddable events are
+    dropped first. If it is still at the high watermark, the client holds
+    incoming events, undecoded, until the buffer drains down to the low
+    watermark, but keeps reading the websocket so that pings are still answered.
+    Only once high watermark events are held too does it stop reading. While
+    overloaded, i.e. between reaching the high watermark and draining to the low
+    one, incoming sheddable events are dropped before being decoded.
+    """
+
+    def __init__(self, configuration: FlowControlConfiguration, mailboxes: RoomMailboxes):
+        if not 0 <= configuration.low_watermark < configuration.high_watermark:
+            raise ValueError(
+                "Expected 0 <= low_watermark < high_watermark, got "
+                f"{configuration.low_watermark} and {configuration.high_watermark}"
+            )
+        self._configuration = configuration
+        self._mailboxes = mailboxes
+
+        self._overloaded: bool = False
+        self._peak_occupancy: int = 0
+        self._shed: Counter[str] = Counter()
+        self._pause_time = RunningStats()
+
+    def should_shed(self, event: str) -> bool:
+        """Whether an incoming event is dropped instead of being buffered.
+
+        :param event: The event name.
+        :type event: str
+        :return: Whether the event is shed.
+        :rtype: bool
+        """
+        if not self._overloaded:
+            return False
+        if self._mailboxes.pending <= self._configuration.low_watermark:
+            self._overloaded = False
+            return False
+        if event in self._configuration.sheddable_events:
+            self._shed[event] += 1
+            return True
+        return False
+
+    def check(self) -> bool:
+        """Called after buffering an event. Sheds pending events when the buffer
+        is full.
+
+        :return: Whether the buffer is still full, and incoming events have to
+            wait for drained.
+        :rtype: bool
+        """
+        occupancy = self._mailboxes.pending
+        if occupancy > self._peak_occupancy:
+            self._peak_occupancy = occupancy
+        if occupancy < self._configuration.high_watermark:
+            return False
+
+        self._overloaded = True
+        self._shed.update(self._mailboxes.shed(self._configuration.sheddable_events))
+        return self._mailboxes.pending >= self._configuration.high_watermark
+
+    async def drained(self):
+        """Waits until the buffer drains down to the low watermark."""
+        start = perf_counter()
+        await self._mailboxes.wait_pending_at_most(self._configuration.low_watermark)
+        self._pause_time.add(perf_counter() - start)
+
+    @property
+    def configuration(self) -> FlowControlConfiguration:
+        return self._configuration
+
+    @property
+    def occupancy(self) -> int:
+        """
+        :return: The number of buffered inbound events.
+        :rtype: int
+        """
+        return self._mailboxes.pending
+
+    @property
+    def peak_occupancy(self) -> int:
+        return self._peak_occupancy
+
+    @property
+    def overloaded(self) -> bool:
+        return self._overloaded
+
+    @property
+    def shed_counts(self) -> Dict[str, int]:
+        """
+        :return: The number of shed events, per event name.
+        :rtype: Dict[str, int]
+        """
+        return dict(self._shed)
+
+    @property
+    def pause_time(self) -> RunningStats:
+        """
+        :return: Time spent with incoming events held, in seconds, per pause.
+        :rtype: RunningStats
+        """
+        return self._pause_time
@@ -0,0 +1,666 @@
+"""This module contains an asyncio stand-in for the web2server game server.
+
+GameServer implements the event handlers of web2server/src/socket (sessions,
+player names, rooms, invitations, games validated with python-chess) and emits
+the same events with the same payloads. It is transport agnostic: connections
+deliver emitted events themselves. WebsocketGameServer serves it over the
+Engine.IO v4 / Socket.IO websocket protocol ChessClient speaks, so clients and
+players can be load tested without running the Node server.
+
+Differences with web2server: moves are only accepted from the player whose
+color is to move, and events sent with an ack id are acknowledged with the
+payload the handler sent back to the sender. gameOver payloads are {winner,
+reason}, as web2server sends them, unless the server is asked to add the roomId.
+"""
+
+import argparse
+import asyncio
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from asyncio import Queue, Task
+from collections import defaultdict
+from logging import Logger
+from threading import Thread
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import chess
+import websockets
+
+import json_backend
+from codec import (
+    KIND_CONNECT,
+    KIND_EVENT,
+    KIND_PING,
+    KIND_PONG,
+    decode_frame,
+    encode_event,
+)
+from moves import game_result, parse_move
+from stats import RunningStats
+
+STARTING_FEN = chess.STARTING_FEN
+
+
+class Session:
+    __slots__ = ("session_id", "user_id", "player_name")
+
+    def __init__(self, session_id: str, user_id: str):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.player_name: Optional[str] = None
+
+
+class Connection(ABC):
+    """A connected socket. Subclasses deliver emitted events to the client."""
+
+    def __init__(self, sid: str):
+        self.sid = sid
+        self.session: Optional[Session] = None
+        self.rooms: Set[str] = set()
+
+    @abstractmethod
+    def emit(self, event: str, payload: Any = None):
+        """Delivers an event to the client."""
+        pass
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self.session.user_id if self.session is not None else None
+
+    @property
+    def player_name(self) -> Optional[str]:
+        return self.session.player_name if self.session is not None else None
+
+
+class Room:
+    __slots__ = ("room_id", "name", "players", "game_started", "board", "history", "status")
+
+    def __init__(self, room_id: str, name: str, players: List[Dict[str, Any]]):
+        self.room_id = room_id
+        self.name = name
+        self.players = players
+        self.game_started: bool = False
+        self.board = chess.Board()
+        self.history: List[Any] = []
+        self.status: str = "waiting"
+
+    def player_name(self, color: str) -> Optional[str]:
+        for player in self.players:
+            if player["color"] == color:
+                return player["name"]
+        return None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.room_id,
+            "name": self.name,
+            "players": [dict(player) for player in self.players],
+            "gameStarted": self.game_started,
+            "gameFen": self.board.fen(),
+            "moveHistory": list(self.history),
+            "gameStatus": self.status,
+        }
+
+
+class GameServer:
+    """Game protocol state and event handlers, independent of the transport.
+
+    Handlers run synchronously and may return a response, sent back as the
+    Socket.IO ack when the event requested one.
+    """
+
+    def __init__(
+        self,
+        *,
+        broadcast_room_list: bool = True,
+        game_over_room_id: bool = False,
+        logger: Optional[Logger] = None,
+    ):
+        """
+        :param broadcast_room_list: Whether room changes broadcast roomListUpdate
+            to every connection, as web2server does. Each broadcast carries every
+            room, so it dominates the cost with thousands of rooms.
+        :type broadcast_room_list: bool
+        :param game_over_room_id: Whether gameOver payloads carry the roomId,
+            which web2server does not send.
+        :type game_over_room_id: bool
+        """
+        self._broadcast_room_list = broadcast_room_list
+        self._game_over_room_id = game_over_room_id
+        self._logger = logger or logging.getLogger("GameServer")
+
+        self._sessions: Dict[str, Session] = {}
+        self._connections: Dict[str, Connection] = {}
+        self._connections_by_name: Dict[str, Connection] = {}
+        self._connections_by_user: Dict[str, Connection] = {}
+        # the connections in each room, so that broadcasts do not scan every
+        # connection
+        self._room_members: Dict[str, Set[Connection]] = defaultdict(set)
+        self._rooms: Dict[str, Room] = {}
+
+        self._timings: Dict[str, RunningStats] = defaultdict(RunningStats)
+        self._handlers: Dict[str, Callable[..., Any]] = {
+            "getPlayerName": self._on_get_player_name,
+            "setPlayerName": self._on_set_player_name,
+            "getSession": self._on_get_session,
+            "createRoom": self._on_create_room,
+            "joinRoom": self._on_join_room,
+            "leaveRoom": self._on_leave_room,
+            "switchSides": self._on_switch_sides,
+            "startGame": self._on_start_game,
+            "invitePlayer": self._on_invite_player,
+            "acceptInvitation": self._on_accept_invitation,
+            "declineInvitation": self._on_decline_invitation,
+            "getRoomList": self._on_get_room_list,
+            "move": self._on_move,
+            "offerDraw": self._on_offer_draw,
+            "acceptDraw": self._on_accept_draw,
+            "declineDraw": self._on_decline_draw,
+            "resign": self._on_resign,
+            "getGameState": self._on_get_game_state,
+            "sendMessage": self._on_send_message,
+        }
+
+    # connection lifecycle
+
+    def connect(self, connection: Connection, auth: Optional[Dict[str, Any]] = None):
+        """Accepts a Socket.IO connection, resuming its session if auth names a
+        known one, and emits the session event."""
+        session_id = auth.get("sessionID") if auth else None
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            session = Session(str(uuid.uuid4()), str(uuid.uuid4()))
+            self._sessions[session.session_id] = session
+        connection.session = session
+        self._connections[connection.sid] = connection
+        self._connections_by_user[session.user_id] = connection
+        if session.player_name is not None:
+            self._connections_by_name[session.player_name] = connection
+        connection.emit(
+            "session",
+            {
+                "sessionID": session.session_id,
+                "userID": session.user_id,
+                "playerName": session.player_name,
+            },
+        )
+
+    def disconnect(self, connection: Connection):
+        self._connections.pop(connection.sid, None)
+        name = connection.player_name
+        if name is not None and self._connections_by_name.get(name) is connection:
+            del self._connections_by_name[name]
+        user_id = connection.user_id
+        if user_id is not None and self._connections_by_user.get(user_id) is connection:
+            del self._connections_by_user[user_id]
+        for room_id in connection.rooms:
+            self._leave(connection, room_id)
+        connection.rooms.clear()
+
+    def handle(self, connection: Connection, event: str, *args: Any) -> Any:
+        """Runs the handler of an event sent by a connection.
+
+        :return: The handler's response, if any.
+        :rtype: Any
+        """
+        handler = self._handlers.get(event)
+        if handler is None:
+            self._logger.debug("Unknown event %s", event)
+            return None
+        start = perf_counter()
+        try:
+            return handler(connection, *args)
+        except Exception as e:
+            self._logger.exception(e)
+            return None
+        finally:
+            self._timings[event].add(perf_counter() - start)
+
+    # emission helpers
+
+    def _join(self, connection: Connection, room_id: str):
+        connection.rooms.add(room_id)
+        self._room_members[room_id].add(connection)
+
+    def _leave(self, connection: Connection, room_id: str):
+        members = self._room_members.get(room_id)
+        if members is not None:
+            members.discard(connection)
+            if not members:
+                del self._room_members[room_id]
+
+    def _emit_to_room(self, room_id: str, event: str, payload: Any = None):
+        members = self._room_members.get(room_id)
+        if members:
+            for connection in list(members):
+                connection.emit(event, payload)
+
+    def _emit_to_all(self, event: str, payload: Any = None):
+        for connection in list(self._connections.values()):
+            connection.emit(event, payload)
+
+    def _emit_room_list(self):
+        if self._broadcast_room_list:
+            self._emit_to_all("roomListUpdate", [room.as_dict() for room in self._rooms.values()])
+
+    def _find_connection(self, user_id: str) -> Optional[Connection]:
+        return self._connections_by_user.get(user_id)
+
+    def _room_state(self, room: Room) -> Dict[str, Any]:
+        return {"roomId": room.room_id, "players": [dict(p) for p in room.players],
+                "fen": room.board.fen(), "history": list(room.history), "status": room.status}
+
+    # session handlers
+
+    def _on_get_player_name(self, connection: Connection):
+        if connection.player_name:
+            payload = {"socketId": connection.sid, "name": connection.player_name}
+            connection.emit("playerNameSet", payload)
+            return payload
+
+    def _on_set_player_name(self, connection: Connection, name: str):
+        connection.session.player_name = name
+        self._connections_by_name[name] = connection
+        payload = {"socketId": connection.sid, "name": name}
+        connection.emit("playerNameSet", payload)
+        return payload
+
+    def _on_get_session(self, connection: Connection):
+        session = connection.session
+        payload = {
+            "sessionID": session.session_id,
+            "userID": session.user_id,
+            "playerName": session.player_name,
+        }
+        connection.emit("sessionData", payload)
+        return payload
+
+    # room handlers
+
+    def _new_room(self, name: str, creator: Connection) -> Room:
+        room = Room(
+            str(uuid.uuid4()),
+            name,
+            [{"id": creator.user_id, "name": creator.player_name, "color": "white"}],
+        )
+        self._rooms[room.room_id] = room
+        return room
+
+    def _on_create_room(self, connection: Connection, data: Dict[str, Any]):
+        room = self._new_room(data.get("roomName"), connection)
+        self._join(connection, room.room_id)
+        payload = {"roomId": room.room_id, "player": dict(room.players[0])}
+        connection.emit("roomCreated", payload)
+        self._emit_room_list()
+        return payload
+
+    def _on_join_room(self, connection: Connection, data: Dict[str, Any]):
+        room = self._rooms.get(data.get("roomId"))
+        if room is None:
+            connection.emit("roomNotFound")
+            return None
+
+        existing = next((p for p in room.players if p["id"] == connection.user_id), None)
+        self._join(connection, room.room_id)
+        if existing is not None:
+            existing["name"] = connection.player_name
+            event = "playerJoined"
+        elif len(room.players) < 2:
+            color = "black" if room.players[0]["color"] == "white" else "white"
+            room.players.append(
+                {"id": connection.user_id, "name": connection.player_name, "color": color}
+            )
+            event = "playerJoined"
+        else:
+            event = "joinedAsSpectator"
+        payload = self._room_state(room)
+        self._emit_to_room(room.room_id, event, payload)
+        self._emit_room_list()
+        return payload
+
+    def _on_leave_room(self, connection: Connection, room_id: str):
+        room = self._rooms.get(room_id)
+        if room is None:
+            return None
+        for i, player in enumerate(room.players):
+            if player["id"] == connection.user_id:
+                del room.players[i]
+                self._emit_to_room(
+                    room_id, "playerLeft", {"color": player["color"], "name": player["name"]}
+                )
+                break
+        connection.rooms.discard(room_id)
+        self._leave(connection, room_id)
+        if not room.players:
+            del self._rooms[room_id]
+        else:
+            room.game_started = False
+        self._emit_room_list()
+
+    def _on_switch_sides(self, connection: Connection, room_id: str):
+        room = self._rooms.get(room_id)
+        if room is not None and len(room.players) == 2 and not room.game_started:
+            first, second = room.players
+            first["color"], second["color"] = second["color"], first["color"]
+            self._emit_to_room(room_id, "sidesSwitched", [dict(p) for p in room.players])
+
+    def _on_start_game(self, connection: Connection, room_id: str):
+        room = self._rooms.get(room_id)
+        if room is None or len(room.players) != 2 or room.game_started:
+            self._logger.debug("Failed to start game %s", room_id)
+            return None
+        room.game_started = True
+        room.status = "playing"
+        white, black = room.player_name("white"), room.player_name("black")
+        start = room.as_dict()
+        start.update(white=white, black=black)
+        self._emit_to_room(room_id, "gameStart", start)
+        state = {
+            "room": room_id,
+            "fen": room.board.fen(),
+            "history": list(room.history),
+            "status": room.status,
+            "white": white,
+            "black": black,
+        }
+        self._emit_to_room(room_id, "gameState", state)
+        return state
+
+    def _on_invite_player(self, connection: Connection, data: Dict[str, Any]):
+        invitee = data.get("invitee")
+        invitee_connection = self._connections_by_name.get(invitee)
+        if invitee_connection is None:
+            payload = {"message": "Player not found or offline"}
+            connection.emit("invitationError", payload)
+            return payload
+
+        inviter = connection.player_name
+        room = self._new_room(f"{inviter} vs {invitee}", connection)
+        invitee_connection.emit("invitation", {"from": inviter, "roomId": room.room_id})
+        payload = {
+            "message": f"Invitation sent to {invitee}",
+            "roomId": room.room_id,
+            "roomName": room.name,
+        }
+        connection.emit("invitationSent", payload)
+        self._join(connection, room.room_id)
+        self._emit_room_list()
+        return payload
+
+    def _on_accept_invitation(self, connection: Connection, data: Dict[str, Any]):
+        room = self._rooms.get(data.get("roomId"))
+        if room is None:
+            return None
+        room.players.append(
+            {"id": connection.user_id, "name": connection.player_name, "color": "black"}
+        )
+        self._join(connection, room.room_id)
+
+        inviter = next((p for p in room.players if p["id"] != connection.user_id), None)
+        if inviter is not None:
+            inviter_connection = self._find_connection(inviter["id"])
+            if inviter_connection is not None:
+                inviter_connection.emit("inviteAccepted", {"roomId": room.room_id})
+
+        payload = self._room_state(room)
+        self._emit_to_room(room.room_id, "playerJoined", payload)
+        self._emit_room_list()
+        return payload
+
+    def _on_decline_invitation(self, connection: Connection, data: Dict[str, Any]):
+        inviter_connection = self._connections_by_name.get(data.get("from"))
+        if inviter_connection is None:
+            return None
+        inviter_connection.emit("invitationDeclined", {"by": connection.player_name})
+        for room_id, room in list(self._rooms.items()):
+            if len(room.players) == 1 and room.players[0]["id"] == inviter_connection.user_id:
+                del self._rooms[room_id]
+                self._emit_room_list()
+                break
+
+    def _on_get_room_list(self, connection: Connection):
+        payload = [room.as_dict() for room in self._rooms.values()]
+        connection.emit("roomListUpdate", payload)
+        return payload
+
+    # game handlers
+
+    def _on_move(self, connection: Connection, data: Dict[str, Any]):
+        room_id = data.get("roomId")
+        room = self._rooms.get(room_id)
+        if room is None or not room.game_started or room.status != "playing":
+            return None
+
+        board = room.board
+        color = "white" if board.turn == chess.WHITE else "black"
+        player = next((p for p in room.players if p["color"] == color), None)
+        move = data.get("move")
+        parsed = None
+        if player is not None and player["id"] == connection.user_id:
+            parsed = parse_move(board, move)
+        if parsed is None:
+            payload = {"error": "Invalid move"}
+            connection.emit("invalidMove", payload)
+            return payload
+
+        board.push(parsed)
+        room.history.append(move)
+        state = {
+            "roomId": room_id,
+            "fen": board.fen(),
+            "history": list(room.history),
+            "status": room.status,
+            "white": room.player_name("white"),
+            "black": room.player_name("black"),
+            "lastMove": move,
+        }
+        self._emit_to_room(room_id, "gameState", state)
+
+        result = game_result(board)
+        if result is not None:
+            self._end_game(room, result)
+        return state
+
+    def _end_game(self, room: Room, result: Dict[str, Any]):
+        room.status = "ended"
+        if self._game_over_room_id:
+            result["roomId"] = room.room_id
+        self._emit_to_room(room.room_id, "gameOver", result)
+
+    def _on_offer_draw(self, connection: Connection, data: Dict[str, Any]):
+        self._emit_to_room(data.get("roomId"), "drawOffered", data.get("color"))
+
+    def _on_accept_draw(self, connection: Connection, data: Dict[str, Any]):
+        room = self._rooms.get(data.get("roomId"))
+        if room is not None:
+            self._end_game(room, {"winner": "draw", "reason": "draw"})
+
+    def _on_decline_draw(self, connection: Connection, data: Dict[str, Any]):
+        room_id = data.get("roomId")
+        for other in list(self._room_members.get(room_id, ())):
+            if other is not connection:
+                other.emit("drawDeclined")
+
+    def _on_resign(self, connection: Connection, data: Dict[str, Any]):
+        room = self._rooms.get(data.get("roomId"))
+        if room is not None:
+            self._end_game(room, dict(data.get("result") or {}))
+
+    def _on_get_game_state(self, connection: Connection, room_id: str):
+        room = self._rooms.get(room_id)
+        if room is None:
+            return None
+        state = room.as_dict()
+        state.update(fen=state["gameFen"], history=state["moveHistory"], status=room.status)
+        self._emit_to_room(room_id, "gameState", state)
+        return state
+
+    def _on_send_message(self, connection: Connection, data: Dict[str, Any]):
+        self._emit_to_room(
+            data.get("roomId"),
+            "newMessage",
+            {"userId": connection.user_id, "message": data.get("message")},
+        )
+
+    @property
+    def rooms(self) -> Dict[str, Room]:
+        return self._rooms
+
+    @property
+    def connections(self) -> Dict[str, Connection]:
+        return self._connections
+
+    @property
+    def timings(self) -> Dict[str, RunningStats]:
+        """
+        :return: Handler time per event, in seconds.
+        :rtype: Dict[str, RunningStats]
+        """
+        return dict(self._timings)
+
+
+class WebsocketConnection(Connection):
+    """A Socket.IO connection over a websocket, with its own writer task."""
+
+    def __init__(self, sid: str, websocket: Any):
+        super().__init__(sid)
+        self.websocket = websocket
+        self._frames: "Queue[str]" = Queue()
+        self._writer: Task[Any] = asyncio.create_task(self._write())
+
+    def emit(self, event: str, payload: Any = None):
+        if payload is None:
+            self.send(encode_event(event))
+        else:
+            self.send(encode_event(event, payload))
+
+    def send(self, frame: str):
+        self._frames.put_nowait(frame)
+
+    async def _write(self):
+        while True:
+            frame = await self._frames.get()
+            await self.websocket.send(frame)
+
+    def close(self):
+        self._writer.cancel()
+
+
+class WebsocketGameServer:
+    """Serves a GameServer over the Engine.IO v4 websocket transport."""
+
+    def __init__(
+        self,
+        game_server: Optional[GameServer] = None,
+        *,
+        ping_interval: float = 25.0,
+        ping_timeout: float = 20.0,
+    ):
+        self.game_server = game_server or GameServer()
+        self._ping_interval = ping_interval
+        self._ping_timeout = ping_timeout
+        self._server: Any = None
+
+    async def _handle(self, websocket: Any, *_: Any):
+        sid = uuid.uuid4().hex[:20]
+        connection = WebsocketConnection(sid, websocket)
+        connection.send(
+            "0"
+            + json_backend.dumps(
+                {
+                    "sid": sid,
+                    "upgrades": [],
+                    "pingInterval": int(self._ping_interval * 1000),
+                    "pingTimeout": int(self._ping_timeout * 1000),
+                    "maxPayload": 1000000,
+                }
+            )
+        )
+        pinger = asyncio.create_task(self._ping(connection))
+        game_server = self.game_server
+        try:
+            async for message in websocket:
+                packet = decode_frame(str(message))
+                if packet.kind == KIND_EVENT:
+                    event, *args = json_backend.loads(packet.data)
+                    response = game_server.handle(connection, event, *args)
+                    if packet.ack_id is not None:
+                        connection.send(
+                            "43%d%s" % (packet.ack_id, json_backend.dumps([response]))
+                        )
+                elif packet.kind == KIND_CONNECT:
+                    auth = json_backend.loads(packet.data) if packet.data else None
+                    connection.send("40" + json_backend.dumps({"sid": sid}))
+                    game_server.connect(connection, auth)
+                elif packet.kind == KIND_PING:
+                    connection.send(KIND_PONG)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            pinger.cancel()
+            connection.close()
+            game_server.disconnect(connection)
+
+    async def _ping(self, connection: WebsocketConnection):
+        while True:
+            await asyncio.sleep(self._ping_interval)
+            connection.send(KIND_PING)
+
+    async def start(self, host: str = "localhost", port: int = 3001):
+        self._server = await websockets.serve(self._handle, host, port)
+        return self._server
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self, host: str = "localhost", port: int = 3001):
+        await self.start(host, port)
+        await asyncio.Future()
+
+    def start_in_thread(self, host: str = "localhost", port: int = 3001) -> Thread:
+        """Starts serving on a dedicated event loop thread and returns once the
+        server is listening.
+
+        :return: The daemon thread running the server's loop.
+        :rtype: Thread
+        """
+        loop = asyncio.new_event_loop()
+        thread = Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        asyncio.run_coroutine_threadsafe(self.start(host, port), loop).result()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Python stand-in for web2server.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument(
+        "--no-room-list",
+        action="store_true",
+        help="do not broadcast roomListUpdate on room changes",
+    )
+    parser.add_argument(
+        "--game-over-room-id",
+        action="store_true",
+        help="add the roomId to gameOver payloads",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = WebsocketGameServer(
+        GameServer(
+            broadcast_room_list=not args.no_room_list,
+            game_over_room_id=args.game_over_room_id,
+        )
+    )
+    logging.getLogger("GameServer").info("Serving on ws://%s:%d", args.host, args.port)
+    asyncio.run(server.serve_forever(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""This module defines a player choosing the best statically evaluated move.
+"""
+
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import chess
+
+from batch_evaluation import BatchEvaluator
+from environment import AbstractGame
+from player import Player
+
+
+class GreedyPlayer(Player):
+    """Player scoring every legal move with one batched static evaluation and
+    playing the best one, at random among equally scored moves. With a move
+    batch size, the moves of every game of a batch are scored at once; alone,
+    positions with few legal moves are scored one by one, which is faster (see
+    BatchEvaluator's min_batch)."""
+
+    def __init__(self, *args: Any, evaluator: Optional[BatchEvaluator] = None, **kwargs: Any):
+        """
+        :param evaluator: The batch evaluator, by default with mobility.
+        :type evaluator: BatchEvaluator, optional
+        """
+        self._evaluator = evaluator if evaluator is not None else BatchEvaluator()
+        super(GreedyPlayer, self).__init__(*args, **kwargs)
+
+    def choose_move(self, game: AbstractGame) -> Any:
+        return self._pick(game, self._evaluator.rank_moves(game.board))
+
+    def choose_moves(self, games: List[AbstractGame]) -> List[Any]:
+        rankings = self._evaluator.rank_all([game.board for game in games])
+        return [self._pick(game, ranking) for game, ranking in zip(games, rankings)]
+
+    def _pick(self, game: AbstractGame, ranking: List[Tuple[chess.Move, int]]) -> Any:
+        if not ranking:
+            return False
+        best_score = ranking[0][1]
+        if game.observations is not None:
+            game.observations.annotate_next(best_score)
+        return random.choice(
+            [move for move, score in ranking if score == best_score]
+        )
+
+    def rank_live_games(self) -> Dict[str, List[Tuple[chess.Move, int]]]:
+        """Ranks the legal moves of every unfinished game in one batch.
+
+        :return: The moves of each game and their scores, best first, by game
+            tag.
+        :rtype: Dict[str, List[Tuple[chess.Move, int]]]
+        """
+        games = [game for game in self._games.values() if not game._finished]
+        rankings = self._evaluator.rank_all([game.board for game in games])
+        return {game.game_tag: ranking for game, ranking in zip(games, rankings)}
+
+    @property
+    def evaluator(self) -> BatchEvaluator:
+        return self._evaluator
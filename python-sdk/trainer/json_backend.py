@@ -0,0 +1,76 @@
+"""This module selects the JSON implementation used to decode and encode frames.
+
+orjson or msgspec are used when installed, with the standard library as the
+fallback. The active backend is exposed through the module level loads and
+dumps functions, which always return python objects and str respectively.
+"""
+
+import json
+from typing import Any, Callable, Dict, NamedTuple
+
+
+class JsonBackend(NamedTuple):
+    """A JSON implementation. dumps must return a compact str."""
+
+    name: str
+    loads: Callable[[Any], Any]
+    dumps: Callable[[Any], str]
+
+
+def _stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+
+BACKENDS: Dict[str, JsonBackend] = {
+    "json": JsonBackend("json", json.loads, _stdlib_dumps),
+}
+
+try:
+    import msgspec
+
+    _msgspec_encoder = msgspec.json.Encoder()
+
+    def _msgspec_dumps(obj: Any) -> str:
+        return _msgspec_encoder.encode(obj).decode()
+
+    BACKENDS["msgspec"] = JsonBackend(
+        "msgspec", msgspec.json.Decoder().decode, _msgspec_dumps
+    )
+except ImportError:
+    pass
+
+try:
+    import orjson
+
+    def _orjson_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    BACKENDS["orjson"] = JsonBackend("orjson", orjson.loads, _orjson_dumps)
+except ImportError:
+    pass
+
+PREFERENCE = ("orjson", "msgspec", "json")
+
+backend: JsonBackend = next(BACKENDS[name] for name in PREFERENCE if name in BACKENDS)
+loads: Callable[[Any], Any] = backend.loads
+dumps: Callable[[Any], str] = backend.dumps
+
+
+def set_backend(name: str) -> JsonBackend:
+    """Selects the JSON backend used by the codec.
+
+    :param name: One of 'orjson', 'msgspec' or 'json'.
+    :type name: str
+    :raises ValueError: If the backend is not installed.
+    :return: The selected backend.
+    :rtype: JsonBackend
+    """
+    global backend, loads, dumps
+    if name not in BACKENDS:
+        raise ValueError(
+            f"JSON backend {name} is not available. Available: {', '.join(BACKENDS)}"
+        )
+    backend = BACKENDS[name]
+    loads = backend.loads
+    dumps = backend.dumps
+    return backend
@@ -0,0 +1,216 @@
+"""This module contains the per-room mailboxes dispatching inbound events.
+"""
+
+from asyncio import Event, Task, create_task
+from collections import Counter, deque
+from logging import Logger
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Container,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from payloads import GameState
+
+GAME_STATE_EVENT = "gameState"
+
+
+def room_of(payload: Any) -> Optional[str]:
+    """Returns the room an event payload belongs to, if any.
+
+    :param payload: A typed or plain dict payload.
+    :type payload: Any
+    :return: The room identifier.
+    :rtype: str, optional
+    """
+    room_id = getattr(payload, "room_id", None)
+    if room_id is None and isinstance(payload, dict):
+        room_id = payload.get("roomId")
+    return room_id
+
+
+class RoomMailboxes:
+    """Dispatches inbound events through one ordered mailbox per room.
+
+    Events of a room are handled strictly in arrival order by a single worker
+    task, which only lives while the mailbox is non-empty. Events without a
+    room go through a shared global mailbox.
+
+    A gameState is coalesced when it is superseded: a still pending state of the
+    same room is replaced by a newer one, and a state whose ply is not newer than
+    the last handled state of the room is dropped.
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[str, Any], Awaitable[Any]],
+        logger: Optional[Logger] = None,
+    ):
+        """
+        :param dispatch: Coroutine function handling one event and its payload.
+        :type dispatch: Callable[[str, Any], Awaitable[Any]]
+        :param logger: Logger used to report handler failures.
+        :type logger: Logger, optional
+        """
+        self._dispatch = dispatch
+        self._logger = logger
+
+        # entries are [event, payload]
+        self._mailboxes: Dict[Hashable, Deque[List[Any]]] = {}
+        self._workers: Dict[Hashable, Task[Any]] = {}
+        self._pending_states: Dict[str, List[Any]] = {}
+        self._last_ply: Dict[str, int] = {}
+
+        self._coalesced: int = 0
+        self._pending: int = 0
+        self._drained: Optional[Tuple[int, Event]] = None
+
+    def put(self, event: str, payload: Any):
+        """Enqueues an event in the mailbox of its room.
+
+        :param event: The event name.
+        :type event: str
+        :param payload: The event payload.
+        :type payload: Any
+        """
+        room = room_of(payload)
+        if room is not None and event == GAME_STATE_EVENT and isinstance(
+            payload, GameState
+        ):
+            if self._coalesce_state(room, payload):
+                return
+
+        entry = [event, payload]
+        if room is not None and event == GAME_STATE_EVENT:
+            self._pending_states[room] = entry
+
+        mailbox = self._mailboxes.get(room)
+        if mailbox is None:
+            mailbox = self._mailboxes[room] = deque()
+        mailbox.append(entry)
+        self._pending += 1
+
+        if room not in self._workers:
+            self._workers[room] = create_task(self._drain(room, mailbox))
+
+    def _coalesce_state(self, room: str, state: GameState) -> bool:
+        last_ply = self._last_ply.get(room)
+        if last_ply is not None and state.ply <= last_ply:
+            self._coalesced += 1
+            return True
+
+        pending = self._pending_states.get(room)
+        if pending is not None:
+            self._coalesced += 1
+            if state.ply >= pending[1].ply:
+                pending[1] = state
+            return True
+        return False
+
+    async def _drain(self, room: Hashable, mailbox: Deque[List[Any]]):
+        try:
+            while mailbox:
+                entry = mailbox.popleft()
+                self._pending -= 1
+                if self._drained is not None and self._pending <= self._drained[0]:
+                    self._drained[1].set()
+                    self._drained = None
+                event, payload = entry
+
+                if event == GAME_STATE_EVENT and room is not None:
+                    if self._pending_states.get(room) is entry:
+                        del self._pending_states[room]
+                    if isinstance(payload, GameState):
+                        last_ply = self._last_ply.get(room)
+                        if last_ply is not None and payload.ply <= last_ply:
+                            self._coalesced += 1
+                            continue
+                        self._last_ply[room] = payload.ply
+
+                try:
+                    await self._dispatch(event, payload)
+                except Exception as e:
+                    if self._logger is not None:
+                        self._logger.exception(e)
+        finally:
+            del self._workers[room]
+            if self._mailboxes.get(room) is mailbox and not mailbox:
+                del self._mailboxes[room]
+
+    async def wait_pending_at_most(self, n_events: int):
+        """Waits until at most n_events are pending.
+
+        Only one waiter is supported, the client's listen loop.
+
+        :param n_events: The number of pending events to wait for.
+        :type n_events: int
+        """
+        if self._pending <= n_events:
+            return
+        drained = Event()
+        self._drained = (n_events, drained)
+        await drained.wait()
+
+    def shed(self, events: Container[str]) -> Counter[str]:
+        """Drops every pending event whose name is in events.
+
+        :param events: The names of the events to drop.
+        :type events: Container[str]
+        :return: The number of dropped events, per event name.
+        :rtype: Counter[str]
+        """
+        shed: Counter[str] = Counter()
+        for room, mailbox in self._mailboxes.items():
+            kept = [entry for entry in mailbox if entry[0] not in events]
+            if len(kept) == len(mailbox):
+                continue
+            for entry in mailbox:
+                if entry[0] in events:
+                    shed[entry[0]] += 1
+                    if self._pending_states.get(room) is entry:
+                        del self._pending_states[room]
+            mailbox.clear()
+            mailbox.extend(kept)
+        self._pending -= sum(shed.values())
+        return shed
+
+    def forget(self, room: str):
+        """Forgets the ordering state of a finished room."""
+        self._last_ply.pop(room, None)
+
+    def reset(self):
+        """Forgets the last handled ply of every room, so that the next state of
+        each room is handled, eg. when resynchronising after a reconnection."""
+        self._last_ply.clear()
+
+    @property
+    def coalesced(self) -> int:
+        """
+        :return: The number of gameState events replaced or dropped because a
+            newer state superseded them.
+        :rtype: int
+        """
+        return self._coalesced
+
+    @property
+    def pending(self) -> int:
+        """
+        :return: The number of events waiting in mailboxes.
+        :rtype: int
+        """
+        return self._pending
+
+    @property
+    def active_rooms(self) -> int:
+        """
+        :return: The number of mailboxes with a running worker.
+        :rtype: int
+        """
+        return len(self._workers)
@@ -0,0 +1,479 @@
+"""This module contains a Monte Carlo tree search with batched leaf evaluation.
+
+Simulations are run in batches: each batch selects up to batch_size leaves,
+applying a virtual loss along every selected path so that the next selections
+explore other lines, then evaluates all the leaves with one call of the
+evaluator, and backs the values up while removing the virtual losses.
+
+The tree is stored column-wise in NumPy arrays, with the children of a node
+contiguous, which costs about 25 bytes per node instead of a Python object.
+Values are in [-1, 1]; the value of a node is from the point of view of the
+player who moved into it.
+"""
+
+from math import sqrt
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import chess
+import numpy as np
+
+from board_encoder import BoardEncoder
+from evaluation import evaluate
+from moves import pack_move, unpack_move
+
+# node states
+UNEXPANDED = 0
+EXPANDED = 1
+LOST = 2
+DRAWN = 3
+
+# priors of the moves of each leaf, aligned with its legal moves, or None for
+# uniform priors
+Priors = Optional[Sequence[float]]
+Evaluator = Callable[
+    [List[chess.Board], List[List[chess.Move]]], Tuple[np.ndarray, List[Priors]]
+]
+
+
+class StaticEvaluator:
+    """Evaluator scoring leaves with a static evaluation, squashed into [-1, 1],
+    with uniform priors."""
+
+    def __init__(
+        self, evaluate: Callable[[chess.Board], int] = evaluate, scale: float = 400.0
+    ):
+        """
+        :param evaluate: Static evaluation, in centipawns from the point of view
+            of the side to move.
+        :type evaluate: Callable[[chess.Board], int]
+        :param scale: Centipawns of a value of tanh(1), about 0.76.
+        :type scale: float
+        """
+        self._evaluate = evaluate
+        self._scale = scale
+
+    def __call__(
+        self, boards: List[chess.Board], moves: List[List[chess.Move]]
+    ) -> Tuple[np.ndarray, List[Priors]]:
+        scores = np.fromiter((self._evaluate(board) for board in boards), np.float32)
+        return np.tanh(scores / self._scale), [None] * len(boards)
+
+
+class PolicyValueEvaluator:
+    """Evaluator running a NumPy policy and value function on the planes of
+    board_encoder.
+
+    The model maps planes of shape (n, 18, 8, 8) to policy logits of shape
+    (n, 4096), indexed by from_square * 64 + to_square (promotions to any piece
+    share their logit), and values of shape (n,) in [-1, 1], from the point of
+    view of the side to move.
+    """
+
+    def __init__(
+        self,
+        model: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]],
+        max_batch: int = 256,
+    ):
+        """
+        :param model: The policy and value function.
+        :type model: Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]
+        :param max_batch: Largest batch evaluated.
+        :type max_batch: int
+        """
+        self._model = model
+        self._encoder = BoardEncoder(max_batch)
+
+    def __call__(
+        self, boards: List[chess.Board], moves: List[List[chess.Move]]
+    ) -> Tuple[np.ndarray, List[Priors]]:
+        logits, values = self._model(self._encoder.encode(boards))
+        priors: List[Priors] = []
+        for row, leaf_moves in zip(logits, moves):
+            if not leaf_moves:
+                priors.append(None)
+                continue
+            indices = np.fromiter(
+                (move.from_square << 6 | move.to_square for move in leaf_moves),
+                np.intp,
+                len(leaf_moves),
+            )
+            leaf_logits = row[indices]
+            weights = np.exp(leaf_logits - leaf_logits.max())
+            priors.append(weights / weights.sum())
+        return np.asarray(values, dtype=np.float32).reshape(-1), priors
+
+
+class MCTSTree:
+    """Array-backed search tree, growing by doubling up to max_nodes."""
+
+    __slots__ = (
+        "parent",
+        "move",
+        "first_child",
+        "n_children",
+        "state",
+        "visits",
+        "value_sum",
+        "prior",
+        "_size",
+        "_max_nodes",
+    )
+
+    def __init__(self, capacity: int = 1 << 14, max_nodes: int = 1 << 22):
+        """
+        :param capacity: Number of nodes preallocated.
+        :type capacity: int
+        :param max_nodes: Maximum number of nodes.
+        :type max_nodes: int
+        """
+        capacity = max(min(capacity, max_nodes), 1)
+        self.parent = np.empty(capacity, np.int32)
+        self.move = np.empty(capacity, np.uint16)
+        self.first_child = np.empty(capacity, np.int32)
+        self.n_children = np.empty(capacity, np.uint16)
+        self.state = np.empty(capacity, np.uint8)
+        self.visits = np.empty(capacity, np.int32)
+        self.value_sum = np.empty(capacity, np.float32)
+        self.prior = np.empty(capacity, np.float32)
+        self._max_nodes = max_nodes
+        self.clear()
+
+    def clear(self):
+        """Leaves only an unexpanded root, node 0."""
+        self._size = 1
+        self._init_nodes(slice(0, 1), -1, 0, 1.0)
+
+    def _init_nodes(self, nodes: slice, parent: int, moves: Any, priors: Any):
+        self.parent[nodes] = parent
+        self.move[nodes] = moves
+        self.first_child[nodes] = -1
+        self.n_children[nodes] = 0
+        self.state[nodes] = UNEXPANDED
+        self.visits[nodes] = 0
+        self.value_sum[nodes] = 0.0
+        self.prior[nodes] = priors
+
+    def _reserve(self, n: int) -> bool:
+        needed = self._size + n
+        if needed <= len(self.parent):
+            return True
+        if needed > self._max_nodes:
+            return False
+        capacity = min(max(2 * len(self.parent), needed), self._max_nodes)
+        for name in ("parent", "move", "first_child", "n_children", "state",
+                     "visits", "value_sum", "prior"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, column.dtype)
+            grown[: self._size] = column[: self._size]
+            setattr(self, name, grown)
+        return True
+
+    def expand(self, node: int, moves: List[chess.Move], priors: Priors) -> bool:
+        """Adds the children of a node.
+
+        :param node: The node.
+        :type node: int
+        :param moves: Its legal moves, at least one.
+        :type moves: List[chess.Move]
+        :param priors: The prior of each move, or None for uniform priors.
+        :type priors: Sequence[float], optional
+        :return: False if the tree is full.
+        :rtype: bool
+        """
+        n = len(moves)
+        if not self._reserve(n):
+            return False
+        first = self._size
+        self._size += n
+        self._init_nodes(
+            slice(first, first + n),
+            node,
+            [pack_move(move) for move in moves],
+            1.0 / n if priors is None else priors,
+        )
+        self.first_child[node] = first
+        self.n_children[node] = n
+        self.state[node] = EXPANDED
+        return True
+
+    def child(self, node: int, move: chess.Move) -> int:
+        """
+        :return: The child of node reached by move, or -1.
+        :rtype: int
+        """
+        first = self.first_child[node]
+        if first < 0:
+            return -1
+        found = np.flatnonzero(
+            self.move[first : first + self.n_children[node]] == pack_move(move)
+        )
+        return int(first + found[0]) if found.size else -1
+
+    def children(self, node: int) -> slice:
+        first = int(self.first_child[node])
+        return slice(first, first + int(self.n_children[node])) if first >= 0 else slice(0, 0)
+
+    def reroot(self, node: int):
+        """Makes node the root, node 0, compacting its subtree and dropping the
+        rest of the tree."""
+        if node == 0:
+            return
+        levels = [np.array([node], np.int64)]
+        level = levels[0]
+        while True:
+            counts = self.n_children[level].astype(np.int64)
+            total = int(counts.sum())
+            if not total:
+                break
+            # the children of each node of the level, block after block
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            level = np.repeat(self.first_child[level].astype(np.int64), counts) + offsets
+            levels.append(level)
+        old = np.concatenate(levels)
+        remap = np.full(self._size, -1, np.int64)
+        remap[old] = np.arange(len(old))
+
+        size = len(old)
+        first_child = self.first_child[old]
+        self.first_child[:size] = np.where(
+            first_child >= 0, remap[np.maximum(first_child, 0)], -1
+        )
+        parent = self.parent[old]
+        self.parent[:size] = remap[np.maximum(parent, 0)]
+        self.parent[0] = -1
+        for column in (self.move, self.n_children, self.state, self.visits,
+                       self.value_sum, self.prior):
+            column[:size] = column[old]
+        self._size = size
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            getattr(self, name).nbytes
+            for name in ("parent", "move", "first_child", "n_children", "state",
+                         "visits", "value_sum", "prior")
+        )
+
+
+class MCTSResult(NamedTuple):
+    """Outcome of a search: the chosen move, the mean value of the root from
+    the point of view of the side to move, the simulations run, and the visits
+    of each root move."""
+
+    move: Optional[chess.Move]
+    value: float
+    simulations: int
+    visits: List[Tuple[chess.Move, int]]
+
+
+class MCTS:
+    """Batched PUCT search over an MCTSTree."""
+
+    def __init__(
+        self,
+        evaluator: Optional[Evaluator] = None,
+        batch_size: int = 16,
+        c_puct: float = 1.5,
+        virtual_loss: int = 1,
+        max_nodes: int = 1 << 22,
+    ):
+        """
+        :param evaluator: Called with the leaf boards and their legal moves,
+            returns their values, from the point of view of the side to move,
+            and the priors of their moves. Defaults to a StaticEvaluator.
+        :type evaluator: Callable, optional
+        :param batch_size: Number of leaves evaluated at once.
+        :type batch_size: int
+        :param c_puct: Exploration constant.
+        :type c_puct: float
+        :param virtual_loss: Losses added to the nodes of a path being
+            evaluated.
+        :type virtual_loss: int
+        :param max_nodes: Maximum number of nodes of the tree.
+        :type max_nodes: int
+        """
+        self._evaluator = evaluator if evaluator is not None else StaticEvaluator()
+        self._batch_size = batch_size
+        self._c_puct = c_puct
+        self._virtual_loss = virtual_loss
+        self._tree = MCTSTree(max_nodes=max_nodes)
+        self._tree_full: bool = False
+        self._collisions: int = 0
+
+    def run(self, board: chess.Board, simulations: int) -> int:
+        """Runs simulations from the root, whose position is board.
+
+        :param board: The root position, left untouched.
+        :type board: chess.Board
+        :param simulations: Number of simulations, each evaluating a leaf or
+            reaching the end of a game.
+        :type simulations: int
+        :return: The number of simulations run, fewer if the tree is full.
+        :rtype: int
+        """
+        board = board.copy()
+        done = 0
+        while done < simulations and not self._tree_full:
+            evaluated = self._run_batch(board, min(self._batch_size, simulations - done))
+            if not evaluated:
+                break
+            done += evaluated
+        return done
+
+    def _run_batch(self, board: chess.Board, batch_size: int) -> int:
+        tree = self._tree
+        virtual_loss = self._virtual_loss
+        paths: List[np.ndarray] = []
+        boards: List[chess.Board] = []
+        leaf_moves: List[List[chess.Move]] = []
+        n_terminal = 0
+        pending = set()
+
+        for _ in range(batch_size):
+            path = self._select(board)
+            leaf = path[-1]
+            state = tree.state[leaf]
+            value = None
+            if state == LOST:
+                value = -1.0
+            elif state == DRAWN:
+                value = 0.0
+            elif leaf in pending:
+                # selected twice in the batch despite the virtual loss
+                self._collisions += 1
+            else:
+                moves = list(board.legal_moves)
+                if not moves:
+                    tree.state[leaf] = LOST if board.is_check() else DRAWN
+                    value = -1.0 if tree.state[leaf] == LOST else 0.0
+                elif board.is_insufficient_material() or board.halfmove_clock >= 100:
+                    tree.state[leaf] = DRAWN
+                    value = 0.0
+                elif len(path) > 1 and board.halfmove_clock >= 4 and board.is_repetition(2):
+                    value = 0.0
+                else:
+                    pending.add(leaf)
+                    nodes = np.array(path, np.int64)
+                    tree.visits[nodes] += virtual_loss
+                    tree.value_sum[nodes] -= virtual_loss
+                    paths.append(nodes)
+                    boards.append(board.copy(stack=False))
+                    leaf_moves.append(moves)
+            if value is not None:
+                self._backup(np.array(path, np.int64), value, 0)
+                n_terminal += 1
+            for _ in range(len(path) - 1):
+                board.pop()
+
+        if boards:
+            values, priors = self._evaluator(boards, leaf_moves)
+            for nodes, value, moves, leaf_priors in zip(paths, values, leaf_moves, priors):
+                if not tree.expand(int(nodes[-1]), moves, leaf_priors):
+                    self._tree_full = True
+                self._backup(nodes, float(value), virtual_loss)
+        return len(boards) + n_terminal
+
+    def _select(self, board: chess.Board) -> List[int]:
+        """Descends from the root to a leaf, pushing the moves on board."""
+        tree = self._tree
+        c_puct = self._c_puct
+        node = 0
+        path = [0]
+        while tree.state[node] == EXPANDED:
+            children = tree.children(node)
+            visits = tree.visits[children]
+            value_sum = tree.value_sum[children]
+            # unvisited children are valued as losses, so priors lead exploration
+            q = np.where(visits > 0, value_sum / np.maximum(visits, 1), -1.0)
+            u = (c_puct * sqrt(max(int(tree.visits[node]), 1))) * tree.prior[children] / (
+                1 + visits
+            )
+            node = children.start + int(np.argmax(q + u))
+            board.push(unpack_move(int(tree.move[node])))
+            path.append(node)
+        return path
+
+    def _backup(self, nodes: np.ndarray, value: float, virtual_loss: int):
+        """Backs up the value of a leaf, from the point of view of its side to
+        move, and removes the virtual loss of its path."""
+        tree = self._tree
+        # the leaf was moved into by the opponent of its side to move
+        signs = np.where(np.arange(len(nodes))[::-1] % 2 == 0, -value, value)
+        tree.visits[nodes] += 1 - virtual_loss
+        tree.value_sum[nodes] += signs + virtual_loss
+
+    def result(self, temperature: float = 0.0, rng: Optional[np.random.Generator] = None) -> MCTSResult:
+        """
+        :param temperature: 0 plays the most visited root move, above 0 samples
+            moves proportionally to visits ** (1 / temperature).
+        :type temperature: float
+        :param rng: Random generator of the sampling.
+        :type rng: np.random.Generator, optional
+        :return: The result of the simulations run so far.
+        :rtype: MCTSResult
+        """
+        tree = self._tree
+        children = tree.children(0)
+        visits = tree.visits[children]
+        moves = [unpack_move(int(packed)) for packed in tree.move[children]]
+        root_visits = int(tree.visits[0])
+        # the root is moved into by the opponent of the side to move
+        value = -float(tree.value_sum[0]) / root_visits if root_visits else 0.0
+        if not moves:
+            return MCTSResult(None, value, root_visits, [])
+        if temperature <= 0:
+            index = int(np.argmax(visits))
+        else:
+            weights = visits.astype(np.float64) ** (1.0 / temperature)
+            total = weights.sum()
+            rng = rng or np.random.default_rng()
+            index = (
+                int(rng.choice(len(moves), p=weights / total))
+                if total > 0
+                else int(np.argmax(visits))
+            )
+        return MCTSResult(
+            moves[index], value, root_visits, list(zip(moves, visits.tolist()))
+        )
+
+    def advance(self, moves: Sequence[chess.Move]) -> bool:
+        """Moves the root down the tree along moves, keeping their subtree.
+
+        :param moves: The moves played from the root.
+        :type moves: Sequence[chess.Move]
+        :return: False, and a cleared tree, if a move is not in the tree.
+        :rtype: bool
+        """
+        node = 0
+        for move in moves:
+            node = self._tree.child(node, move)
+            if node < 0:
+                self.reset()
+                return False
+        self._tree.reroot(node)
+        self._tree_full = False
+        return True
+
+    def reset(self):
+        self._tree.clear()
+        self._tree_full = False
+
+    @property
+    def tree(self) -> MCTSTree:
+        return self._tree
+
+    @property
+    def batch_size(self) -> int:
+        return self._batch_size
+
+    @property
+    def collisions(self) -> int:
+        """
+        :return: The number of selections that reached a leaf already being
+            evaluated in the same batch.
+        :rtype: int
+        """
+        return self._collisions
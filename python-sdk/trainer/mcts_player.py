@@ -0,0 +1,131 @@
+"""This module defines a player choosing its moves with a Monte Carlo tree search.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from environment import AbstractGame
+from mcts import MCTS, Evaluator, MCTSResult
+from player import Player
+
+
+class MCTSPlayer(Player):
+    """Player running batched MCTS simulations in every position.
+
+    Each game keeps its tree between moves: the moves played since the last
+    search, the player's and the opponent's reply read from the gameState
+    history, move the root down the tree, keeping the simulations of the
+    subtree. The mean value of the root is recorded in the game's observations.
+    Trees of games that are over, or no longer tracked by the player, are freed
+    before every search, and at most max_trees trees, the most recently searched,
+    are kept. Workers of a process move executor do not see which games are
+    over, so only that bound applies to them. A game's tree is then only reused
+    when its successive moves are chosen by the same worker.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        simulations: int = 800,
+        batch_size: int = 16,
+        evaluator: Optional[Evaluator] = None,
+        c_puct: float = 1.5,
+        virtual_loss: int = 1,
+        temperature: float = 0.0,
+        max_nodes: int = 1 << 20,
+        max_trees: int = 64,
+        **kwargs: Any,
+    ):
+        """
+        :param simulations: Number of simulations per move.
+        :type simulations: int
+        :param batch_size: Number of leaves evaluated at once.
+        :type batch_size: int
+        :param evaluator: The leaf evaluator, shared by every game, by default a
+            StaticEvaluator.
+        :type evaluator: Callable, optional
+        :param c_puct: Exploration constant.
+        :type c_puct: float
+        :param virtual_loss: Losses added to the paths being evaluated.
+        :type virtual_loss: int
+        :param temperature: 0 plays the most visited move, above 0 samples moves
+            by visits, eg. to diversify self-play games.
+        :type temperature: float
+        :param max_nodes: Maximum number of nodes of each game's tree.
+        :type max_nodes: int
+        :param max_trees: Maximum number of trees kept between moves.
+        :type max_trees: int
+        """
+        self._simulations = simulations
+        self._batch_size = batch_size
+        self._evaluator = evaluator
+        self._c_puct = c_puct
+        self._virtual_loss = virtual_loss
+        self._temperature = temperature
+        self._max_nodes = max_nodes
+        self._max_trees = max_trees
+        # the search of each game, and the ply of its root, least recently
+        # searched first. choose_move runs concurrently in a thread move
+        # executor, so the lock guards every change
+        self._searches: "OrderedDict[str, Tuple[MCTS, int]]" = OrderedDict()
+        self._searches_lock = threading.Lock()
+        self._last_result: Optional[MCTSResult] = None
+        super(MCTSPlayer, self).__init__(*args, **kwargs)
+
+    def _search_of(self, game: AbstractGame) -> MCTS:
+        board = game.board
+        with self._searches_lock:
+            if game.game_tag in self._games:
+                self._drop_stale_searches()
+            # taken out while it is searched
+            entry = self._searches.pop(game.game_tag, None)
+        if entry is None:
+            return MCTS(
+                self._evaluator,
+                self._batch_size,
+                self._c_puct,
+                self._virtual_loss,
+                self._max_nodes,
+            )
+        search, root_ply = entry
+        if root_ply > len(board.move_stack) or not search.advance(
+            board.move_stack[root_ply:]
+        ):
+            search.reset()
+        return search
+
+    def _drop_stale_searches(self):
+        # the game over callback is not called for every game, eg. games
+        # replaced or dropped by the player, or ended without notice
+        for game_tag in list(self._searches):
+            game = self._games.get(game_tag)
+            if game is None or game._finished:
+                self._searches.pop(game_tag, None)
+
+    def choose_move(self, game: AbstractGame) -> Any:
+        board = game.board
+        search = self._search_of(game)
+        search.run(board, self._simulations)
+        with self._searches_lock:
+            self._searches[game.game_tag] = (search, len(board.move_stack))
+            while len(self._searches) > self._max_trees:
+                self._searches.popitem(last=False)
+        result = self._last_result = search.result(self._temperature)
+        if result.move is None:
+            return False
+        if game.observations is not None:
+            game.observations.annotate_next(result.value)
+        return result.move
+
+    def _game_finished_callback(self, game: AbstractGame):
+        with self._searches_lock:
+            self._searches.pop(game.game_tag, None)
+
+    @property
+    def simulations(self) -> int:
+        return self._simulations
+
+    @property
+    def last_result(self) -> Optional[MCTSResult]:
+        return self._last_result
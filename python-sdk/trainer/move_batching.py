@@ -0,0 +1,174 @@
+"""This module contains the scheduler batching move requests across games.
+"""
+
+import asyncio
+from asyncio import Future, TimerHandle, create_task
+from inspect import isawaitable
+from time import perf_counter
+from typing import Any, Callable, List, Optional, Sequence
+
+from environment import AbstractGame
+from stats import Histogram
+
+ChooseMoves = Callable[[List[AbstractGame]], Any]
+
+
+class MoveBatcher:
+    """Gathers the move requests of every game of a player into batches, so
+    that a policy, eg. a neural network, chooses them with one vectorized call.
+
+    A batch is flushed when it reaches max_batch_size requests, or max_wait
+    seconds after its first request. Batches are chosen one at a time: requests
+    arriving meanwhile wait for the next batch, which they fill up.
+    """
+
+    def __init__(
+        self,
+        choose_moves: ChooseMoves,
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+    ):
+        """
+        :param choose_moves: Function, or coroutine function, returning the move
+            of each game of a batch, in order. Every request of a batch fails
+            with a ValueError if it returns another number of moves.
+        :type choose_moves: Callable[[List[AbstractGame]], Any]
+        :param max_batch_size: Maximum number of requests per batch.
+        :type max_batch_size: int
+        :param max_wait: Maximum seconds a batch waits for more requests.
+        :type max_wait: float
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._choose_moves = choose_moves
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+
+        # entries are [game, future, enqueue time]
+        self._pending: List[List[Any]] = []
+        self._timer: Optional[TimerHandle] = None
+        self._running: bool = False
+
+        self._batch_sizes = Histogram.exponential(1, 2, max_batch_size.bit_length())
+        self._queueing_delays = Histogram.exponential(0.0001, 2, 14)
+        self._choice_times = Histogram.exponential(0.0001, 2, 14)
+        self._batches: int = 0
+
+    async def request(self, game: AbstractGame) -> Any:
+        """Requests the move of a game and waits for its batch to be chosen.
+
+        :param game: The game.
+        :type game: AbstractGame
+        :return: The move returned by choose_moves for the game.
+        :rtype: Any
+        """
+        future: Future[Any] = asyncio.get_running_loop().create_future()
+        self._pending.append([game, future, perf_counter()])
+        if not self._running:
+            if len(self._pending) >= self._max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(
+                    self._max_wait, self._flush
+                )
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._running or not self._pending:
+            return
+        batch = self._pending[: self._max_batch_size]
+        del self._pending[: self._max_batch_size]
+        self._running = True
+        create_task(self._run(batch))
+
+    async def _run(self, batch: List[List[Any]]):
+        start = perf_counter()
+        for entry in batch:
+            self._queueing_delays.add(start - entry[2])
+        self._batch_sizes.add(len(batch))
+        self._batches += 1
+        try:
+            moves = self._choose_moves([entry[0] for entry in batch])
+            if isawaitable(moves):
+                moves = await moves
+            moves = await self._resolve(moves)
+            if len(moves) != len(batch):
+                raise ValueError(
+                    f"choose_moves returned {len(moves)} moves for "
+                    f"{len(batch)} games"
+                )
+        except Exception as exception:
+            for entry in batch:
+                if not entry[1].done():
+                    entry[1].set_exception(exception)
+        else:
+            for entry, move in zip(batch, moves):
+                if not entry[1].done():
+                    entry[1].set_result(move)
+        finally:
+            self._choice_times.add(perf_counter() - start)
+            self._running = False
+            self._schedule_next()
+
+    @staticmethod
+    async def _resolve(moves: Sequence[Any]) -> List[Any]:
+        # policies may return a coroutine per game
+        return [await move if isawaitable(move) else move for move in moves]
+
+    def _schedule_next(self):
+        if not self._pending:
+            return
+        waited = perf_counter() - self._pending[0][2]
+        if len(self._pending) >= self._max_batch_size or waited >= self._max_wait:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self._max_wait - waited, self._flush
+            )
+
+    @property
+    def pending(self) -> int:
+        """
+        :return: The number of requests waiting for a batch.
+        :rtype: int
+        """
+        return len(self._pending)
+
+    @property
+    def batches(self) -> int:
+        return self._batches
+
+    @property
+    def batch_sizes(self) -> Histogram:
+        """
+        :return: The number of requests per batch.
+        :rtype: Histogram
+        """
+        return self._batch_sizes
+
+    @property
+    def queueing_delays(self) -> Histogram:
+        """
+        :return: Seconds between a request and the start of its batch.
+        :rtype: Histogram
+        """
+        return self._queueing_delays
+
+    @property
+    def choice_times(self) -> Histogram:
+        """
+        :return: Seconds choose_moves takes per batch.
+        :rtype: Histogram
+        """
+        return self._choice_times
+
+    @property
+    def max_batch_size(self) -> int:
+        return self._max_batch_size
+
+    @property
+    def max_wait(self) -> float:
+        return self._max_wait
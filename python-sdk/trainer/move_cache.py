@@ -0,0 +1,245 @@
+"""This module contains a cache of legal moves and move choices keyed by position.
+
+Positions are keyed by the python-chess transposition key (pieces, side to
+move, castling rights and en passant square) by default. The polyglot Zobrist
+hash, which is stable across processes and is the key of polyglot opening books,
+identifies the same positions but costs about as much to compute as a quarter of
+the legal moves it saves.
+"""
+
+import functools
+import random
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import chess
+import chess.polyglot
+
+EVICTION_POLICIES = ("lru", "fifo")
+
+
+def transposition_key(board: chess.Board) -> Hashable:
+    """
+    :return: A key equal for positions with the same legal moves.
+    :rtype: Hashable
+    """
+    return board._transposition_key()
+
+
+class MoveCacheEntry:
+    """The legal moves of a position, with their renderings computed on demand,
+    and the moves chosen in it by deterministic policies."""
+
+    __slots__ = ("moves", "_san", "_uci", "choices")
+
+    def __init__(self, moves: Tuple[chess.Move, ...]):
+        self.moves = moves
+        self._san: Optional[Dict[chess.Move, str]] = None
+        self._uci: Optional[Dict[chess.Move, str]] = None
+        self.choices: Optional[Dict[str, Any]] = None
+
+    def san(self, board: chess.Board, move: chess.Move) -> str:
+        """
+        :param board: The position of this entry.
+        :type board: chess.Board
+        :param move: One of its legal moves.
+        :type move: chess.Move
+        :return: The SAN of the move.
+        :rtype: str
+        """
+        if self._san is None:
+            self._san = {}
+        san = self._san.get(move)
+        if san is None:
+            san = self._san[move] = board.san(move)
+        return san
+
+    def uci(self, move: chess.Move) -> str:
+        if self._uci is None:
+            self._uci = {}
+        uci = self._uci.get(move)
+        if uci is None:
+            uci = self._uci[move] = move.uci()
+        return uci
+
+
+class MoveCache:
+    """Size bounded cache of MoveCacheEntry, keyed by position.
+
+    It is meant to be shared by every player of a process, see SHARED_MOVE_CACHE,
+    as bots keep reaching the same positions, in openings in particular. Lookups
+    are thread-safe, eg. from choose_move calls in a thread move executor.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 65536,
+        eviction: str = "lru",
+        key: Callable[[chess.Board], Hashable] = transposition_key,
+    ):
+        """
+        :param maxsize: Maximum number of cached positions.
+        :type maxsize: int
+        :param eviction: 'lru' evicts the least recently used position, 'fifo'
+            the oldest one, which makes hits cheaper.
+        :type eviction: str
+        :param key: The function keying positions, eg.
+            chess.polyglot.zobrist_hash.
+        :type key: Callable[[chess.Board], Hashable]
+        """
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(
+                f"Unknown eviction policy {eviction}, expected one of {EVICTION_POLICIES}"
+            )
+        self._maxsize = maxsize
+        self._lru = eviction == "lru"
+        self._key = key
+        self._entries: "OrderedDict[Hashable, MoveCacheEntry]" = OrderedDict()
+        # guards lookups, inserts and evictions, legal moves are generated
+        # outside of it
+        self._lock = threading.Lock()
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def entry(self, board: chess.Board) -> MoveCacheEntry:
+        """Returns the entry of a position, computing its legal moves on a miss.
+
+        :param board: The position.
+        :type board: chess.Board
+        :return: The entry.
+        :rtype: MoveCacheEntry
+        """
+        key = self._key(board)
+        entries = self._entries
+        with self._lock:
+            entry = entries.get(key)
+            if entry is not None:
+                self._hits += 1
+                if self._lru:
+                    entries.move_to_end(key)
+                return entry
+            self._misses += 1
+
+        new_entry = MoveCacheEntry(tuple(board.legal_moves))
+        with self._lock:
+            # another thread may have cached the position meanwhile
+            entry = entries.setdefault(key, new_entry)
+            if entry is new_entry and len(entries) > self._maxsize:
+                entries.popitem(last=False)
+                self._evictions += 1
+        return entry
+
+    def legal_moves(self, board: chess.Board) -> Tuple[chess.Move, ...]:
+        return self.entry(board).moves
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        self._hits = self._misses = self._evictions = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._entries),
+            "maxsize": self._maxsize,
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        :return: The share of lookups that were hits, 0 before any lookup.
+        :rtype: float
+        """
+        lookups = self._hits + self._misses
+        return self._hits / lookups if lookups else 0.0
+
+
+SHARED_MOVE_CACHE = MoveCache()
+
+
+def cached_choice(
+    method: Optional[Callable[..., Any]] = None, *, cache: Optional[MoveCache] = None
+) -> Any:
+    """Decorates the choose_move of a deterministic policy, so that the move it
+    chooses in a position is only computed once.
+
+    Choices are stored per policy, keyed by the qualified name of the method, in
+    cache, or else the player's move_cache, or else SHARED_MOVE_CACHE. Can be
+    used with or without arguments::
+
+        @cached_choice
+        def choose_move(self, game): ...
+
+        @cached_choice(cache=MoveCache(1024))
+        def choose_move(self, game): ...
+    """
+
+    def decorate(method: Callable[..., Any]) -> Callable[..., Any]:
+        policy = method.__qualname__
+
+        @functools.wraps(method)
+        def choose_move(self: Any, game: Any) -> Any:
+            move_cache = cache or getattr(self, "move_cache", None) or SHARED_MOVE_CACHE
+            entry = move_cache.entry(game.board)
+            choices = entry.choices
+            if choices is None:
+                choices = entry.choices = {}
+            if policy in choices:
+                return choices[policy]
+            choice = choices[policy] = method(self, game)
+            return choice
+
+        return choose_move
+
+    if method is not None:
+        return decorate(method)
+    return decorate
+
+
+class MoveCacheMixin:
+    """Player mixin computing legal moves and their renderings through a move
+    cache, shared by default::
+
+        class MyPlayer(MoveCacheMixin, Player): ...
+    """
+
+    move_cache: MoveCache = SHARED_MOVE_CACHE
+
+    def legal_moves(self, game: Any) -> Tuple[chess.Move, ...]:
+        """
+        :return: The legal moves of the game's current position.
+        :rtype: Tuple[chess.Move, ...]
+        """
+        return self.move_cache.legal_moves(game.board)
+
+    def choose_random_move(self, game: Any) -> Any:
+        moves = self.move_cache.legal_moves(game.board)
+        if not moves:
+            return False
+        return random.choice(moves)
+
+    def _san(self, board: chess.Board, move: chess.Move) -> str:
+        return self.move_cache.entry(board).san(board, move)
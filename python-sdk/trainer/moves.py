@@ -0,0 +1,102 @@
+"""This module contains helpers for the move notations used by the game protocol,
+and the rules by which the server ends games.
+
+The server accepts, and echoes back in histories, moves in any notation chess.js
+accepts: SAN ('Nf3'), UCI ('g1f3') or a {from, to, promotion} object.
+"""
+
+import re
+from typing import Any, Dict, Optional
+
+import chess
+
+PROMOTIONS = {"q": chess.QUEEN, "r": chess.ROOK, "b": chess.BISHOP, "n": chess.KNIGHT}
+
+SQUARE_NAMES = chess.SQUARE_NAMES
+
+_UCI_RE = re.compile(r"[a-h][1-8][a-h][1-8][qrbn]?")
+
+
+def parse_move(board: chess.Board, move: Any) -> Optional[chess.Move]:
+    """Parses a move in SAN, UCI, or a {from, to, promotion} object.
+
+    :param board: The position the move is played in.
+    :type board: chess.Board
+    :param move: The move.
+    :type move: Any
+    :return: The move, or None if it is not a legal move in board.
+    :rtype: chess.Move, optional
+    """
+    try:
+        if isinstance(move, dict):
+            promotion = move.get("promotion")
+            parsed = chess.Move(
+                chess.parse_square(move["from"]),
+                chess.parse_square(move["to"]),
+                PROMOTIONS.get(promotion) if promotion else None,
+            )
+        elif _UCI_RE.fullmatch(move):
+            # cheaper than parse_san, which generates every legal move
+            parsed = chess.Move.from_uci(move)
+        else:
+            parsed = board.parse_san(move)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return parsed if board.is_legal(parsed) else None
+
+
+def move_to_dict(move: chess.Move) -> Dict[str, str]:
+    """
+    :param move: The move.
+    :type move: chess.Move
+    :return: The move as a chess.js {from, to, promotion} object.
+    :rtype: Dict[str, str]
+    """
+    if move.promotion:
+        return {
+            "from": SQUARE_NAMES[move.from_square],
+            "to": SQUARE_NAMES[move.to_square],
+            "promotion": chess.piece_symbol(move.promotion),
+        }
+    return {"from": SQUARE_NAMES[move.from_square], "to": SQUARE_NAMES[move.to_square]}
+
+
+def pack_move(move: chess.Move) -> int:
+    """Packs a move in 16 bits: from square, to square and promotion piece type.
+
+    :param move: The move.
+    :type move: chess.Move
+    :return: The packed move.
+    :rtype: int
+    """
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def unpack_move(packed: int) -> chess.Move:
+    """Unpacks a move packed by pack_move.
+
+    :param packed: The packed move.
+    :type packed: int
+    :return: The move.
+    :rtype: chess.Move
+    """
+    promotion = packed >> 12
+    return chess.Move(packed & 63, packed >> 6 & 63, promotion or None)
+
+
+def game_result(board: chess.Board) -> Optional[Dict[str, str]]:
+    """Returns the gameOver payload if the game is over, following chess.js:
+    checkmate, stalemate, insufficient material, the 50-move rule or a threefold
+    repetition."""
+    if not any(board.generate_legal_moves()):
+        if board.is_check():
+            return {"winner": "black" if board.turn == chess.WHITE else "white",
+                    "reason": "checkmate"}
+        return {"winner": "draw", "reason": "stalemate"}
+    if board.is_insufficient_material():
+        return {"winner": "draw", "reason": "insufficient material"}
+    if board.halfmove_clock >= 100:
+        return {"winner": "draw", "reason": "draw"}
+    if board.halfmove_clock >= 8 and board.is_repetition(3):
+        return {"winner": "draw", "reason": "threefold repetition"}
+    return None
@@ -0,0 +1,299 @@
+"""This module contains an NNUE-style evaluation, updated incrementally.
+
+The network has 768 piece-square input features per perspective (own and
+opponent pawns to kings, on squares flipped for black), a hidden layer of
+size hidden shared by both perspectives, and a linear output over the clipped
+hidden values of the side to move followed by those of the other side.
+
+The hidden layer, before clipping, is kept in per-perspective accumulators: a
+move only adds and removes the weight rows of the few features it changes,
+instead of summing the rows of every piece.
+
+Weights are stored quantized in a compact little-endian file, mapped into
+memory when loaded:
+
+- header: magic b'NNUE', version, hidden, clip, divisor and output bias,
+- feature weights: int16, (768, hidden),
+- feature biases: int16, (hidden,),
+- output weights: int16, (2 * hidden,).
+
+The score is (output weights . clipped hidden + output bias) // divisor
+centipawns, from the point of view of the side to move.
+"""
+
+import os
+import struct
+from typing import Any, List, Optional, Tuple, Union
+
+import chess
+import numpy as np
+
+from evaluation import SQUARE_VALUES
+
+MAGIC = b"NNUE"
+VERSION = 1
+HEADER = struct.Struct("<4sHHiii")
+N_FEATURES = 768
+
+
+def feature_index(perspective: bool, color: bool, piece_type: int, square: int) -> int:
+    """
+    :param perspective: The side whose features these are, True for white.
+    :type perspective: bool
+    :param color: The color of the piece.
+    :type color: bool
+    :param piece_type: The type of the piece.
+    :type piece_type: int
+    :param square: The square of the piece.
+    :type square: int
+    :return: The input feature of the piece for the perspective.
+    :rtype: int
+    """
+    if not perspective:
+        square ^= 56
+    return ((0 if color == perspective else 6) + piece_type - 1) * 64 + square
+
+
+def board_features(board: chess.Board, perspective: bool) -> List[int]:
+    """
+    :return: The active input features of a position for a perspective.
+    :rtype: List[int]
+    """
+    features = []
+    for color in chess.COLORS:
+        own = board.occupied_co[color]
+        for piece_type in chess.PIECE_TYPES:
+            pieces = board.pieces_mask(piece_type, color) & own
+            while pieces:
+                bit = pieces & -pieces
+                features.append(
+                    feature_index(perspective, color, piece_type, bit.bit_length() - 1)
+                )
+                pieces ^= bit
+    return features
+
+
+def write_weights(
+    path: Union[str, os.PathLike],
+    feature_weights: np.ndarray,
+    feature_bias: np.ndarray,
+    output_weights: np.ndarray,
+    output_bias: int = 0,
+    clip: int = 255,
+    divisor: int = 64,
+):
+    """Writes quantized weights in the format read by NNUEEvaluator.
+
+    :param feature_weights: Of shape (768, hidden).
+    :type feature_weights: np.ndarray
+    :param feature_bias: Of shape (hidden,).
+    :type feature_bias: np.ndarray
+    :param output_weights: Of shape (2 * hidden,), side to move first.
+    :type output_weights: np.ndarray
+    :param output_bias: Added before dividing.
+    :type output_bias: int
+    :param clip: Upper bound of the hidden values, the lower one being 0.
+    :type clip: int
+    :param divisor: Divides the output to give centipawns.
+    :type divisor: int
+    """
+    hidden = feature_bias.shape[0]
+    if feature_weights.shape != (N_FEATURES, hidden) or output_weights.shape != (
+        2 * hidden,
+    ):
+        raise ValueError("Inconsistent weight shapes")
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, hidden, clip, divisor, output_bias))
+        for weights in (feature_weights, feature_bias, output_weights):
+            file.write(np.ascontiguousarray(weights, dtype="<i2").tobytes())
+
+
+def random_weights(path: Union[str, os.PathLike], hidden: int = 256, seed: int = 0):
+    """Writes random weights, eg. for benchmarks or as a training start."""
+    rng = np.random.default_rng(seed)
+    write_weights(
+        path,
+        rng.integers(-64, 64, (N_FEATURES, hidden)),
+        rng.integers(0, 128, hidden),
+        rng.integers(-32, 32, 2 * hidden),
+    )
+
+
+def piece_square_weights(path: Union[str, os.PathLike]):
+    """Writes a network with one hidden unit per perspective summing the
+    material and piece-square values of its own pieces, so that it scores
+    positions like evaluation.evaluate, with the middlegame king table."""
+    bias = 1 << 14
+    feature_weights = np.zeros((N_FEATURES, 1), np.int64)
+    for piece_type in chess.PIECE_TYPES:
+        white_values, _ = SQUARE_VALUES[piece_type - 1]
+        for square in chess.SQUARES:
+            value = white_values[square]
+            if piece_type == chess.KING:
+                # both sides always have a king
+                value -= 20000
+            feature_weights[feature_index(True, True, piece_type, square), 0] = value
+    write_weights(
+        path,
+        feature_weights,
+        np.array([bias]),
+        np.array([1, -1]),
+        clip=(1 << 15) - 1,
+        divisor=1,
+    )
+
+
+class NNUEEvaluator:
+    """Evaluator keeping the accumulators of a board through push and pop.
+
+    Searches call reset with their root board, push before pushing a move on
+    it, and pop after popping it. Called with that board, the evaluator scores
+    the accumulators on top of the stack; called with any other board, it
+    evaluates it from scratch. Evaluators are pickled as their path, eg. to be
+    sent to search processes, which map the weights again.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], max_ply: int = 256):
+        """
+        :param path: The weights file.
+        :type path: str or os.PathLike
+        :param max_ply: Initial depth of the accumulator stack, which grows as
+            needed.
+        :type max_ply: int
+        """
+        self._path = path
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, version, hidden, clip, divisor, output_bias = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an NNUE weights file of version {VERSION}")
+        offset = HEADER.size
+        self._feature_weights = np.frombuffer(
+            data, "<i2", N_FEATURES * hidden, offset
+        ).reshape(N_FEATURES, hidden)
+        offset += 2 * N_FEATURES * hidden
+        self._feature_bias = np.frombuffer(data, "<i2", hidden, offset)
+        offset += 2 * hidden
+        output_weights = np.frombuffer(data, "<i2", 2 * hidden, offset).astype(np.int32)
+        # by side to move, the weights of the (black, white) accumulators
+        self._output_weights = (
+            np.concatenate([output_weights[:hidden], output_weights[hidden:]]),
+            np.concatenate([output_weights[hidden:], output_weights[:hidden]]),
+        )
+        self._hidden = hidden
+        self._clip = clip
+        self._divisor = divisor
+        self._output_bias = output_bias
+
+        # accumulators by ply, of the black then white perspectives
+        self._stack = np.zeros((max_ply, 2, hidden), np.int32)
+        self._clipped = np.zeros(2 * hidden, np.int32)
+        self._ply: int = 0
+        self._board: Optional[chess.Board] = None
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (NNUEEvaluator, (self._path, len(self._stack)))
+
+    def _refresh(self, board: chess.Board, accumulators: np.ndarray):
+        weights = self._feature_weights
+        for perspective in chess.COLORS:
+            row = accumulators[int(perspective)]
+            np.sum(weights[board_features(board, perspective)], axis=0, out=row)
+            row += self._feature_bias
+
+    def _score(self, accumulators: np.ndarray, turn: bool) -> int:
+        clipped = self._clipped
+        # cheaper than np.clip on small arrays
+        np.maximum(accumulators.reshape(-1), 0, out=clipped)
+        np.minimum(clipped, self._clip, out=clipped)
+        return (
+            int(np.dot(clipped, self._output_weights[turn])) + self._output_bias
+        ) // self._divisor
+
+    def reset(self, board: chess.Board):
+        """Tracks board from its current position."""
+        self._board = board
+        self._ply = 0
+        self._refresh(board, self._stack[0])
+
+    def push(self, board: chess.Board, move: chess.Move):
+        """Updates the accumulators for a move, before it is pushed on board.
+
+        :param board: The tracked board.
+        :type board: chess.Board
+        :param move: A legal move.
+        :type move: chess.Move
+        """
+        ply = self._ply + 1
+        if ply == len(self._stack):
+            self._stack = np.concatenate([self._stack, np.zeros_like(self._stack)])
+        accumulators = self._stack[ply]
+        np.copyto(accumulators, self._stack[ply - 1])
+        weights = self._feature_weights
+        white, black = accumulators[1], accumulators[0]
+
+        turn = board.turn
+        from_square = move.from_square
+        to_square = move.to_square
+        piece_type = board.piece_type_at(from_square)
+        changes = [
+            (turn, piece_type, from_square, -1),
+            (turn, move.promotion or piece_type, to_square, 1),
+        ]
+        if board.occupied_co[not turn] & chess.BB_SQUARES[to_square]:
+            changes.append((not turn, board.piece_type_at(to_square), to_square, -1))
+        elif piece_type == chess.PAWN and to_square == board.ep_square:
+            captured = to_square - 8 if turn else to_square + 8
+            changes.append((not turn, chess.PAWN, captured, -1))
+        elif piece_type == chess.KING and abs(to_square - from_square) == 2:
+            rank = from_square & 56
+            rook_from, rook_to = (
+                (rank | 7, rank | 5) if to_square > from_square else (rank, rank | 3)
+            )
+            changes.append((turn, chess.ROOK, rook_from, -1))
+            changes.append((turn, chess.ROOK, rook_to, 1))
+
+        for color, changed_type, square, sign in changes:
+            white_row = weights[((0 if color else 6) + changed_type - 1) * 64 + square]
+            black_row = weights[
+                ((6 if color else 0) + changed_type - 1) * 64 + (square ^ 56)
+            ]
+            if sign > 0:
+                white += white_row
+                black += black_row
+            else:
+                white -= white_row
+                black -= black_row
+        self._ply = ply
+
+    def pop(self):
+        """Reverts the last push, after the move is popped from the board."""
+        self._ply -= 1
+
+    def evaluate_board(self, board: chess.Board) -> int:
+        """Evaluates a position from scratch.
+
+        :return: The score in centipawns, from the point of view of the side to
+            move.
+        :rtype: int
+        """
+        accumulators = np.empty((2, self._hidden), np.int32)
+        self._refresh(board, accumulators)
+        return self._score(accumulators, board.turn)
+
+    def __call__(self, board: chess.Board) -> int:
+        """
+        :return: The score of board, from the accumulators if it is the tracked
+            board.
+        :rtype: int
+        """
+        if board is not self._board:
+            return self.evaluate_board(board)
+        return self._score(self._stack[self._ply], board.turn)
+
+    @property
+    def path(self) -> Union[str, os.PathLike]:
+        return self._path
+
+    @property
+    def hidden(self) -> int:
+        return self._hidden
@@ -0,0 +1,125 @@
+"""This module contains the compact per-game history of observations.
+"""
+
+from array import array
+from typing import Any, Dict, Optional
+
+FIELDS = (
+    ("moves", "H"),
+    ("turns", "B"),
+    ("halfmove_clocks", "H"),
+    ("times", "f"),
+    ("values", "f"),
+)
+
+NAN = float("nan")
+
+
+class ObservationHistory:
+    """Trajectory of a game, one entry per ply, stored column-wise in arrays.
+
+    Each ply records the move, packed by moves.pack_move, the side to move (1 for
+    white), the halfmove clock before the move, the seconds elapsed since the
+    game started, and an optional value, eg. the policy's evaluation of its own
+    moves (NaN when absent).
+
+    Columns are preallocated and grow by doubling, so appending is O(1) amortised
+    and never allocates an object per ply. Growing replaces the arrays instead of
+    resizing them, so arrays exported with as_numpy stay valid, as snapshots.
+    """
+
+    __slots__ = ("_columns", "_length", "_next_value", "root_fen")
+
+    def __init__(self, capacity: int = 64, root_fen: Optional[str] = None):
+        """
+        :param capacity: Number of plies preallocated.
+        :type capacity: int
+        :param root_fen: The FEN the moves are played from, if not the starting
+            position.
+        :type root_fen: str, optional
+        """
+        capacity = max(capacity, 1)
+        self._columns = [
+            array(code, bytes(array(code).itemsize * capacity)) for _, code in FIELDS
+        ]
+        self._length: int = 0
+        self._next_value: float = NAN
+        self.root_fen = root_fen
+
+    def append(self, move: int, turn: bool, halfmove_clock: int, time: float):
+        """Records a ply.
+
+        :param move: The packed move.
+        :type move: int
+        :param turn: The side to move, True for white.
+        :type turn: bool
+        :param halfmove_clock: The halfmove clock before the move.
+        :type halfmove_clock: int
+        :param time: Seconds elapsed since the game started.
+        :type time: float
+        """
+        columns = self._columns
+        i = self._length
+        if i == len(columns[0]):
+            self._grow()
+            columns = self._columns
+        columns[0][i] = move
+        columns[1][i] = turn
+        columns[2][i] = min(halfmove_clock, 0xFFFF)
+        columns[3][i] = time
+        columns[4][i] = self._next_value
+        self._next_value = NAN
+        self._length = i + 1
+
+    def _grow(self):
+        self._columns = [column + column for column in self._columns]
+
+    def annotate_next(self, value: float):
+        """Sets the value recorded with the next ply, eg. by a policy choosing a
+        move, which is recorded once the server echoes it back."""
+        self._next_value = value
+
+    def clear(self, root_fen: Optional[str] = None):
+        self._length = 0
+        self._next_value = NAN
+        self.root_fen = root_fen
+
+    def column(self, name: str) -> memoryview:
+        """
+        :param name: The column name, eg. 'moves'.
+        :type name: str
+        :return: A view of the recorded entries of the column.
+        :rtype: memoryview
+        """
+        for (field, _), column in zip(FIELDS, self._columns):
+            if field == name:
+                return memoryview(column)[: self._length]
+        raise KeyError(name)
+
+    def as_numpy(self) -> Dict[str, Any]:
+        """Exports the trajectory without copying it.
+
+        :return: A NumPy array per column, viewing this history's storage.
+        :rtype: Dict[str, numpy.ndarray]
+        """
+        import numpy as np
+
+        return {
+            field: np.frombuffer(column, dtype=np.dtype(code), count=self._length)
+            for (field, code), column in zip(FIELDS, self._columns)
+        }
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def next_value(self) -> float:
+        """
+        :return: The value set by annotate_next for the next ply, NaN if none.
+        :rtype: float
+        """
+        return self._next_value
+
+    @property
+    def capacity(self) -> int:
+        return len(self._columns[0])
@@ -0,0 +1,197 @@
+"""This module contains the outbound frame queue of the client.
+"""
+
+import asyncio
+from asyncio import Event
+from collections import deque
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from stats import RunningStats
+
+
+class OutboundQueue:
+    """Bounded queue of outbound frames drained by a single writer task.
+
+    Producers never touch the transport: they enqueue frames, or whatever the
+    transport encodes events to, and the writer sends every frame that became
+    ready during the same event-loop tick in one pass. Priority frames (eg. pongs) skip the bound and are sent before
+    regular frames. Frames enqueued with a key replace a still pending frame
+    with the same key instead of being sent twice.
+    """
+
+    def __init__(self, maxsize: int = 1024, max_batch: int = 64):
+        """
+        :param maxsize: Maximum number of pending regular frames. Producers wait
+            when it is reached.
+        :type maxsize: int
+        :param max_batch: Maximum number of frames sent per writer pass.
+        :type max_batch: int
+        """
+        self._maxsize = maxsize
+        self._max_batch = max_batch
+
+        # entries are [frame, enqueue time, key]
+        self._frames: Deque[List[Any]] = deque()
+        self._priority_frames: Deque[List[Any]] = deque()
+        self._keyed: Dict[Hashable, List[Any]] = {}
+
+        self._not_empty: Event = Event()
+        self._not_full: Event = Event()
+        self._not_full.set()
+
+        self._flush_latency = RunningStats()
+        self._batch_size = RunningStats()
+        self._frames_sent: int = 0
+        self._coalesced: int = 0
+
+    def _coalesce(self, frame: Any, key: Optional[Hashable]) -> bool:
+        if key is None:
+            return False
+        entry = self._keyed.get(key)
+        if entry is None:
+            return False
+        entry[0] = frame
+        self._coalesced += 1
+        return True
+
+    def _append(self, frame: Any, priority: bool, key: Optional[Hashable]):
+        entry = [frame, perf_counter(), key]
+        if key is not None:
+            self._keyed[key] = entry
+        if priority:
+            self._priority_frames.append(entry)
+        else:
+            self._frames.append(entry)
+            if len(self._frames) >= self._maxsize:
+                self._not_full.clear()
+        self._not_empty.set()
+
+    async def put(
+        self, frame: Any, *, priority: bool = False, key: Optional[Hashable] = None
+    ):
+        """Enqueues a frame, waiting for room if the queue is full.
+
+        :param frame: The frame to send.
+        :type frame: Any
+        :param priority: Whether the frame is sent ahead of regular frames.
+        :type priority: bool
+        :param key: Optional coalescing key.
+        :type key: Hashable, optional
+        """
+        if self._coalesce(frame, key):
+            return
+        if not priority:
+            while len(self._frames) >= self._maxsize:
+                await self._not_full.wait()
+            if self._coalesce(frame, key):
+                return
+        self._append(frame, priority, key)
+
+    def put_nowait(
+        self, frame: Any, *, priority: bool = False, key: Optional[Hashable] = None
+    ):
+        """Enqueues a frame without waiting.
+
+        :raises asyncio.QueueFull: If the queue is full.
+        """
+        if self._coalesce(frame, key):
+            return
+        if not priority and len(self._frames) >= self._maxsize:
+            raise asyncio.QueueFull
+        self._append(frame, priority, key)
+
+    def _take_batch(self) -> List[List[Any]]:
+        batch: List[List[Any]] = []
+        while self._priority_frames:
+            batch.append(self._priority_frames.popleft())
+        while self._frames and len(batch) < self._max_batch:
+            batch.append(self._frames.popleft())
+        for entry in batch:
+            if entry[2] is not None:
+                del self._keyed[entry[2]]
+
+        if len(self._frames) < self._maxsize:
+            self._not_full.set()
+        if not self._frames and not self._priority_frames:
+            self._not_empty.clear()
+        return batch
+
+    async def run(self, send: Callable[[Any], Awaitable[Any]]):
+        """Writer loop. Must run as the only consumer of the queue.
+
+        :param send: Coroutine function writing one frame to the transport.
+        :type send: Callable[[Any], Awaitable[Any]]
+        """
+        while True:
+            await self._not_empty.wait()
+            # let every producer scheduled in this tick enqueue first
+            await asyncio.sleep(0)
+
+            batch = self._take_batch()
+            if not batch:
+                continue
+            for i, entry in enumerate(batch):
+                try:
+                    await send(entry[0])
+                except BaseException:
+                    # keep unsent frames for the next writer
+                    self._requeue(batch[i:])
+                    raise
+                self._flush_latency.add(perf_counter() - entry[1])
+            self._frames_sent += len(batch)
+            self._batch_size.add(len(batch))
+
+    def _requeue(self, entries: List[List[Any]]):
+        for entry in reversed(entries):
+            if entry[2] is not None:
+                if entry[2] in self._keyed:
+                    continue
+                self._keyed[entry[2]] = entry
+            self._frames.appendleft(entry)
+        if self._frames:
+            self._not_empty.set()
+
+    def clear(self):
+        """Drops every pending frame."""
+        self._frames.clear()
+        self._priority_frames.clear()
+        self._keyed.clear()
+        self._not_empty.clear()
+        self._not_full.set()
+
+    @property
+    def depth(self) -> int:
+        """
+        :return: The number of pending frames.
+        :rtype: int
+        """
+        return len(self._frames) + len(self._priority_frames)
+
+    @property
+    def flush_latency(self) -> RunningStats:
+        """
+        :return: Time between enqueueing and sending frames, in seconds.
+        :rtype: RunningStats
+        """
+        return self._flush_latency
+
+    @property
+    def batch_size(self) -> RunningStats:
+        """
+        :return: Number of frames sent per writer pass.
+        :rtype: RunningStats
+        """
+        return self._batch_size
+
+    @property
+    def frames_sent(self) -> int:
+        return self._frames_sent
+
+    @property
+    def coalesced(self) -> int:
+        """
+        :return: The number of frames replaced by a newer frame with the same key.
+        :rtype: int
+        """
+        return self._coalesced
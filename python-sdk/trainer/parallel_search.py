@@ -0,0 +1,195 @@
+"""This module contains a Lazy SMP parallel search over worker processes.
+
+Every worker process searches the same root position with its own Searcher,
+sharing one transposition table in multiprocessing.shared_memory. Workers
+only communicate through the table: entries stored by one worker cut the
+searches of the others. Odd workers search one ply deeper than even ones at
+every iteration, so that they fill the table ahead of them.
+
+The table is lock-free: TranspositionTable verifies each entry against its key
+word, so entries torn by concurrent writers are ignored. Positions are keyed by
+their Zobrist hash, which is the same in every worker, and workers are always
+spawned, whatever the default start method of the platform.
+"""
+
+import atexit
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+from time import perf_counter
+from typing import Any, Callable, List, Optional
+
+import chess
+
+from evaluation import evaluate
+from search import Searcher, SearchLimits, SearchResult
+from transposition import TranspositionTable
+
+
+def _worker(
+    index: int,
+    table_name: str,
+    table_entries: int,
+    evaluate: Callable[[chess.Board], int],
+    connection: Any,
+    stop: Any,
+):
+    memory = shared_memory.SharedMemory(name=table_name)
+    table = TranspositionTable(table_entries, memory.buf)
+    searcher = Searcher(evaluate, table, stop=stop.is_set)
+    try:
+        while True:
+            task = connection.recv()
+            if task is None:
+                break
+            root_fen, moves, limits = task
+            board = chess.Board(root_fen)
+            for move in moves:
+                board.push(move)
+            result = searcher.search(board, limits, start_depth=1 + index % 2)
+            if index == 0:
+                # the main worker decides when the search is over
+                stop.set()
+            connection.send(result)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del table, searcher
+        memory.close()
+
+
+class ParallelSearcher:
+    """Lazy SMP searcher, with the interface of Searcher.
+
+    Worker processes are started once and kept for every search. The result
+    of the deepest completed search is played, the main worker's among equally
+    deep ones; nodes are summed over workers. Call close, or use the searcher
+    as a context manager, to stop the workers and free the shared table, which
+    is otherwise done at exit.
+    """
+
+    def __init__(
+        self,
+        n_workers: Optional[int] = None,
+        table_entries: int = 1 << 20,
+        evaluate: Callable[[chess.Board], int] = evaluate,
+    ):
+        """
+        :param n_workers: Number of worker processes, by default the number of
+            CPUs.
+        :type n_workers: int, optional
+        :param table_entries: Number of entries of the shared transposition
+            table, 16 bytes each.
+        :type table_entries: int
+        :param evaluate: Static evaluation of the workers, which has to be
+            picklable.
+        :type evaluate: Callable[[chess.Board], int]
+        """
+        n_workers = n_workers or os.cpu_count() or 1
+        table_entries = 1 << max(table_entries, 1).bit_length() - 1
+        self._memory = shared_memory.SharedMemory(create=True, size=16 * table_entries)
+        self._table = TranspositionTable(table_entries, self._memory.buf)
+
+        # spawn, not the platform default: forking a process running the
+        # client's event loop thread can deadlock, and the table key must not
+        # depend on state inherited from the parent
+        context = multiprocessing.get_context("spawn")
+        self._stop = context.Event()
+        self._connections = []
+        self._processes = []
+        for index in range(n_workers):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(
+                    index,
+                    self._memory.name,
+                    table_entries,
+                    evaluate,
+                    worker_connection,
+                    self._stop,
+                ),
+                daemon=True,
+            )
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+        self._last_results: List[SearchResult] = []
+        atexit.register(self.close)
+
+    def search(self, board: chess.Board, limits: SearchLimits) -> SearchResult:
+        """Searches a position with every worker.
+
+        :param board: The position, its move stack included for repetitions.
+        :type board: chess.Board
+        :param limits: The budget of the search. A node budget is split between
+            workers.
+        :type limits: SearchLimits
+        :return: The result of the deepest worker search.
+        :rtype: SearchResult
+        """
+        if not self._processes:
+            raise RuntimeError("The parallel searcher is closed")
+        start = perf_counter()
+        if limits.nodes is not None:
+            limits = limits._replace(
+                nodes=max(limits.nodes // len(self._processes), 1)
+            )
+        self._stop.clear()
+        task = (board.root().fen(), board.move_stack, limits)
+        for connection in self._connections:
+            connection.send(task)
+        results = [connection.recv() for connection in self._connections]
+        self._last_results = results
+
+        # max keeps the first of equally deep results, the main worker's
+        best = max(results, key=lambda result: result.depth)
+        return best._replace(
+            nodes=sum(result.nodes for result in results),
+            time=perf_counter() - start,
+        )
+
+    def close(self):
+        atexit.unregister(self.close)
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+        self._processes = []
+        if self._memory is not None:
+            del self._table
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+    def __enter__(self) -> "ParallelSearcher":
+        return self
+
+    def __exit__(self, *args: Any):
+        self.close()
+
+    @property
+    def n_workers(self) -> int:
+        return len(self._processes)
+
+    @property
+    def table(self) -> TranspositionTable:
+        return self._table
+
+    @property
+    def last_results(self) -> List[SearchResult]:
+        """
+        :return: The result of each worker in the last search, main worker
+            first.
+        :rtype: List[SearchResult]
+        """
+        return self._last_results
@@ -0,0 +1,220 @@
+"""This module defines typed payloads for the inbound events the player acts on.
+
+Payloads are slotted objects built once from the decoded JSON, so handlers read
+attributes instead of probing dict keys.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class Payload(ABC):
+    """Base class of typed payloads."""
+
+    __slots__ = ()
+
+    @classmethod
+    @abstractmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Payload":
+        """Builds the payload from the decoded JSON of its event."""
+        pass
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}" for name in self.__slots__
+        )
+        return f"{type(self).__name__}({fields})"
+
+
+class GameState(Payload):
+    """Payload of the gameState event.
+
+    The room identifier is sent as 'roomId', 'room' or 'id' depending on the
+    server handler that emitted the state."""
+
+    __slots__ = (
+        "room_id",
+        "fen",
+        "history",
+        "status",
+        "white",
+        "black",
+        "last_move",
+    )
+
+    def __init__(
+        self,
+        room_id: Optional[str],
+        fen: Optional[str],
+        history: List[Any],
+        status: Optional[str],
+        white: Optional[str] = None,
+        black: Optional[str] = None,
+        last_move: Any = None,
+    ):
+        self.room_id = room_id
+        self.fen = fen
+        self.history = history
+        self.status = status
+        self.white = white
+        self.black = black
+        self.last_move = last_move
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GameState":
+        get = data.get
+        return cls(
+            get("roomId") or get("room") or get("id"),
+            get("fen") or get("gameFen"),
+            get("history") or get("moveHistory") or [],
+            get("status") or get("gameStatus"),
+            get("white"),
+            get("black"),
+            get("lastMove"),
+        )
+
+    @property
+    def ply(self) -> int:
+        """
+        :return: The number of half-moves played.
+        :rtype: int
+        """
+        return len(self.history)
+
+
+class GameStart(Payload):
+    """Payload of the gameStart event, i.e. the room with the players' names."""
+
+    __slots__ = (
+        "room_id",
+        "name",
+        "players",
+        "fen",
+        "history",
+        "status",
+        "white",
+        "black",
+    )
+
+    def __init__(
+        self,
+        room_id: Optional[str],
+        name: Optional[str],
+        players: List[Dict[str, Any]],
+        fen: Optional[str],
+        history: List[Any],
+        status: Optional[str],
+        white: Optional[str],
+        black: Optional[str],
+    ):
+        self.room_id = room_id
+        self.name = name
+        self.players = players
+        self.fen = fen
+        self.history = history
+        self.status = status
+        self.white = white
+        self.black = black
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GameStart":
+        get = data.get
+        return cls(
+            get("id") or get("roomId"),
+            get("name"),
+            get("players") or [],
+            get("gameFen") or get("fen"),
+            get("moveHistory") or get("history") or [],
+            get("gameStatus") or get("status"),
+            get("white"),
+            get("black"),
+        )
+
+
+class Invitation(Payload):
+    """Payload of the invitation event."""
+
+    __slots__ = ("inviter", "room_id")
+
+    def __init__(self, inviter: Optional[str], room_id: Optional[str]):
+        self.inviter = inviter
+        self.room_id = room_id
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Invitation":
+        return cls(data.get("from"), data.get("roomId"))
+
+
+class Room(Payload):
+    """A room of the roomListUpdate event."""
+
+    __slots__ = ("room_id", "name", "players", "game_started", "fen", "status")
+
+    def __init__(
+        self,
+        room_id: Optional[str],
+        name: Optional[str],
+        players: List[Dict[str, Any]],
+        game_started: bool,
+        fen: Optional[str],
+        status: Optional[str],
+    ):
+        self.room_id = room_id
+        self.name = name
+        self.players = players
+        self.game_started = game_started
+        self.fen = fen
+        self.status = status
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Room":
+        get = data.get
+        return cls(
+            get("id"),
+            get("name"),
+            get("players") or [],
+            bool(get("gameStarted")),
+            get("gameFen"),
+            get("gameStatus"),
+        )
+
+
+class RoomList(Payload):
+    """Payload of the roomListUpdate event."""
+
+    __slots__ = ("rooms",)
+
+    def __init__(self, rooms: Tuple[Room, ...]):
+        self.rooms = rooms
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "RoomList":
+        # the event carries a bare list of rooms
+        return cls(tuple(Room.from_dict(room) for room in data or ()))
+
+    def __len__(self) -> int:
+        return len(self.rooms)
+
+
+PAYLOAD_TYPES: Dict[str, Callable[[Any], Payload]] = {
+    "gameState": GameState.from_dict,
+    "gameStart": GameStart.from_dict,
+    "invitation": Invitation.from_dict,
+    "roomListUpdate": RoomList.from_dict,
+}
+
+
+def build_payload(event: str, data: Any) -> Any:
+    """Converts the decoded payload of event to its typed payload, if it has one.
+
+    :param event: The event name.
+    :type event: str
+    :param data: The decoded JSON payload.
+    :type data: Any
+    :return: The typed payload, or data unchanged for untyped events.
+    :rtype: Any
+    """
+    factory = PAYLOAD_TYPES.get(event)
+    if factory is None or data is None:
+        return data
+    return factory(data)
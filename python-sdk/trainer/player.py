@@ -2,22 +2,87 @@
 """
 
 import asyncio
+import importlib
+import multiprocessing
 import random
 from abc import ABC, abstractmethod
-from asyncio import Condition, Event, Queue, Semaphore
+from asyncio import Condition, Event, Queue, Semaphore, create_task, gather
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from inspect import isawaitable
 from logging import Logger
+from math import isnan
 from time import perf_counter
-from typing import Any, Awaitable, Dict, List, Optional, Union
+from typing import Any, Awaitable, Dict, List, Optional, Set, Tuple, Union
 
 from chess_client import ChessClient
-from account_configuration import AccountConfiguration, CONFIGURATION_FROM_PLAYER_COUNTER
+from account_configuration import AccountConfiguration, create_account_configuration
 from server_configuration import (
     LocalhostServerConfiguration, ServerConfiguration)
 from concurrency import create_in_chess_loop, handle_threaded_coroutines
 from environment import AbstractGame, Game
+from move_batching import MoveBatcher
+from moves import game_result, move_to_dict
+from observation import ObservationHistory
+from opening_book import OpeningBook
+from payloads import GameStart, GameState
+from transport import Transport
 
 import chess
 
+MOVE_FORMATS = ("uci", "object", "san")
+MOVE_EXECUTORS = ("thread", "process")
+
+# the player choose_move is called on in process pool workers, rebuilt by each
+# spawned worker from its class and the player's move_worker_kwargs
+_worker_player: Optional["Player"] = None
+
+
+def load_player_class(path: str) -> type:
+    """
+    :param path: The player class, as 'module:Class'.
+    :type path: str
+    :return: The class.
+    :rtype: type
+    """
+    module_name, _, class_name = path.partition(":")
+    if not class_name:
+        raise ValueError(f"Player class {path} is not of the form module:Class")
+    player_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(player_class, type) and issubclass(player_class, Player)):
+        raise ValueError(f"{path} is not a Player class")
+    return player_class
+
+
+def _init_move_worker(
+    player_class: str, username: str, log_level: int, kwargs: Dict[str, Any]
+):
+    global _worker_player
+    _worker_player = load_player_class(player_class)(
+        AccountConfiguration(username, None),
+        log_level=log_level,
+        start_listening=False,
+        **kwargs,
+    )
+
+
+def _choose_moves_in_worker(
+    positions: List[Tuple[str, str, Optional[str], bytes]], batched: bool
+) -> List[Tuple[Any, float]]:
+    player = _worker_player
+    games = []
+    for game_tag, player_color, root_fen, moves in positions:
+        game = Game(game_tag, player.username, player.logger, record_observations=True)
+        game.player_color = player_color
+        game.load_compact_position(root_fen, moves)
+        games.append(game)
+    if batched:
+        moves = player.choose_moves(games)
+    else:
+        moves = [player.choose_move(games[0])]
+    moves = [asyncio.run(move) if isawaitable(move) else move for move in moves]
+    return [(move, game.observations.next_value) for move, game in zip(moves, games)]
+
+
 class Player(ABC):
     """Base class for players.
     """
@@ -32,7 +97,16 @@ class Player(ABC):
         start_listening: bool = True,
         ping_interval: Optional[float] = 20.0,
         ping_timeout: Optional[float] = 20.0,
-        autostart: bool = True
+        autostart: bool = True,
+        transport: Optional[Transport] = None,
+        record_observations: bool = True,
+        move_format: str = "uci",
+        opening_book: Optional[OpeningBook] = None,
+        move_executor: Optional[str] = None,
+        move_workers: Optional[int] = None,
+        move_worker_kwargs: Optional[Dict[str, Any]] = None,
+        move_batch_size: Optional[int] = None,
+        move_batch_wait: float = 0.005
         ):
         if account_configuration is None:
             account_configuration = self._create_account_configuration()
@@ -47,7 +121,8 @@ class Player(ABC):
             start_listening=start_listening,
             ping_interval=ping_interval,
             ping_timeout=ping_timeout,
-            autostart=autostart
+            autostart=autostart,
+            transport=transport
         )
 
         self.chess_client._handle_ingame_message = self._handle_ingame_message
@@ -55,10 +130,47 @@ class Player(ABC):
         self.chess_client._handle_game_start = self._handle_game_start
         self.chess_client._handle_accepted_invite = self._handle_accepted_invite
         self.chess_client._handle_playerJoined = self._handle_playerJoined
+        self.chess_client._handle_session_resumed = self._handle_session_resumed
+        self.chess_client._handle_game_over = self._handle_game_over
 
         self.autostart = autostart
 
         self._max_concurrent_games: int = max_concurrent_games
+        self._record_observations: bool = record_observations
+        if move_format not in MOVE_FORMATS:
+            raise ValueError(
+                f"Unknown move format {move_format}, expected one of {MOVE_FORMATS}"
+            )
+        # uci ('e7e8q') and object ({from, to, promotion}) moves, which chess.js
+        # both accept, do not require rendering SAN, one of the costliest
+        # python-chess operations. Servers echo the whole history with every
+        # state, and uci strings are the most compact
+        self._move_format: str = move_format
+        if move_executor is not None and move_executor not in MOVE_EXECUTORS:
+            raise ValueError(
+                f"Unknown move executor {move_executor}, expected one of "
+                f"{MOVE_EXECUTORS}"
+            )
+        if move_executor == "process" and "<locals>" in type(self).__qualname__:
+            raise ValueError(
+                "Process move executors rebuild the player from its class, "
+                f"{type(self).__qualname__} has to be defined at module level"
+            )
+        # synchronous choose_move calls are run off the chess loop in a pool of
+        # move_workers threads or processes, created on the first move. Processes
+        # are spawned, and rebuild the player with move_worker_kwargs
+        self._move_executor_kind: Optional[str] = move_executor
+        self._move_workers: int = move_workers or max_concurrent_games
+        self._move_worker_kwargs: Dict[str, Any] = move_worker_kwargs or {}
+        self._move_executor: Optional[Executor] = None
+        # with a batch size, the move requests of every game are gathered and
+        # chosen together by choose_moves
+        self._move_batcher: Optional[MoveBatcher] = (
+            MoveBatcher(self._choose_batch, move_batch_size, move_batch_wait)
+            if move_batch_size
+            else None
+        )
+        self._opening_book: Optional[OpeningBook] = opening_book
         self._start_timer_on_game_start: bool = start_timer_on_game_start
 
         self._games: Dict[str, AbstractGame] = {}
@@ -71,26 +183,25 @@ class Player(ABC):
         self._game_end_condition: Condition = create_in_chess_loop(Condition)
         self._invite_queue: Queue[Any] = create_in_chess_loop(Queue)
 
+        self._recovering_games: Set[str] = set()
+        # games whose state was requested after a gameOver without a roomId
+        self._game_over_checks: Set[str] = set()
+        self._games_recovered: int = 0
+        self._games_finished: int = 0
+        self._moves_played: int = 0
+
         self.logger.debug("Player initialisation finished")
 
     def _create_account_configuration(self) -> AccountConfiguration:
-        key = type(self).__name__
-        CONFIGURATION_FROM_PLAYER_COUNTER.update([key])
-        username = "%s %d" % (key, CONFIGURATION_FROM_PLAYER_COUNTER[key])
-        if len(username) > 18:
-            username = "%s %d" % (
-                key[: 18 - len(username)],
-                CONFIGURATION_FROM_PLAYER_COUNTER[key],
-            )
-        return AccountConfiguration(username, None)
+        return create_account_configuration(type(self).__name__)
 
 
     def _game_finished_callback(self, game: AbstractGame):
         pass
 
-    async def _create_game(self, message: Dict[str, Any])-> AbstractGame:
+    async def _create_game(self, message: GameStart)-> AbstractGame:
 
-        game_tag = message.get("id")
+        game_tag = message.room_id
         self.logger.info(f"create new game of tag: {game_tag}")
         if game_tag in self._games:
                 return self._games[game_tag]
@@ -98,23 +209,22 @@ class Player(ABC):
             game = Game(
                 game_tag=game_tag,
                 username=self.username,
-                logger=self.logger
+                logger=self.logger,
+                record_observations=self._record_observations
             )
 
             # set player color
-            if (message.get("black") == game.player_username):
+            if (message.black == game.player_username):
                 game.player_color = "b"
-            elif (message.get("white") == game.player_username):
+            elif (message.white == game.player_username):
                 game.player_color = "w"
             
             # (if color tags cannot be found, player is given white by default)
 
             game._game_status = "playing"
-            game.game_fen = message.get("gameFen")
-            board = chess.Board(game.game_fen)
-            game.to_play = "b" if board.turn == chess.BLACK else "w"
+            game.update_position(message.fen, message.history)
 
-            game.player_color = "b" if message.get("black") == self.username else "w"
+            game.player_color = "b" if message.black == self.username else "w"
 
             await self._game_count_queue.put(None)
             if game_tag in self._games:
@@ -149,12 +259,27 @@ class Player(ABC):
     
     async def start_game(self, game_tag:str):
         self.logger.info(f"Auto Starting Game: {game_tag}")
-        await self.chess_client.send_message(f'42["startGame", "{game_tag}"]')
+        await self.chess_client.emit("startGame", game_tag)
+
+    async def _handle_session_resumed(self):
+        """Requests the state of every unfinished game after a reconnection.
 
-    async def _handle_game_start(self, message: Dict[str, Any]):
+        Games are kept as they are; the state received in reply is applied to them
+        like any other state update.
+        """
+        for game_tag, game in list(self._games.items()):
+            if game._finished:
+                continue
+            self._recovering_games.add(game_tag)
+            # the new socket has to join the room again to receive its broadcasts
+            await self.chess_client.emit("joinRoom", {"roomId": game_tag})
+            await self.chess_client.emit("getGameState", game_tag)
+        self.logger.info("Recovering %d games", len(self._recovering_games))
+
+    async def _handle_game_start(self, message: GameStart):
         self.logger.info("===== ===== HANDLING GAME START ===== =====")
         self.logger.info(message)
-        game_tag = message.get("id")
+        game_tag = message.room_id
         game = await self._create_game(message)
 
         if self.games[game_tag] :
@@ -162,27 +287,85 @@ class Player(ABC):
 
         return game
 
-    async def _handle_ingame_message(self, message):
+    async def _handle_game_over(self, game_tag: Optional[str], payload: Dict[str, Any]):
+        """Finishes a game, on servers sending the roomId with gameOver. Others,
+        as web2server, do not tell which game ended: the state of every
+        unfinished game is then requested, and games are finished when their
+        state shows it, by _handle_ingame_message, eg. after a resignation."""
+        if game_tag is None:
+            await self._check_games_over()
+            return
+        game = self._games.get(game_tag)
+        if game is not None:
+            await self._finish_game(game, payload)
+
+    async def _check_games_over(self):
+        for game_tag, game in list(self._games.items()):
+            if game._finished:
+                continue
+            self._game_over_checks.add(game_tag)
+            # the state is handled even if its ply already was
+            self.chess_client._mailboxes.forget(game_tag)
+            await self.chess_client.emit("getGameState", game_tag)
+
+    async def _finish_game(self, game: AbstractGame, result: Dict[str, Any]):
+        if game._finished:
+            return
+        game._finished = True
+        game._game_status = "ended"
+        self._games_finished += 1
+        self.logger.info(f"Game {game.game_tag} over: {result}")
+        self._game_finished_callback(game)
+        game.release_board()
+        self.chess_client._mailboxes.forget(game.game_tag)
+        self._game_over_checks.discard(game.game_tag)
+
+        # frees the game slot taken in _create_game
+        self._game_count_queue.get_nowait()
+        self._game_count_queue.task_done()
+        async with self._game_end_condition:
+            self._game_end_condition.notify_all()
+
+    async def _handle_ingame_message(self, message: GameState):
         self.logger.info("HANDLE INGAME MESSAGE")
-        game_tag = message.get("room")
-        if not game_tag:
-            game_tag = message.get("id")
-        if not game_tag:
-            game_tag = message.get("roomId")
-            
-        fen = message.get("fen")
-        game_status = message.get("status")
+        game_tag = message.room_id
+        fen = message.fen
+        game_status = message.status
         self.logger.info(game_tag)
         self.logger.info(fen)
         self.logger.info(game_status)
 
-        if game_tag and (game_tag in self._games) and (game_status == "playing"):
+        if game_tag in self._recovering_games:
+            self._recovering_games.discard(game_tag)
+            self._games_recovered += 1
+            self.logger.info(f"Recovered game: {game_tag}")
+
+        if (
+            game_tag
+            and (game_tag in self._games)
+            and (game_status in ("playing", "ended"))
+            and not self._games[game_tag]._finished
+        ):
             self.logger.info(f"Game Started and Playing: {game_tag}")
             game = await self._get_game(game_tag)
-
-            game.game_fen = fen
-            board = chess.Board(game.game_fen)
-            game.to_play = "b" if board.turn == chess.BLACK else "w"
+            checked = game_tag in self._game_over_checks
+            self._game_over_checks.discard(game_tag)
+            ply = len(game.board.move_stack)
+
+            game.update_position(fen, message.history, message.last_move)
+
+            # the server ends games by the rules of chess.js, which game_result
+            # follows, as its gameOver may not tell which game ended
+            result = game_result(game.board)
+            if result is None and game_status == "ended":
+                result = {"status": game_status}
+            if result is not None:
+                await self._finish_game(game, result)
+                return
+            if checked and len(game.board.move_stack) == ply:
+                # a state requested by _check_games_over, whose move was
+                # already requested
+                return
 
             self.logger.info(f"handling game request for game: {game.game_tag}")
             await self._handle_game_request(game)
@@ -195,32 +378,154 @@ class Player(ABC):
         # choose a move and return a response if it is player's turn
 
         if game.to_play == game.player_color:
-            move_str = self.choose_move(game)
-            
-            move_msg = f'42["move", {{"roomId": "{game.game_tag}", "move": "{move_str}"}}]'
-            self.logger.info(f"trying to make a move: {move_str}")
-            
-            #f'42["move","{roomId, move}"]'
-            await self.chess_client.send_message(
-                move_msg
+            move = self.choose_book_move(game)
+            if move is None:
+                move = await self.choose_move_async(game)
+            if not move:
+                # no legal move, the game is over
+                return
+
+            move = self._render_move(game, move)
+            self.logger.info("trying to make a move: %s", move)
+            await self.chess_client.emit(
+                "move", {"roomId": game.game_tag, "move": move}
             )
+            self._moves_played += 1
+
+    def _render_move(self, game: AbstractGame, move: Any) -> Any:
+        """Renders a move chosen as a chess.Move in the player's move format.
+        Moves chosen as strings are sent as they are."""
+        if not isinstance(move, chess.Move):
+            return move
+        if self._move_format == "uci":
+            return move.uci()
+        if self._move_format == "object":
+            return move_to_dict(move)
+        return self._san(game.board, move)
+
+    def _san(self, board: chess.Board, move: chess.Move) -> str:
+        return board.san(move)
+
+    def choose_book_move(self, game: AbstractGame) -> Optional[chess.Move]:
+        """Chooses a move from the player's opening book, consulted before
+        choose_move.
+
+        :return: The book move, or None without a book or out of it.
+        :rtype: chess.Move, optional
+        """
+        if self._opening_book is None:
+            return None
+        return self._opening_book.choose(game.board)
     
     @abstractmethod
     def choose_move(
         self, battle: AbstractGame
-    )->str:
+    )->Union[chess.Move, str, Awaitable[Union[chess.Move, str]]]:
+        """Chooses the move to play in a game.
+
+        Policies may also be coroutine functions, or override choose_move_async.
+
+        :return: A chess.Move, sent in the player's move format, or a move string
+            in any notation the server accepts, sent as it is.
+        :rtype: Union[chess.Move, str]
+        """
         pass
+
+    async def choose_move_async(self, game: AbstractGame) -> Union[chess.Move, str]:
+        """Chooses the move to play in a game, without blocking the chess loop
+        while it is chosen if the player has a move executor: other games,
+        invitations and pings are handled meanwhile.
+
+        Without an executor, choose_move is called on the chess loop. In a thread
+        executor, choose_move is called concurrently for different games, so it
+        has to be thread-safe. In a process executor, each worker process is
+        spawned, rather than forked from a process running the chess loop thread,
+        and builds its own player of the same class with the player's
+        move_worker_kwargs, which have to be picklable. Workers are sent the
+        game's position as its packed moves: choose_move sees a copy of the game,
+        whose annotation of the next ply is copied back, and changes to the
+        player's state are only seen by that worker.
+
+        With a move batch size, the request joins the player's next batch, chosen
+        by choose_moves, on the chess loop or in the executor likewise.
+
+        :return: A chess.Move, sent in the player's move format, or a move string
+            in any notation the server accepts, sent as it is.
+        :rtype: Union[chess.Move, str]
+        """
+        if self._move_batcher is not None:
+            return await self._move_batcher.request(game)
+        if self._move_executor_kind is None:
+            move = self.choose_move(game)
+        elif self._move_executor_kind == "thread":
+            move = await asyncio.get_running_loop().run_in_executor(
+                self.move_executor, self.choose_move, game
+            )
+        else:
+            (move,) = await self._choose_in_workers([game], False)
+        if isawaitable(move):
+            move = await move
+        return move
+
+    def choose_moves(
+        self, games: List[AbstractGame]
+    ) -> List[Union[chess.Move, str, Awaitable[Union[chess.Move, str]]]]:
+        """Chooses the moves of a batch of games, with a move batch size. Policies
+        override it to choose them at once, eg. with one batched inference; by
+        default each move is chosen by choose_move.
+
+        :param games: The games, each waiting for the player's move.
+        :type games: List[AbstractGame]
+        :return: The move of each game, in order.
+        :rtype: List[Union[chess.Move, str]]
+        """
+        return [self.choose_move(game) for game in games]
+
+    async def _choose_batch(self, games: List[AbstractGame]) -> List[Any]:
+        if self._move_executor_kind is None:
+            return self.choose_moves(games)
+        if self._move_executor_kind == "thread":
+            return await asyncio.get_running_loop().run_in_executor(
+                self.move_executor, self.choose_moves, games
+            )
+        return await self._choose_in_workers(games, True)
+
+    async def _choose_in_workers(self, games: List[AbstractGame], batched: bool) -> List[Any]:
+        positions = [
+            (game.game_tag, game.player_color, *game.compact_position())
+            for game in games
+        ]
+        results = await asyncio.get_running_loop().run_in_executor(
+            self.move_executor, _choose_moves_in_worker, positions, batched
+        )
+        moves = []
+        for game, (move, value) in zip(games, results):
+            if not isnan(value) and game.observations is not None:
+                game.observations.annotate_next(value)
+            moves.append(move)
+        return moves
+
+    def close_move_executor(self, wait: bool = True):
+        """Shuts the move executor down, a new one being created by the next
+        move.
+
+        :param wait: Whether to wait for the moves being chosen.
+        :type wait: bool
+        """
+        executor, self._move_executor = self._move_executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
     
-    def choose_random_move(self, game: AbstractGame) -> str:
-        board = chess.Board(game.game_fen)
+    def choose_random_move(self, game: AbstractGame) -> Union[chess.Move, bool]:
+        board = game.board
         # Get a list of legal moves
         legal_moves = list(board.legal_moves)
 
         # Choose a random move
         if legal_moves:
             random_move = random.choice(legal_moves)
-            self.logger.info(f"Suggested random move: {random_move.uci()}")
-            return board.san(random_move)
+            self.logger.debug("Suggested random move: %s", random_move)
+            return random_move
         else:
             self.logger.info("No legal moves available. The game might be over.")
             return False 
@@ -231,12 +536,12 @@ class Player(ABC):
 
         if challenging_player != self.username:
             #todo: also check if format is correct
-            await self._invite_queue.put(challenging_player)
+            await self._invite_queue.put((roomId, challenging_player))
     
     async def accept_invites(self, opponent: Optional[Union[str, List[str]]],
         n_challenges: int):
         await handle_threaded_coroutines(
-            self._accept_challenges(opponent, n_challenges)
+            self._accept_invites(opponent, n_challenges)
         )
 
     async def _accept_invites(self,
@@ -251,12 +556,16 @@ class Player(ABC):
         await self.chess_client.logged_in.wait()
         self.logger.debug("Event logged in received in accept_challenge")
 
+        # accepts are correlated by room, so they can all be in flight at once
+        accepts = []
         for _ in range(n_challenges):
             while True:
                 # get username inviter from queue until it matches the opponent specified
-                roomId, username = str(await self._invite_queue.get())
+                roomId, username = await self._invite_queue.get()
                 self.logger.debug(
-                    "Consumed %s from invite queue in accept_invite", roomId, username,
+                    "Consumed %s from %s from invite queue in accept_invite",
+                    roomId,
+                    username,
                 )
 
                 # if opponent is None, accept any invites (1 times)
@@ -265,9 +574,14 @@ class Player(ABC):
                     or (opponent == username)
                     or (isinstance(opponent, list) and (username in opponent))
                 ):
-                    await self.chess_client.accept_invite(username)
-                    await self._game_semaphore.acquire()
+                    accepts.append(
+                        create_task(self.chess_client.accept_invite(roomId, username))
+                    )
                     break
+
+        n_accepted = sum(await gather(*accepts))
+        for _ in range(n_accepted):
+            await self._game_semaphore.acquire()
         await self._game_count_queue.join()
 
     async def send_invites(
@@ -304,9 +618,19 @@ class Player(ABC):
 
         start_time = perf_counter()
 
-        for _ in range(n_challenges):
-            #await self.chess_client.invite_player(opponent, self._format)
-            await self.chess_client.invite_player(opponent)
+        # each invite is correlated with its own response, so they are sent
+        # concurrently
+        responses = await gather(
+            *(self.chess_client.invite_player(opponent) for _ in range(n_challenges))
+        )
+        n_sent = sum(
+            1 for response in responses if response and 'roomId' in response
+        )
+        if n_sent < n_challenges:
+            self.logger.warning(
+                "%d of %d invitations failed", n_challenges - n_sent, n_challenges
+            )
+        for _ in range(n_sent):
             await self._game_semaphore.acquire()
         await self._game_count_queue.join()
         self.logger.info(
@@ -319,9 +643,91 @@ class Player(ABC):
     def games(self) -> Dict[str, AbstractGame]:
         return self._games
 
+    @property
+    def trajectories(self) -> Dict[str, ObservationHistory]:
+        """The recorded trajectory of every game, finished or not.
+
+        :return: The observation histories, by game tag.
+        :rtype: Dict[str, ObservationHistory]
+        """
+        return {
+            game_tag: game.observations
+            for game_tag, game in self._games.items()
+            if game.observations is not None
+        }
+
+    @property
+    def games_recovered(self) -> int:
+        """
+        :return: The number of games whose state was received again after a
+            reconnection.
+        :rtype: int
+        """
+        return self._games_recovered
+
+    @property
+    def games_finished(self) -> int:
+        """
+        :return: The number of games the player was notified the end of.
+        :rtype: int
+        """
+        return self._games_finished
+
+    @property
+    def moves_played(self) -> int:
+        """
+        :return: The number of moves the player sent.
+        :rtype: int
+        """
+        return self._moves_played
+
     @property
     def format(self) -> str:
         return self._format
+
+    @property
+    def move_format(self) -> str:
+        return self._move_format
+
+    @property
+    def opening_book(self) -> Optional[OpeningBook]:
+        return self._opening_book
+
+    @property
+    def move_batcher(self) -> Optional[MoveBatcher]:
+        """
+        :return: The scheduler batching move requests, with its batch size and
+            queueing delay histograms, None without a move batch size.
+        :rtype: MoveBatcher, optional
+        """
+        return self._move_batcher
+
+    @property
+    def move_executor(self) -> Optional[Executor]:
+        """
+        :return: The pool choose_move is run in, None without an executor kind.
+        :rtype: Executor, optional
+        """
+        if self._move_executor is None and self._move_executor_kind is not None:
+            if self._move_executor_kind == "thread":
+                self._move_executor = ThreadPoolExecutor(
+                    self._move_workers, thread_name_prefix="choose_move"
+                )
+            else:
+                # the player cannot be pickled, so workers rebuild it
+                player_class = type(self)
+                self._move_executor = ProcessPoolExecutor(
+                    self._move_workers,
+                    multiprocessing.get_context("spawn"),
+                    initializer=_init_move_worker,
+                    initargs=(
+                        f"{player_class.__module__}:{player_class.__qualname__}",
+                        self.username,
+                        self.logger.level,
+                        self._move_worker_kwargs,
+                    ),
+                )
+        return self._move_executor
     
     @property
     def logger(self) -> Logger:
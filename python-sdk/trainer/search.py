@@ -0,0 +1,381 @@
+"""This module contains an alpha-beta search over python-chess boards.
+
+The search is a negamax alpha-beta with iterative deepening, a quiescence
+search of captures, check extensions and a transposition table. Moves are
+ordered by transposition table move, captures by MVV-LVA (most valuable victim,
+least valuable attacker), promotions, killer moves and the history heuristic.
+"""
+
+from array import array
+from operator import itemgetter
+from time import perf_counter
+from typing import Any, Callable, List, NamedTuple, Optional
+
+import chess
+
+from evaluation import PIECE_VALUES, evaluate
+from moves import pack_move, unpack_move
+from transposition import EXACT, LOWER, UPPER, TranspositionTable, position_key
+
+INFINITY = 1_000_000
+MATE = 100_000
+# scores beyond this bound are mates, in a number of plies
+MATE_BOUND = MATE - 1000
+
+MAX_PLY = 128
+
+_BB_SQUARES = chess.BB_SQUARES
+# order of the nodes between two checks of the time limit
+_CHECK_EVERY = 1024
+
+
+class SearchLimits(NamedTuple):
+    """Budget of a search. Represented with a tuple with three entries: maximum
+    depth, nodes and seconds. Entries set to None are not limited; the search
+    stops at the first limit reached."""
+
+    depth: Optional[int] = None
+    nodes: Optional[int] = None
+    time: Optional[float] = None
+
+
+class SearchResult(NamedTuple):
+    """Outcome of a search: the best move, its score in centipawns from the
+    point of view of the side to move, the depth of the last completed
+    iteration, the nodes searched, the elapsed seconds and the principal
+    variation."""
+
+    move: Optional[chess.Move]
+    score: int
+    depth: int
+    nodes: int
+    time: float
+    pv: List[chess.Move]
+
+    @property
+    def nps(self) -> float:
+        return self.nodes / self.time if self.time else 0.0
+
+
+class SearchAborted(Exception):
+    """Raised inside a search when its node or time budget is exhausted."""
+
+
+def _to_table(score: int, ply: int) -> int:
+    # mate scores are stored relative to the node, not to the root
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score: int, ply: int) -> int:
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Searcher:
+    """Alpha-beta searcher. Its transposition table, killers and history are
+    kept from one search to the next, as consecutive moves of a game search
+    related positions.
+    """
+
+    def __init__(
+        self,
+        evaluate: Callable[[chess.Board], int] = evaluate,
+        table: Optional[TranspositionTable] = None,
+        table_entries: int = 1 << 18,
+        stop: Optional[Callable[[], bool]] = None,
+    ):
+        """
+        :param evaluate: Static evaluation, in centipawns from the point of view
+            of the side to move. Evaluations with reset, push and pop methods,
+            like nnue.NNUEEvaluator, are updated incrementally along the search.
+        :type evaluate: Callable[[chess.Board], int]
+        :param table: The transposition table, eg. shared with other searchers.
+        :type table: TranspositionTable, optional
+        :param table_entries: Number of entries of the table created when table
+            is None.
+        :type table_entries: int
+        :param stop: Polled with the time limit, aborts searches when it returns
+            True, eg. to stop the helpers of a parallel search.
+        :type stop: Callable[[], bool], optional
+        """
+        self._evaluate = evaluate
+        self._incremental: Any = evaluate if hasattr(evaluate, "push") else None
+        self._table = table if table is not None else TranspositionTable(table_entries)
+        self._stop = stop
+        self._killers: List[List[Optional[chess.Move]]] = [
+            [None, None] for _ in range(MAX_PLY)
+        ]
+        self._history = array("l", bytes(array("l").itemsize * 64 * 64))
+
+        self._nodes: int = 0
+        self._next_check: int = _CHECK_EVERY
+        self._max_nodes: Optional[int] = None
+        self._deadline: Optional[float] = None
+        self._root_move: Optional[chess.Move] = None
+        self._root_score: int = -INFINITY
+
+    def search(
+        self, board: chess.Board, limits: SearchLimits, start_depth: int = 1
+    ) -> SearchResult:
+        """Searches a position by iterative deepening until a limit is reached.
+
+        :param board: The position, left untouched.
+        :type board: chess.Board
+        :param limits: The budget of the search.
+        :type limits: SearchLimits
+        :param start_depth: The depth of the first iteration.
+        :type start_depth: int
+        :return: The result of the deepest completed iteration, improved by the
+            moves of an interrupted one that beat it.
+        :rtype: SearchResult
+        """
+        start = perf_counter()
+        board = board.copy()
+        root_ply = len(board.move_stack)
+        if self._incremental is not None:
+            self._incremental.reset(board)
+        self._nodes = 0
+        self._next_check = _CHECK_EVERY
+        self._max_nodes = limits.nodes
+        if limits.nodes is not None:
+            self._next_check = min(_CHECK_EVERY, limits.nodes)
+        self._deadline = None if limits.time is None else start + limits.time
+        self._age_history()
+
+        best_move: Optional[chess.Move] = None
+        best_score = 0
+        depth = 0
+        max_depth = min(limits.depth or MAX_PLY - 1, MAX_PLY - 1)
+        for iteration in range(min(start_depth, max_depth), max_depth + 1):
+            self._root_move = None
+            self._root_score = -INFINITY
+            try:
+                score = self._negamax(board, iteration, -INFINITY, INFINITY, 0)
+            except SearchAborted:
+                # the search is left with the moves it was searching pushed
+                while len(board.move_stack) > root_ply:
+                    self._pop(board)
+                # the first root move searched is the previous best, so any
+                # move that improved on it is better
+                if self._root_move is not None:
+                    best_move, best_score = self._root_move, self._root_score
+                break
+            best_move, best_score, depth = self._root_move, score, iteration
+            if best_move is None or abs(score) > MATE_BOUND:
+                # no legal move, or a forced mate found
+                break
+
+        if best_move is None:
+            best_move = next(iter(board.legal_moves), None)
+        return SearchResult(
+            best_move,
+            best_score,
+            depth,
+            self._nodes,
+            perf_counter() - start,
+            self._principal_variation(board, best_move, depth),
+        )
+
+    def _push(self, board: chess.Board, move: chess.Move):
+        if self._incremental is not None:
+            self._incremental.push(board, move)
+        board.push(move)
+
+    def _pop(self, board: chess.Board):
+        board.pop()
+        if self._incremental is not None:
+            self._incremental.pop()
+
+    def _check_limits(self):
+        if self._max_nodes is not None and self._nodes >= self._max_nodes:
+            raise SearchAborted()
+        if self._deadline is not None and perf_counter() >= self._deadline:
+            raise SearchAborted()
+        if self._stop is not None and self._stop():
+            raise SearchAborted()
+        self._next_check = self._nodes + _CHECK_EVERY
+        if self._max_nodes is not None:
+            self._next_check = min(self._next_check, self._max_nodes)
+
+    def _negamax(
+        self, board: chess.Board, depth: int, alpha: int, beta: int, ply: int
+    ) -> int:
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self._quiescence(board, alpha, beta, ply)
+
+        self._nodes += 1
+        if self._nodes >= self._next_check:
+            self._check_limits()
+
+        if ply:
+            halfmove_clock = board.halfmove_clock
+            if halfmove_clock >= 100 or (
+                halfmove_clock >= 4 and board.is_repetition(2)
+            ):
+                return 0
+
+        key = position_key(board)
+        entry = self._table.probe(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, flag, score, packed = entry
+            if packed:
+                table_move = unpack_move(packed)
+            if ply and entry_depth >= depth:
+                score = _from_table(score, ply)
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    if score >= beta:
+                        return score
+                elif score <= alpha:
+                    return score
+
+        in_check = board.is_check()
+        if in_check:
+            depth += 1
+
+        alpha_original = alpha
+        best_score = -INFINITY
+        best_move = None
+        them = board.occupied_co[not board.turn]
+        for move in self._ordered_moves(board, table_move, ply):
+            self._push(board, move)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            self._pop(board)
+
+            if score > best_score:
+                best_score, best_move = score, move
+                if ply == 0:
+                    self._root_move, self._root_score = move, score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    if not (them & _BB_SQUARES[move.to_square] or move.promotion):
+                        self._update_quiet(move, depth, ply)
+                    break
+
+        if best_move is None:
+            return -MATE + ply if in_check else 0
+
+        if best_score <= alpha_original:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self._table.store(
+            key, depth, flag, _to_table(best_score, ply), pack_move(best_move)
+        )
+        return best_score
+
+    def _quiescence(self, board: chess.Board, alpha: int, beta: int, ply: int) -> int:
+        self._nodes += 1
+        if self._nodes >= self._next_check:
+            self._check_limits()
+
+        stand_pat = self._evaluate(board)
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        for move in self._ordered_captures(board):
+            self._push(board, move)
+            score = -self._quiescence(board, -beta, -alpha, ply + 1)
+            self._pop(board)
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        return alpha
+
+    def _ordered_moves(
+        self, board: chess.Board, table_move: Optional[chess.Move], ply: int
+    ) -> List[chess.Move]:
+        killer, second_killer = self._killers[ply]
+        history = self._history
+        them = board.occupied_co[not board.turn]
+        piece_type_at = board.piece_type_at
+        scored = []
+        for move in board.generate_legal_moves():
+            to_square = move.to_square
+            if move == table_move:
+                score = 1 << 30
+            elif them & _BB_SQUARES[to_square]:
+                score = (1 << 28) + (
+                    PIECE_VALUES[piece_type_at(to_square)] << 4
+                ) - piece_type_at(move.from_square)
+            elif move.promotion:
+                score = (1 << 27) + move.promotion
+            elif move == killer:
+                score = 1 << 26
+            elif move == second_killer:
+                score = (1 << 26) - 1
+            else:
+                score = history[move.from_square << 6 | to_square]
+            scored.append((score, move))
+        scored.sort(key=itemgetter(0), reverse=True)
+        return [move for _, move in scored]
+
+    def _ordered_captures(self, board: chess.Board) -> List[chess.Move]:
+        piece_type_at = board.piece_type_at
+        scored = [
+            (
+                (PIECE_VALUES[piece_type_at(move.to_square) or chess.PAWN] << 4)
+                - piece_type_at(move.from_square),
+                move,
+            )
+            for move in board.generate_legal_captures()
+        ]
+        scored.sort(key=itemgetter(0), reverse=True)
+        return [move for _, move in scored]
+
+    def _update_quiet(self, move: chess.Move, depth: int, ply: int):
+        killers = self._killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        index = move.from_square << 6 | move.to_square
+        self._history[index] = min(self._history[index] + depth * depth, 1 << 24)
+
+    def _age_history(self):
+        history = self._history
+        for i in range(len(history)):
+            history[i] >>= 1
+        for killers in self._killers:
+            killers[0] = killers[1] = None
+
+    def _principal_variation(
+        self, board: chess.Board, move: Optional[chess.Move], depth: int
+    ) -> List[chess.Move]:
+        """Follows the best moves of the transposition table from the root."""
+        pv: List[chess.Move] = []
+        board = board.copy(stack=False)
+        while move is not None and len(pv) < max(depth, 1):
+            if not board.is_legal(move):
+                break
+            pv.append(move)
+            board.push(move)
+            entry = self._table.probe(position_key(board))
+            move = unpack_move(entry[3]) if entry is not None and entry[3] else None
+        return pv
+
+    @property
+    def table(self) -> TranspositionTable:
+        return self._table
+
+    @property
+    def nodes(self) -> int:
+        """
+        :return: The number of nodes searched by the last search.
+        :rtype: int
+        """
+        return self._nodes
@@ -0,0 +1,75 @@
+"""This module defines a player choosing its moves with an alpha-beta search.
+"""
+
+from typing import Any, Optional, Union
+
+from environment import AbstractGame
+from parallel_search import ParallelSearcher
+from player import Player
+from search import Searcher, SearchLimits, SearchResult
+
+
+class SearchPlayer(Player):
+    """Player searching every position with a Searcher, within a per-move
+    budget of depth, nodes or time. The score of each move it plays is recorded
+    in the game's observations."""
+
+    def __init__(
+        self,
+        *args: Any,
+        depth: Optional[int] = None,
+        nodes: Optional[int] = None,
+        move_time: Optional[float] = 0.1,
+        searcher: Optional[Union[Searcher, ParallelSearcher]] = None,
+        workers: int = 1,
+        **kwargs: Any,
+    ):
+        """
+        :param depth: Maximum depth of each search.
+        :type depth: int, optional
+        :param nodes: Maximum number of nodes of each search.
+        :type nodes: int, optional
+        :param move_time: Maximum seconds of each search.
+        :type move_time: float, optional
+        :param searcher: The searcher, eg. sharing its transposition table.
+        :type searcher: Searcher or ParallelSearcher, optional
+        :param workers: Number of processes of the search, above 1 a
+            ParallelSearcher is created when searcher is None.
+        :type workers: int
+        """
+        if depth is None and nodes is None and move_time is None:
+            raise ValueError("At least one of depth, nodes and move_time is required")
+        self._limits = SearchLimits(depth, nodes, move_time)
+        if searcher is None:
+            searcher = ParallelSearcher(workers) if workers > 1 else Searcher()
+        self._searcher = searcher
+        self._last_result: Optional[SearchResult] = None
+        super(SearchPlayer, self).__init__(*args, **kwargs)
+
+    def choose_move(self, game: AbstractGame) -> Any:
+        result = self._searcher.search(game.board, self._limits)
+        self._last_result = result
+        if result.move is None:
+            return False
+        self.logger.debug(
+            "Searched %s: depth %d, %d nodes, score %d",
+            result.move,
+            result.depth,
+            result.nodes,
+            result.score,
+        )
+        if game.observations is not None:
+            game.observations.annotate_next(result.score)
+        return result.move
+
+    @property
+    def limits(self) -> SearchLimits:
+        return self._limits
+
+    @property
+    def searcher(self) -> Union[Searcher, ParallelSearcher]:
+        return self._searcher
+
+    @property
+    def last_result(self) -> Optional[SearchResult]:
+        return self._last_result
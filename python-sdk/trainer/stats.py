@@ -0,0 +1,122 @@
+"""This module contains lightweight statistics accumulators used for instrumentation.
+"""
+
+from bisect import bisect_left
+from typing import Dict, List, Sequence
+
+
+class RunningStats:
+    """Accumulates count, mean, min, max and last value of a series of samples
+    without storing them."""
+
+    __slots__ = ("count", "total", "minimum", "maximum", "last")
+
+    def __init__(self):
+        self.reset()
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def reset(self):
+        self.count: int = 0
+        self.total: float = 0.0
+        self.minimum: float = float("inf")
+        self.maximum: float = 0.0
+        self.last: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.minimum if self.count else 0.0,
+            "max": self.maximum,
+            "last": self.last,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"RunningStats(count={self.count}, mean={self.mean:.6f}, "
+            f"max={self.maximum:.6f})"
+        )
+
+
+class Histogram:
+    """Counts samples in fixed buckets, each bucket counting the samples up to
+    its upper bound and above the previous one, the last bucket counting the
+    samples above every bound. Also accumulates the samples' RunningStats."""
+
+    __slots__ = ("bounds", "counts", "stats")
+
+    def __init__(self, bounds: Sequence[float]):
+        """
+        :param bounds: The increasing upper bounds of the buckets.
+        :type bounds: Sequence[float]
+        """
+        self.bounds: List[float] = list(bounds)
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.stats = RunningStats()
+
+    @classmethod
+    def exponential(cls, start: float, factor: float, n_buckets: int) -> "Histogram":
+        """
+        :return: A histogram whose bounds start at start, each multiplied by
+            factor.
+        :rtype: Histogram
+        """
+        return cls([start * factor ** i for i in range(n_buckets)])
+
+    def add(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.stats.add(value)
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.stats.reset()
+
+    @property
+    def count(self) -> int:
+        return self.stats.count
+
+    def quantile(self, q: float) -> float:
+        """
+        :param q: The quantile, between 0 and 1.
+        :type q: float
+        :return: The upper bound of the bucket holding the quantile, the maximum
+            sample if it is the last bucket, 0 without samples.
+        :rtype: float
+        """
+        if not self.stats.count:
+            return 0.0
+        rank = q * self.stats.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank and seen:
+                return min(bound, self.stats.maximum)
+        return self.stats.maximum
+
+    def as_dict(self) -> Dict[str, int]:
+        """
+        :return: The count of each bucket, keyed by its upper bound, '+inf' for
+            the last one.
+        :rtype: Dict[str, int]
+        """
+        buckets = {"%g" % bound: count for bound, count in zip(self.bounds, self.counts)}
+        buckets["+inf"] = self.counts[-1]
+        return buckets
+
+    def __repr__(self) -> str:
+        return (
+            f"Histogram(count={self.stats.count}, mean={self.stats.mean:.6f}, "
+            f"p50={self.quantile(0.5):.6f}, p99={self.quantile(0.99):.6f})"
+        )
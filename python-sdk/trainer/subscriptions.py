@@ -0,0 +1,180 @@
+"""This module contains the registry of event subscriptions and one-shot waiters.
+"""
+
+import asyncio
+from asyncio import Future
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+Predicate = Callable[[Any], bool]
+
+
+class Subscription:
+    """Stream of the payloads of an event that match a predicate.
+
+    Payloads are buffered from the moment the subscription is created, so it can
+    be created before sending the request it waits a response for. It can be
+    used as a context manager, which closes it on exit, and as an async
+    iterator.
+    """
+
+    __slots__ = ("event", "predicate", "_registry", "_payloads", "_waiter", "closed")
+
+    def __init__(
+        self, registry: "SubscriptionRegistry", event: str, predicate: Optional[Predicate]
+    ):
+        self.event = event
+        self.predicate = predicate
+        self._registry = registry
+        self._payloads: Deque[Any] = deque()
+        self._waiter: Optional["Future[None]"] = None
+        self.closed: bool = False
+
+    def _push(self, payload: Any):
+        self._payloads.append(payload)
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Any:
+        """Returns the next matching payload.
+
+        :param timeout: Seconds to wait for it.
+        :type timeout: float, optional
+        :raises asyncio.TimeoutError: If no payload arrived within timeout.
+        :raises RuntimeError: If the subscription is closed, or closed while
+            waiting, with no payload left.
+        """
+        while not self._payloads:
+            if self.closed:
+                raise RuntimeError(f"The subscription to {self.event} is closed")
+            await self._wait(timeout)
+        return self._payloads.popleft()
+
+    async def _wait(self, timeout: Optional[float]):
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._waiter, timeout)
+        finally:
+            self._waiter = None
+
+    def close(self):
+        """Closes the subscription, waking up a pending get, which then fails,
+        or async for loop, which then ends, once the buffered payloads are
+        read."""
+        if not self.closed:
+            self.closed = True
+            self._registry._remove(self.event, id(self))
+            if self._waiter is not None and not self._waiter.done():
+                self._waiter.set_result(None)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc: Any):
+        self.close()
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> Any:
+        while not self._payloads:
+            if self.closed:
+                raise StopAsyncIteration
+            await self._wait(None)
+        return self._payloads.popleft()
+
+
+class _Waiter:
+    __slots__ = ("predicate", "future")
+
+    def __init__(self, predicate: Optional[Predicate], future: "Future[Any]"):
+        self.predicate = predicate
+        self.future = future
+
+    def _push(self, payload: Any):
+        if not self.future.done():
+            self.future.set_result(payload)
+
+
+class SubscriptionRegistry:
+    """Index from event name to the subscriptions and waiters of that event.
+
+    Publishing an event only visits the waiters of that event.
+    """
+
+    def __init__(self):
+        self._index: Dict[str, Dict[int, Any]] = {}
+
+    def _add(self, event: str, waiter: Any):
+        waiters = self._index.get(event)
+        if waiters is None:
+            waiters = self._index[event] = {}
+        waiters[id(waiter)] = waiter
+
+    def _remove(self, event: str, key: int):
+        waiters = self._index.get(event)
+        if waiters is not None:
+            waiters.pop(key, None)
+            if not waiters:
+                del self._index[event]
+
+    def subscribe(self, event: str, predicate: Optional[Predicate] = None) -> Subscription:
+        """Subscribes to every payload of event matching predicate.
+
+        :param event: The event name.
+        :type event: str
+        :param predicate: Optional filter on payloads.
+        :type predicate: Callable[[Any], bool], optional
+        :return: The subscription, to be closed when no longer needed.
+        :rtype: Subscription
+        """
+        subscription = Subscription(self, event, predicate)
+        self._add(event, subscription)
+        return subscription
+
+    def expect(self, event: str, predicate: Optional[Predicate] = None) -> "Future[Any]":
+        """Registers a one-shot waiter for the next payload of event matching
+        predicate.
+
+        :return: A future resolved with the payload. Cancelling it unregisters it.
+        :rtype: Future
+        """
+        waiter = _Waiter(predicate, asyncio.get_running_loop().create_future())
+        self._add(event, waiter)
+        waiter.future.add_done_callback(lambda _: self._remove(event, id(waiter)))
+        return waiter.future
+
+    async def wait_for(
+        self,
+        event: str,
+        predicate: Optional[Predicate] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """Waits for the next payload of event matching predicate.
+
+        :raises asyncio.TimeoutError: If no payload arrived within timeout.
+        """
+        return await asyncio.wait_for(self.expect(event, predicate), timeout)
+
+    def publish(self, event: str, payload: Any) -> int:
+        """Delivers a payload to the matching waiters of event.
+
+        :return: The number of waiters the payload was delivered to.
+        :rtype: int
+        """
+        waiters = self._index.get(event)
+        if not waiters:
+            return 0
+        delivered = 0
+        for waiter in list(waiters.values()):
+            predicate = waiter.predicate
+            if predicate is None or predicate(payload):
+                waiter._push(payload)
+                delivered += 1
+        return delivered
+
+    def has_waiters(self, event: str) -> bool:
+        return event in self._index
+
+    def __len__(self) -> int:
+        return sum(len(waiters) for waiters in self._index.values())
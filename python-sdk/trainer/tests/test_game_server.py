@@ -0,0 +1,119 @@
+"""Plays full games between RandomPlayers through the Python stand-in game
+server, over a websocket and over the loopback transport."""
+
+import asyncio
+import logging
+
+from account_configuration import AccountConfiguration
+from concurrency import handle_threaded_coroutines
+from game_server import GameServer, WebsocketGameServer
+from random_player import RandomPlayer
+from server_configuration import ServerConfiguration
+from transport import LoopbackArbiter
+
+
+class ResigningPlayer(RandomPlayer):
+    """Resigns instead of playing its tenth move."""
+
+    async def _handle_game_request(self, game):
+        if game.to_play == game.player_color and game.board.ply() >= 18:
+            winner = "black" if game.player_color == "white" else "white"
+            await self.chess_client.emit(
+                "resign",
+                {
+                    "roomId": game.game_tag,
+                    "result": {"winner": winner, "reason": "resignation"},
+                },
+            )
+            return
+        await super()._handle_game_request(game)
+
+
+async def play_game(configuration, make_transport, name, player_classes=None):
+    player_classes = player_classes or (RandomPlayer, RandomPlayer)
+    players = [
+        player_class(
+            AccountConfiguration(f"{name}{i}", None),
+            server_configuration=configuration,
+            log_level=logging.WARNING,
+            transport=make_transport(),
+        )
+        for i, player_class in enumerate(player_classes)
+    ]
+    inviter, invitee = players
+    for player in players:
+        await player.chess_client.logged_in.wait()
+    await asyncio.wait_for(
+        asyncio.gather(
+            inviter._send_invites(invitee.username, 1),
+            invitee._accept_invites(inviter.username, 1),
+        ),
+        timeout=60,
+    )
+    for player in players:
+        await player.chess_client._stop_listening()
+    return players
+
+
+def check_game(game_server, players, resigned=False):
+    (room,) = game_server.rooms.values()
+    assert room.status == "ended"
+    if resigned:
+        assert room.board.ply() in (18, 19)
+    else:
+        assert room.board.is_game_over(claim_draw=True)
+    for player in players:
+        assert player.games_finished == 1
+        (game,) = player.games.values()
+        assert game.board.move_stack == room.board.move_stack
+    assert sum(player.moves_played for player in players) == room.board.ply()
+
+
+def test_game_over_loopback():
+    arbiter = LoopbackArbiter()
+    players = asyncio.run(
+        handle_threaded_coroutines(
+            play_game(ServerConfiguration("loopback", ""), arbiter.transport, "loop")
+        )
+    )
+    check_game(arbiter.game_server, players)
+
+
+def test_resignation_loopback():
+    arbiter = LoopbackArbiter()
+    players = asyncio.run(
+        handle_threaded_coroutines(
+            play_game(
+                ServerConfiguration("loopback", ""),
+                arbiter.transport,
+                "resign",
+                (ResigningPlayer, RandomPlayer),
+            )
+        )
+    )
+    check_game(arbiter.game_server, players, resigned=True)
+
+
+def test_game_over_with_room_id():
+    arbiter = LoopbackArbiter(
+        GameServer(broadcast_room_list=False, game_over_room_id=True)
+    )
+    players = asyncio.run(
+        handle_threaded_coroutines(
+            play_game(ServerConfiguration("loopback", ""), arbiter.transport, "room")
+        )
+    )
+    check_game(arbiter.game_server, players)
+
+
+def test_game_over_websocket(free_port):
+    game_server = GameServer(broadcast_room_list=False)
+    WebsocketGameServer(game_server).start_in_thread("localhost", free_port)
+    players = asyncio.run(
+        handle_threaded_coroutines(
+            play_game(
+                ServerConfiguration("localhost:%d" % free_port, ""), lambda: None, "ws"
+            )
+        )
+    )
+    check_game(game_server, players)
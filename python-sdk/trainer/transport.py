@@ -0,0 +1,151 @@
+"""This module contains the transports connecting a ChessClient to a game server.
+
+WebsocketTransport speaks Engine.IO / Socket.IO over a websocket and is the
+default. LoopbackTransport connects clients of the same process to an in-memory
+LoopbackArbiter running the GameServer handlers: events are handed over as
+Python objects, without sockets or JSON, which is meant for self-play.
+"""
+
+import uuid
+from abc import ABC, abstractmethod
+from asyncio import Event
+from typing import TYPE_CHECKING, Any, Optional, Tuple
+
+import websockets.client as ws
+
+from codec import encode_event
+from game_server import Connection, GameServer
+
+if TYPE_CHECKING:
+    from chess_client import ChessClient
+
+
+class Transport(ABC):
+    """Connection between a client and a game server.
+
+    The client enqueues the messages returned by encode in its outbound queue,
+    and its writer task hands them to send.
+    """
+
+    @abstractmethod
+    async def run(self, client: "ChessClient"):
+        """Connects the client and delivers inbound messages to it until the
+        connection closes."""
+
+    @abstractmethod
+    def encode(self, event: str, args: Tuple[Any, ...], ack_id: Optional[int] = None) -> Any:
+        """Encodes an event for send."""
+
+    @abstractmethod
+    async def send(self, message: Any):
+        pass
+
+    @abstractmethod
+    async def close(self):
+        pass
+
+
+class WebsocketTransport(Transport):
+    """Socket.IO over a websocket. Inbound frames go through the client's packet
+    handlers, which run the Engine.IO handshake."""
+
+    def __init__(self):
+        self.websocket: Optional[ws.WebSocketClientProtocol] = None
+
+    async def run(self, client: "ChessClient"):
+        url = client.websocket_url
+        async with ws.connect(
+            f"ws://{url}/socket.io/?EIO=4&transport=websocket",
+            extra_headers={"Origin": f"http://{url}"},
+        ) as websocket:
+            self.websocket = websocket
+            async for message in websocket:
+                client.logger.info("\033[93m\033[1m>>>\033[0m %s", message)
+                # events are handed over to the room mailboxes, so this only
+                # waits on control packets
+                await client.message_handler(str(message))
+
+    def encode(self, event: str, args: Tuple[Any, ...], ack_id: Optional[int] = None) -> str:
+        return encode_event(event, *args, ack_id=ack_id)
+
+    async def send(self, message: str):
+        await self.websocket.send(message)
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+
+
+class LoopbackConnection(Connection):
+    """Arbiter side of a loopback client, delivering events straight to it."""
+
+    def __init__(self, sid: str, client: "ChessClient"):
+        super().__init__(sid)
+        self.client = client
+
+    def emit(self, event: str, payload: Any = None):
+        self.client.deliver_event(event, payload)
+
+
+class LoopbackArbiter:
+    """In-memory game server for clients running in the same process.
+
+    Handlers run synchronously in the task of the client sending the event, and
+    their events are put in the receivers' room mailboxes, so every client of an
+    arbiter must run on the same event loop (the chess loop).
+    """
+
+    def __init__(self, game_server: Optional[GameServer] = None):
+        """
+        :param game_server: The server state and handlers. Defaults to a server
+            that does not broadcast room lists.
+        :type game_server: GameServer, optional
+        """
+        self.game_server = game_server or GameServer(broadcast_room_list=False)
+
+    def transport(self) -> "LoopbackTransport":
+        """
+        :return: A new transport connecting one client to this arbiter.
+        :rtype: LoopbackTransport
+        """
+        return LoopbackTransport(self)
+
+
+class LoopbackTransport(Transport):
+    def __init__(self, arbiter: LoopbackArbiter):
+        self.arbiter = arbiter
+        self._connection: Optional[LoopbackConnection] = None
+        self._closed: Optional[Event] = None
+
+    async def run(self, client: "ChessClient"):
+        self._closed = Event()
+        connection = LoopbackConnection(uuid.uuid4().hex[:20], client)
+        self._connection = connection
+        client.sid = connection.sid
+        game_server = self.arbiter.game_server
+        try:
+            auth = client._connect_auth()
+            await client._on_connected()
+            game_server.connect(connection, auth)
+            await self._closed.wait()
+        finally:
+            game_server.disconnect(connection)
+            self._connection = None
+
+    def encode(
+        self, event: str, args: Tuple[Any, ...], ack_id: Optional[int] = None
+    ) -> Tuple[str, Tuple[Any, ...], Optional[int]]:
+        return event, args, ack_id
+
+    async def send(self, message: Tuple[str, Tuple[Any, ...], Optional[int]]):
+        connection = self._connection
+        if connection is None:
+            raise ConnectionError("Loopback transport is not connected")
+        event, args, ack_id = message
+        response = self.arbiter.game_server.handle(connection, event, *args)
+        if ack_id is not None:
+            connection.client._pending_requests.resolve_ack(ack_id, response)
+
+    async def close(self):
+        if self._closed is not None:
+            self._closed.set()
@@ -0,0 +1,124 @@
+"""This module contains the fixed-size transposition table of searches.
+"""
+
+from array import array
+from typing import Any, Optional, Tuple
+
+import chess
+
+from opening_book import zobrist_hash
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+_SCORE_OFFSET = 1 << 31
+
+
+def position_key(board: chess.Board) -> int:
+    """
+    :param board: The position.
+    :type board: chess.Board
+    :return: The 64-bit polyglot Zobrist key of the position, the same in every
+        process and interpreter, so that search processes share table entries.
+    :rtype: int
+    """
+    return zobrist_hash(board)
+
+
+class TranspositionTable:
+    """Fixed-size, always allocated, table of search results by position.
+
+    Entries are two 64-bit words in flat arrays, no Python object is kept per
+    entry. The data word packs the score, the depth, the bound flag and the
+    packed best move (see moves.pack_move); the key word stores the position
+    key xored with the data word, so that an entry torn by concurrent writers
+    fails verification instead of returning the data of another position.
+
+    A slot is replaced by any other position, or by the same position searched
+    at least as deep.
+    """
+
+    __slots__ = ("_keys", "_data", "_mask", "_n_entries")
+
+    def __init__(self, n_entries: int = 1 << 18, buffer: Optional[Any] = None):
+        """
+        :param n_entries: Number of entries, rounded down to a power of two.
+        :type n_entries: int
+        :param buffer: Optional writable buffer of at least 16 * n_entries bytes
+            to store the entries in, eg. shared memory.
+        :type buffer: bytes-like, optional
+        """
+        n_entries = 1 << max(n_entries, 1).bit_length() - 1
+        if buffer is None:
+            self._keys: Any = array("Q", bytes(8 * n_entries))
+            self._data: Any = array("Q", bytes(8 * n_entries))
+        else:
+            words = memoryview(buffer)[: 16 * n_entries].cast("Q")
+            self._keys = words[:n_entries]
+            self._data = words[n_entries:]
+        self._mask = n_entries - 1
+        self._n_entries = n_entries
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, int, int]]:
+        """
+        :param key: The position key.
+        :type key: int
+        :return: The (depth, flag, score, packed move) of the position, or None.
+        :rtype: Tuple[int, int, int, int], optional
+        """
+        i = key & self._mask
+        data = self._data[i]
+        if self._keys[i] ^ data != key or not data:
+            return None
+        return (
+            data >> 32 & 0xFF,
+            data >> 40 & 0x3,
+            (data & 0xFFFFFFFF) - _SCORE_OFFSET,
+            data >> 48,
+        )
+
+    def store(self, key: int, depth: int, flag: int, score: int, move: int):
+        """
+        :param key: The position key.
+        :type key: int
+        :param depth: The remaining depth the position was searched to.
+        :type depth: int
+        :param flag: EXACT, LOWER or UPPER bound.
+        :type flag: int
+        :param score: The score.
+        :type score: int
+        :param move: The packed best move, 0 if none.
+        :type move: int
+        """
+        i = key & self._mask
+        old = self._data[i]
+        if self._keys[i] ^ old == key and old >> 32 & 0xFF > depth:
+            return
+        data = (
+            (score + _SCORE_OFFSET) & 0xFFFFFFFF
+            | min(depth, 0xFF) << 32
+            | flag << 40
+            | move << 48
+        )
+        self._data[i] = data
+        self._keys[i] = key ^ data
+
+    def clear(self):
+        for words in (self._keys, self._data):
+            words[:] = array("Q", bytes(8 * self._n_entries))
+
+    def usage(self, sample: int = 4096) -> float:
+        """
+        :return: The share of the first sample slots in use.
+        :rtype: float
+        """
+        sample = min(sample, self._n_entries)
+        return sum(1 for i in range(sample) if self._data[i]) / sample
+
+    def __len__(self) -> int:
+        return self._n_entries
+
+    @property
+    def nbytes(self) -> int:
+        return 16 * self._n_entries